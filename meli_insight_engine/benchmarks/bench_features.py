@@ -0,0 +1,61 @@
+"""
+Benchmark de las transformaciones de features por publicación (core.features).
+
+Uso (desde meli_insight_engine/):
+    python -m benchmarks.bench_features --filas 10000000
+
+Objetivo: >= 10M filas/s para discount_pct + title_len + rep_score.
+"""
+import argparse
+import time
+
+import numpy as np
+import pyarrow as pa
+
+from core.features import REP_MAP, calcular_features_listing, calcular_features_en_lotes
+
+
+def generar_lote(filas: int, seed: int = 42) -> pa.Table:
+    rng = np.random.default_rng(seed)
+    reputaciones = np.array(list(REP_MAP) + [None], dtype=object)
+    titulos = np.array(["Memoria Usb Adata Uv250 16gb", "Apple AirPods Pro 2nda Generación",
+                        "Ariana Grande Ari Edp 100 Ml", "Tarjeta De Memoria Kingston 32gb"], dtype=object)
+    regular = np.where(rng.random(filas) < 0.3, rng.lognormal(10, 1, filas), np.nan)
+    return pa.table({
+        "price": rng.lognormal(10, 1, filas),
+        "regular_price": pa.array(regular, from_pandas=True),
+        "titulo": pa.array(titulos[rng.integers(0, len(titulos), filas)]),
+        # Parquet/DuckDB entregan seller_reputation diccionario-codificada
+        "seller_reputation": pa.array(reputaciones[rng.integers(0, len(reputaciones), filas)]).dictionary_encode(),
+    })
+
+
+def medir(fn, repeticiones: int) -> float:
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        fn()
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de features por publicación")
+    parser.add_argument("--filas", type=int, default=10_000_000)
+    parser.add_argument("--lote", type=int, default=1_000_000)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+
+    tabla = generar_lote(args.filas)
+    lotes = tabla.to_batches(max_chunksize=args.lote)
+
+    t_tabla = medir(lambda: calcular_features_listing(tabla), args.repeticiones)
+    t_lotes = medir(lambda: list(calcular_features_en_lotes(lotes)), args.repeticiones)
+
+    print(f"Filas: {args.filas:,}")
+    print(f"• Tabla completa (1 hilo) : {args.filas / t_tabla / 1e6:6.1f} M filas/s")
+    print(f"• Lotes de {args.lote:,} (hilos): {args.filas / t_lotes / 1e6:6.1f} M filas/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmark de memoria de analisis_inicial_completo.
+
+Genera un Parquet sintético con el esquema del export de publicaciones y corre
+el análisis completo en un subproceso limpio, reportando el pico de RSS
+(ru_maxrss) por encima de la línea base tras importar las librerías y, por
+separado, el pico de memoria del lado Python/NumPy (tracemalloc), que aísla la
+ruta de resultados de la memoria de trabajo propia de DuckDB.
+
+Uso (desde meli_insight_engine/):
+    python -m benchmarks.bench_inspector_memoria --filas 2000000
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+
+def generar_parquet(ruta: str, filas: int, sellers: int):
+    import duckdb
+
+    con = duckdb.connect()
+    con.execute(f"""
+        COPY (
+            SELECT
+                DATE '2024-08-01' + CAST(random() * 30 AS INTEGER) AS tim_day,
+                's' || CAST(random() * {sellers} AS INTEGER) AS seller_nickname,
+                'Producto ' || CAST(random() * 200000 AS INTEGER) AS titulo,
+                (['green_platinum', 'green_gold', 'green', 'yellow', 'newbie'])[1 + CAST(random() * 4 AS INTEGER)] AS seller_reputation,
+                CAST(random() * 500 AS BIGINT) AS stock,
+                (['fulfillment', 'cross_docking', 'drop_off'])[1 + CAST(random() * 2 AS INTEGER)] AS logistic_type,
+                CASE WHEN random() < 0.9 THEN 'new' ELSE 'used' END AS condition,
+                random() < 0.05 AS is_refurbished,
+                exp(10 + random() * 3) AS price,
+                CASE WHEN random() < 0.3 THEN exp(10 + random() * 3) END AS regular_price,
+                'MCO' || CAST(random() * 3000 AS INTEGER) AS category_id
+            FROM range({filas})
+        ) TO '{ruta}' (FORMAT PARQUET)
+    """)
+    con.close()
+
+
+def _rss_mb() -> float:
+    # En Linux ru_maxrss está en KB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def medir(ruta: str):
+    """Se ejecuta en el subproceso: imprime base, pico y tiempo."""
+    import pandas  # noqa: F401  (la línea base incluye las librerías)
+    import pyarrow  # noqa: F401
+    from core import conectar_duckdb
+    from core.inspector import analisis_inicial_completo
+
+    con = conectar_duckdb()
+    con.execute(f"CREATE VIEW listings AS SELECT * FROM read_parquet('{ruta}')")
+    base = _rss_mb()
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    resultados = analisis_inicial_completo(con, "listings")
+    duracion = time.perf_counter() - inicio
+    pico_python = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+    tracemalloc.stop()
+    memoria_resultados = sum(
+        v.memory_usage(deep=True).sum() for v in resultados.values() if hasattr(v, "memory_usage")
+    ) / 1024 ** 2
+    print(f"{base:.1f} {_rss_mb():.1f} {duracion:.2f} {memoria_resultados:.1f} {pico_python:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pico de RSS de analisis_inicial_completo")
+    parser.add_argument("--filas", type=int, default=2_000_000)
+    parser.add_argument("--sellers", type=int, default=50_000)
+    parser.add_argument("--medir", type=str, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.medir:
+        medir(args.medir)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = os.path.join(tmp, "listings.parquet")
+        print(f"🧪 Generando {args.filas:,} publicaciones de {args.sellers:,} sellers...")
+        generar_parquet(ruta, args.filas, args.sellers)
+        salida = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_inspector_memoria", "--medir", ruta],
+            capture_output=True, text=True, check=True,
+        ).stdout.split()
+    base, pico, duracion, resultados, pico_python = map(float, salida[-5:])
+    print(f"• RSS base            : {base:8.1f} MB")
+    print(f"• RSS pico            : {pico:8.1f} MB  (+{pico - base:.1f} MB durante el análisis)")
+    print(f"• Pico Python/NumPy   : {pico_python:8.1f} MB  (tracemalloc)")
+    print(f"• Resultados (pandas) : {resultados:8.1f} MB")
+    print(f"• Duración            : {duracion:8.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Benchmark de la capa LLM (LangChain) con un modelo falso determinista.
+
+Mide, sin llamar a Deepseek:
+- costo de renderizar strategy_prompt,
+- overhead del framework por llamada (LLMChain / SequentialChain / TemplateAgent)
+  con latencia de modelo 0,
+- throughput extremo a extremo de cot_chain con distintos niveles de concurrencia
+  y una latencia simulada.
+
+Uso (desde meli_insight_engine/):
+    python -m benchmarks.bench_llm_pipeline --llamadas 200 --latencia_ms 50
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+os.environ.setdefault("DEEPSEEK_API_KEY", "benchmark")
+
+from llm.agents.agent_template import TemplateAgent  # noqa: E402
+from llm.agents.rasoner_meli import construir_cadenas  # noqa: E402
+from llm.fake_model import FakeChatModel  # noqa: E402
+from llm.prompts.templates import strategy_prompt  # noqa: E402
+
+PAYLOAD = {
+    "fecha_actual": date(2025, 7, 15).isoformat(),
+    "cluster_name": "Sellers en Crecimiento",
+    "publicaciones": 120,
+    "categorias_distintas": 15,
+    "stock_promedio": 124,
+    "precio_medio_cop": 105_000,
+    "descuento_pct": 0.27,
+    "rep_score": 4.1,
+    "tasa_cancelacion": 0.8,
+}
+
+
+def tiempos_por_llamada(fn, n: int):
+    tiempos = []
+    for _ in range(n):
+        inicio = time.perf_counter()
+        fn()
+        tiempos.append(time.perf_counter() - inicio)
+    return tiempos
+
+
+def resumir(nombre: str, tiempos):
+    tiempos = sorted(tiempos)
+    p50 = statistics.median(tiempos) * 1e6
+    p95 = tiempos[int(0.95 * (len(tiempos) - 1))] * 1e6
+    print(f"• {nombre:<38} p50 {p50:9.1f} µs   p95 {p95:9.1f} µs")
+
+
+def throughput(cot_chain, llamadas: int, concurrencia: int) -> float:
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrencia) as ex:
+        list(ex.map(lambda _: cot_chain.invoke(dict(PAYLOAD)), range(llamadas)))
+    return llamadas / (time.perf_counter() - inicio)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la capa LLM con modelo falso")
+    parser.add_argument("--llamadas", type=int, default=200)
+    parser.add_argument("--latencia_ms", type=float, default=50.0)
+    parser.add_argument("--concurrencia", type=int, nargs="+", default=[1, 4, 16, 64])
+    args = parser.parse_args()
+
+    print("=== Renderizado de prompts ===")
+    payload_estrategia = {**PAYLOAD, "temporada": "Vacaciones mitad de año"}
+    resumir("strategy_prompt.format", tiempos_por_llamada(
+        lambda: strategy_prompt.format(**payload_estrategia), args.llamadas))
+
+    print("\n=== Overhead del framework (latencia del modelo = 0) ===")
+    llm = FakeChatModel(latencia=0.0)
+    season_chain, strategy_chain, cot_chain = construir_cadenas(llm)
+    resumir("FakeChatModel.invoke (sin cadena)", tiempos_por_llamada(
+        lambda: llm.invoke(strategy_prompt.format(**payload_estrategia)), args.llamadas))
+    resumir("LLMChain (strategy_chain)", tiempos_por_llamada(
+        lambda: strategy_chain.invoke(dict(payload_estrategia)), args.llamadas))
+    resumir("SequentialChain (cot_chain, 2 LLM)", tiempos_por_llamada(
+        lambda: cot_chain.invoke(dict(PAYLOAD)), args.llamadas))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        entrada = os.path.join(tmp, "inspector_stats.txt")
+        with open(entrada, "w", encoding="utf-8") as f:
+            f.write("resumen de prueba\n" * 50)
+        agente = TemplateAgent("Analiza:\n{contenido}", "BENCH", llm=llm)
+        resumir("TemplateAgent.run (incluye E/S)", tiempos_por_llamada(
+            lambda: agente.run(entrada, output_dir=tmp), max(1, args.llamadas // 4)))
+
+    print(f"\n=== Throughput cot_chain (latencia {args.latencia_ms:.0f} ms por llamada LLM) ===")
+    llm_lento = FakeChatModel(latencia=("lognormal", _mu(args.latencia_ms / 1000), 0.25))
+    _, _, cot_lento = construir_cadenas(llm_lento)
+    ideal = 1 / (2 * args.latencia_ms / 1000)
+    for c in args.concurrencia:
+        llamadas = max(c * 4, min(args.llamadas, c * 20))
+        tps = throughput(cot_lento, llamadas, c)
+        print(f"• concurrencia {c:>3}: {tps:8.1f} sellers/s   (ideal {ideal * c:8.1f})")
+
+
+def _mu(media_s: float, sigma: float = 0.25) -> float:
+    """mu de una lognormal con la media indicada."""
+    import math
+    return math.log(media_s) - sigma ** 2 / 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark de la corrida nocturna: secuencial (scoring completo y luego LLM) vs
+productor / consumidor con cola acotada (llm.nightly.FlujoRecomendaciones).
+
+El scoring es real (features por seller en DuckDB + asignar_cluster sobre un
+listado sintético) y la generación usa FakeChatModel con latencia simulada.
+
+Uso (desde meli_insight_engine/):
+    python -m benchmarks.bench_nightly --filas 2000000 --sellers 2000 --latencia_ms 40 --workers 16
+"""
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault("DEEPSEEK_API_KEY", "benchmark")
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from core import conectar_duckdb  # noqa: E402
+from core.payloads import lotes_payloads  # noqa: E402
+from core.segmentation import cargar_modelos  # noqa: E402
+from llm.fake_model import FakeChatModel  # noqa: E402
+from llm.nightly import EscritorChunks, FlujoRecomendaciones, generador_llm  # noqa: E402
+
+
+def generar_listings(con, filas: int, sellers: int, seed: int = 42):
+    rng = np.random.default_rng(seed)
+    con.register("listings_df", pd.DataFrame({
+        "seller_nickname": np.char.add("s", rng.integers(0, sellers, filas).astype(str)),
+        "titulo": "Producto de prueba",
+        "seller_reputation": rng.choice(["green", "green_gold", "newbie", "yellow"], filas),
+        "stock": rng.integers(0, 200, filas),
+        "condition": rng.choice(["new", "used"], filas),
+        "is_refurbished": rng.random(filas) < 0.05,
+        "price": rng.lognormal(10, 1, filas),
+        "regular_price": np.where(rng.random(filas) < 0.3, rng.lognormal(10, 1, filas), np.nan),
+        "category_id": rng.choice([f"MCO{i}" for i in range(50)], filas),
+    }))
+    con.execute("CREATE TABLE listings AS SELECT * FROM listings_df")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--filas", type=int, default=2_000_000)
+    parser.add_argument("--sellers", type=int, default=2_000)
+    parser.add_argument("--latencia_ms", type=float, default=40)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--filas_por_lote", type=int, default=100)
+    args = parser.parse_args()
+
+    con = conectar_duckdb()
+    generar_listings(con, args.filas, args.sellers)
+    pre_pipe, kmeans = cargar_modelos("../models")
+    lotes = lambda: lotes_payloads(con, "listings", pre_pipe, kmeans, "2025-07-15",  # noqa: E731
+                                   filas_por_lote=args.filas_por_lote)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Secuencial: todos los payloads primero, luego las llamadas
+        llm = FakeChatModel(latencia=args.latencia_ms / 1000)
+        generar = generador_llm(llm)
+        inicio = time.perf_counter()
+        payloads = pd.concat(list(lotes()), ignore_index=True)
+        scoring = time.perf_counter() - inicio
+        with ThreadPoolExecutor(max_workers=args.workers) as ex:
+            respuestas = list(ex.map(generar, payloads.to_dict("records")))
+        escritor = EscritorChunks(os.path.join(tmp, "secuencial.jsonl"))
+        for p, r in zip(payloads.to_dict("records"), respuestas):
+            escritor.agregar({"seller_nickname": p["seller_nickname"], **r})
+        escritor.vaciar()
+        secuencial = time.perf_counter() - inicio
+        print(f"• secuencial: {secuencial:.2f}s (scoring {scoring:.2f}s + generación {secuencial - scoring:.2f}s)")
+
+        flujo = FlujoRecomendaciones(generador_llm(FakeChatModel(latencia=args.latencia_ms / 1000)),
+                                     workers=args.workers)
+        resumen = flujo.ejecutar(lotes(), os.path.join(tmp, "streaming.jsonl"))
+        print(f"• streaming:  {resumen['segundos']:.2f}s | speedup {secuencial / resumen['segundos']:.2f}x | "
+              f"productor bloqueado {resumen['segundos_bloqueado']:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Ajuste offline del planificador LLM (llm.scheduler) con el reloj virtual de simular().
+
+Compara FIFO contra WFQ + SJF con distintos márgenes de urgencia sobre una
+población sintética con la mezcla de segmentos indicada, bajo un límite
+global de tasa. No duerme: miles de sellers se simulan en segundos.
+
+Uso (desde meli_insight_engine/):
+    python -m benchmarks.bench_scheduler --sellers 20000 --workers 16 --tasa 8 --latencia 0.8 0.5
+"""
+import argparse
+import os
+
+os.environ.setdefault("DEEPSEEK_API_KEY", "benchmark")
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from llm.fake_model import FakeChatModel  # noqa: E402
+from llm.scheduler import CLASES_POR_DEFECTO, simular  # noqa: E402
+
+MEZCLA = {"Power Sellers": 0.05, "Sellers en Crecimiento": 0.15, "Cazadores de Oferta": 0.15,
+          "Liquidadores / Outlet": 0.05, "Sellers Ocasionales": 0.60}
+
+
+def poblacion(n: int, seed: int = 42) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "seller_nickname": [f"s{i}" for i in range(n)],
+        "fecha_actual": "2025-07-15",
+        "cluster_name": rng.choice(list(MEZCLA), n, p=list(MEZCLA.values())),
+        "publicaciones": rng.lognormal(3, 1.5, n).astype(int) + 1,
+        "categorias_distintas": rng.integers(1, 30, n),
+        "stock_promedio": rng.integers(0, 500, n),
+        "precio_medio_cop": rng.lognormal(11, 1, n).astype(int),
+        "descuento_pct": rng.uniform(0, 0.4, n).round(3),
+        "rep_score": rng.uniform(0, 5, n).round(2),
+        "tasa_cancelacion": 0.0,
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sellers", type=int, default=20_000)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--tasa", type=float, default=8, help="Solicitudes por segundo (límite global).")
+    parser.add_argument("--latencia", type=float, nargs=2, default=[0.8, 0.5],
+                        help="mu y sigma de la latencia lognormal (segundos).")
+    parser.add_argument("--margenes", type=float, nargs="*", default=[0, 300, 1800])
+    args = parser.parse_args()
+
+    payloads = poblacion(args.sellers)
+    escenarios = [("fifo", 0)] + [("wfq", m) for m in args.margenes]
+    filas = []
+    for politica, margen in escenarios:
+        llm = FakeChatModel(dormir=False, latencia=("lognormal", *args.latencia))
+        r = simular(payloads, llm, CLASES_POR_DEFECTO, workers=args.workers, tasa_por_segundo=args.tasa,
+                    politica=politica, margen_urgencia=margen, verbose=False)
+        reporte = r["reporte"]
+        filas.append({"politica": politica, "margen_s": margen, "horas": r["segundos"] / 3600,
+                      "incumplidos": int(reporte["plazos_incumplidos"].sum()), "urgentes": r["urgentes"],
+                      **{f"espera_h[{c}]": reporte.loc[c, "espera_media_s"] / 3600 for c in reporte.index}})
+    print(pd.DataFrame(filas).round(2).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
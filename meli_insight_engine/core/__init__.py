@@ -1,5 +1,32 @@
 from .connection import conectar_duckdb
-from .loader import registrar_csvs_como_vistas, verificar_vistas
+from .loader import (
+    registrar_csvs_como_vistas,
+    verificar_vistas,
+    ingestar_en_parquet,
+    ingestar_listings_particionados,
+    registrar_parquet_como_vista
+)
+from .catalog import Catalogo, catalogo
+from .segmentation import (
+    cargar_modelos,
+    ReclasificadorIncremental,
+    reclasificar_incremental
+)
+from .cluster_udf import (
+    CLUSTER_NAME,
+    registrar_udf_cluster,
+    clusters_seller,
+    cluster_stats_empiricas
+)
+from .duplicates import indice_variedad_difuso, variedad_difusa
+from .similarity import IndiceSimilitud, construir_indice_similitud
+from .sharding import SketchCuantiles, agregacion_por_shards
+from .pipeline import Etapa, Pipeline
+from .projection import ProyeccionPCA, construir_proyeccion
+from .stability import estabilidad_bootstrap, evaluar_estabilidad
+from .drift import ReferenciaDrift, MonitorDrift, drift_duckdb
+from .validation import ReglaCalidad, validar_calidad
+from .payloads import payloads_desde_features, lotes_payloads
 from .inspector import (
     resumen_columnas, 
     distribucion_categoria, 
@@ -31,6 +58,37 @@ __all__ = [
     "conectar_duckdb",
     "registrar_csvs_como_vistas",
     "verificar_vistas",
+    "ingestar_en_parquet",
+    "ingestar_listings_particionados",
+    "registrar_parquet_como_vista",
+    "Catalogo",
+    "catalogo",
+    "cargar_modelos",
+    "ReclasificadorIncremental",
+    "reclasificar_incremental",
+    "CLUSTER_NAME",
+    "registrar_udf_cluster",
+    "clusters_seller",
+    "cluster_stats_empiricas",
+    "indice_variedad_difuso",
+    "variedad_difusa",
+    "IndiceSimilitud",
+    "construir_indice_similitud",
+    "SketchCuantiles",
+    "agregacion_por_shards",
+    "Etapa",
+    "Pipeline",
+    "ProyeccionPCA",
+    "construir_proyeccion",
+    "estabilidad_bootstrap",
+    "evaluar_estabilidad",
+    "ReferenciaDrift",
+    "MonitorDrift",
+    "drift_duckdb",
+    "ReglaCalidad",
+    "validar_calidad",
+    "payloads_desde_features",
+    "lotes_payloads",
     "resumen_columnas",
     "distribucion_categoria",
     "info_tabla",
@@ -0,0 +1,217 @@
+"""
+Catálogo de metadatos de las vistas registradas en una conexión DuckDB.
+
+El inspector necesita el esquema de la tabla en casi todas sus funciones y el
+número de filas en varias; sin catálogo cada una lo vuelve a pedir con
+DESCRIBE TABLE / COUNT(*). El catálogo guarda por vista:
+
+- esquema (salida de DESCRIBE) y roles de columna: numerica, categorica,
+  texto, fecha
+- número de filas (sin filtro)
+- estadísticas de los archivos fuente: cantidad, bytes, (tamaño, mtime) por archivo
+
+Lo crean registrar_csvs_como_vistas / registrar_parquet_como_vista y hay uno
+por conexión. Antes de devolver metadatos se comparan tamaño y mtime de las
+fuentes (solo os.stat, sin leerlas): si alguna cambió, se descarta lo
+cacheado de esa vista. Las vistas y tablas que no se registraron desde
+archivos no se cachean (se describen en cada llamada): un CREATE OR REPLACE
+o un INSERT no dejan rastro barato de consultar.
+"""
+import glob
+import os
+import re
+import weakref
+
+import pandas as pd
+
+TIPOS_NUMERICOS = "INT|DOUBLE|FLOAT|DECIMAL|REAL|NUMERIC"
+TIPOS_FECHA = "DATE|TIME"
+TIPOS_TEXTO = "CHAR|TEXT|STRING"
+# Una columna de texto es categórica si sus valores distintos no superan el 5% de
+# las filas (o 20 en tablas chicas): seller_nickname, category_id, condition...
+PROPORCION_CATEGORICA = 0.05
+MIN_CATEGORIAS = 20
+ROLES = ("numerica", "categorica", "texto", "fecha", "otra")
+
+_CATALOGOS = weakref.WeakKeyDictionary()
+
+
+def catalogo(con) -> "Catalogo":
+    """Catálogo asociado a la conexión (se crea vacío la primera vez)."""
+    if con not in _CATALOGOS:
+        _CATALOGOS[con] = Catalogo(con)
+    return _CATALOGOS[con]
+
+
+def _rol_por_tipo(tipo: str) -> str:
+    if re.search(TIPOS_NUMERICOS, tipo, re.IGNORECASE):
+        return "numerica"
+    if re.search(TIPOS_FECHA, tipo, re.IGNORECASE):
+        return "fecha"
+    if tipo.upper() == "BOOLEAN":
+        return "categorica"
+    if re.search(TIPOS_TEXTO, tipo, re.IGNORECASE):
+        return "texto"
+    return "otra"
+
+
+class EntradaCatalogo:
+    """
+    Metadatos de una vista.
+
+    Args:
+        nombre: Nombre de la vista (p. ej. "data.listings")
+        fuentes: Rutas o patrones glob de los archivos que lee la vista
+    """
+
+    def __init__(self, nombre: str, fuentes=()):
+        self.nombre = nombre
+        self.fuentes = list(fuentes)
+        self.firma = self._firma_actual()
+        self.limpiar()
+
+    def limpiar(self):
+        self.esquema = None
+        self.filas = None
+        self.roles = None
+
+    def archivos(self) -> list:
+        return sorted({a for f in self.fuentes for a in glob.glob(f, recursive=True) if os.path.isfile(a)})
+
+    def _firma_actual(self):
+        firma = []
+        for archivo in self.archivos():
+            st = os.stat(archivo)
+            firma.append((archivo, st.st_size, st.st_mtime_ns))
+        return tuple(firma)
+
+    @property
+    def cacheable(self) -> bool:
+        """Solo las vistas registradas desde archivos tienen cómo detectar cambios."""
+        return bool(self.fuentes)
+
+    def vigente(self) -> bool:
+        """Compara tamaño y mtime de las fuentes; si cambiaron, descarta lo cacheado."""
+        if not self.cacheable:
+            return False
+        firma = self._firma_actual()
+        if firma != self.firma:
+            self.firma = firma
+            self.limpiar()
+            return False
+        return True
+
+    def estadisticas_archivos(self) -> pd.DataFrame:
+        return pd.DataFrame(self.firma, columns=["archivo", "bytes", "mtime_ns"])
+
+
+class Catalogo:
+    """
+    Registro de metadatos por vista de una conexión. Se obtiene con catalogo(con).
+
+    Args:
+        con: Conexión a DuckDB
+    """
+
+    def __init__(self, con):
+        self._con = weakref.ref(con)
+        self.entradas = {}
+        self.consultas = 0
+
+    @property
+    def con(self):
+        return self._con()
+
+    def registrar(self, tabla: str, fuentes=()) -> EntradaCatalogo:
+        """Da de alta (o reemplaza) una vista y las fuentes de las que depende."""
+        self.entradas[tabla] = EntradaCatalogo(tabla, fuentes)
+        return self.entradas[tabla]
+
+    def invalidar(self, tabla: str = None):
+        """Descarta los metadatos de una vista (o de todas)."""
+        for entrada in ([self.entradas[tabla]] if tabla in self.entradas else
+                        [] if tabla else self.entradas.values()):
+            entrada.limpiar()
+
+    def entrada(self, tabla: str) -> EntradaCatalogo:
+        """Entrada registrada, o una transitoria (sin caché) para vistas / tablas no registradas."""
+        entrada = self.entradas.get(tabla)
+        if entrada is None or not entrada.cacheable:
+            return EntradaCatalogo(tabla)
+        entrada.vigente()
+        return entrada
+
+    def _ejecutar(self, query: str):
+        self.consultas += 1
+        return self.con.execute(query)
+
+    # -- metadatos -----------------------------------------------------------
+
+    def esquema(self, tabla: str) -> pd.DataFrame:
+        """Salida de DESCRIBE TABLE (copia: el llamador puede modificarla)."""
+        entrada = self.entrada(tabla)
+        if entrada.esquema is None:
+            entrada.esquema = self._ejecutar(f'DESCRIBE TABLE "{tabla}"').fetchdf()
+        return entrada.esquema.copy() if entrada.cacheable else entrada.esquema
+
+    def columnas(self, tabla: str, tipos: str = None) -> list:
+        """Nombres de columna (opcionalmente solo los de tipo que coincida con la regex `tipos`)."""
+        entrada = self.entrada(tabla)
+        esquema = entrada.esquema if entrada.esquema is not None else self.esquema(tabla)
+        return [c for c, t in zip(esquema["column_name"], esquema["column_type"])
+                if tipos is None or re.search(tipos, t, re.IGNORECASE)]
+
+    def filas(self, tabla: str) -> int:
+        """Número de filas de la vista completa (sin filtro)."""
+        entrada = self.entrada(tabla)
+        if entrada.filas is not None:
+            return entrada.filas
+        filas = self._ejecutar(f'SELECT COUNT(*) FROM "{tabla}"').fetchone()[0]
+        self.anotar_filas(tabla, filas)
+        return filas
+
+    def anotar_filas(self, tabla: str, filas: int):
+        """Guarda un conteo sin filtro calculado por otra consulta (p. ej. resumen_columnas)."""
+        entrada = self.entrada(tabla)
+        if entrada.cacheable:
+            entrada.filas = int(filas)
+
+    def roles(self, tabla: str) -> dict:
+        """
+        {columna: rol}. El tipo decide numérica / fecha; las de texto se separan en
+        categórica o texto con approx_count_distinct en un solo escaneo.
+        """
+        entrada = self.entrada(tabla)
+        if entrada.roles is not None:
+            return dict(entrada.roles)
+        esquema = self.esquema(tabla)
+        roles = {c: _rol_por_tipo(t) for c, t in zip(esquema["column_name"], esquema["column_type"])}
+        textos = [c for c, r in roles.items() if r == "texto"]
+        if textos:
+            distintos = ", ".join(f'approx_count_distinct("{c}")' for c in textos)
+            fila = self._ejecutar(f'SELECT COUNT(*), {distintos} FROM "{tabla}"').fetchone()
+            self.anotar_filas(tabla, fila[0])
+            limite = max(PROPORCION_CATEGORICA * fila[0], MIN_CATEGORIAS)
+            for c, n in zip(textos, fila[1:]):
+                roles[c] = "categorica" if n <= limite else "texto"
+        if entrada.cacheable:
+            entrada.roles = roles
+        return dict(roles)
+
+    def columnas_por_rol(self, tabla: str, rol: str) -> list:
+        if rol not in ROLES:
+            raise ValueError(f"Rol desconocido: {rol}. Opciones: {ROLES}")
+        return [c for c, r in self.roles(tabla).items() if r == rol]
+
+    def estadisticas_archivos(self, tabla: str) -> pd.DataFrame:
+        return self.entrada(tabla).estadisticas_archivos()
+
+    def resumen(self) -> pd.DataFrame:
+        """Una fila por vista con lo que hay en caché."""
+        filas = []
+        for nombre, entrada in self.entradas.items():
+            filas.append({"vista": nombre, "archivos": len(entrada.firma),
+                          "bytes": sum(f[1] for f in entrada.firma),
+                          "columnas": None if entrada.esquema is None else len(entrada.esquema),
+                          "filas": entrada.filas})
+        return pd.DataFrame(filas, columns=["vista", "archivos", "bytes", "columnas", "filas"])
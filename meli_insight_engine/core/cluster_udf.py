@@ -0,0 +1,167 @@
+"""
+Inferencia de cluster (pre_pipe + kmeans) como UDF vectorizada de DuckDB.
+
+Los parámetros entrenados se extraen una vez como arrays NumPy:
+- SimpleImputer(median)  -> statistics_
+- RobustScaler           -> center_, scale_
+- KMeans                 -> cluster_centers_
+
+y la UDF `meli_cluster(<9 features>)` los aplica sobre lotes Arrow, de modo
+que la asignación de segmento, los agregados por cluster y
+cluster_stats_empiricas salen de una sola sentencia SQL.
+"""
+import numpy as np
+
+from .features import FEATURES, sql_features_seller
+
+CLUSTER_NAME = {
+    1: "Power Sellers",
+    2: "Sellers en Crecimiento",
+    0: "Sellers Ocasionales",
+    3: "Cazadores de Oferta",
+    4: "Liquidadores / Outlet",
+}
+
+NOMBRE_UDF = "meli_cluster"
+
+
+def parametros_escalado(pre_pipe) -> dict:
+    """Arrays NumPy equivalentes a pre_pipe.transform (mediana, centro y escala)."""
+    imputer = pre_pipe.named_steps["imputer"]
+    scaler = pre_pipe.named_steps["scaler"]
+    if list(pre_pipe.feature_names_in_) != FEATURES:
+        raise ValueError(f"pre_pipe espera {list(pre_pipe.feature_names_in_)}, no {FEATURES}")
+    return {
+        "mediana": np.asarray(imputer.statistics_, dtype=np.float64),
+        "centro": (np.asarray(scaler.center_, dtype=np.float64)
+                   if scaler.with_centering else np.zeros(len(FEATURES))),
+        "escala": (np.asarray(scaler.scale_, dtype=np.float64)
+                   if scaler.with_scaling else np.ones(len(FEATURES))),
+    }
+
+
+def parametros_modelo(pre_pipe, kmeans) -> dict:
+    """Arrays NumPy equivalentes a pre_pipe.transform + kmeans.predict."""
+    return {**parametros_escalado(pre_pipe),
+            "centroides": np.asarray(kmeans.cluster_centers_, dtype=np.float64)}
+
+
+def asignar_cluster(X: np.ndarray, parametros: dict) -> np.ndarray:
+    """Cluster por fila para una matriz (n, 9) en escala original; NaN se imputa con la mediana."""
+    X = np.array(X, dtype=np.float64)
+    nulos = np.isnan(X)
+    if nulos.any():
+        X[nulos] = np.broadcast_to(parametros["mediana"], X.shape)[nulos]
+    X -= parametros["centro"]
+    X /= parametros["escala"]
+    c = parametros["centroides"]
+    # ||x - c||² = ||x||² - 2 x·c + ||c||²; ||x||² no cambia el argmin
+    return (-2 * X @ c.T + (c ** 2).sum(axis=1)).argmin(axis=1)
+
+
+def registrar_udf_cluster(con, pre_pipe=None, kmeans=None, directorio: str = "models",
+                          nombre: str = NOMBRE_UDF):
+    """
+    Registra `nombre(categorias_distintas, ..., titulo_length_avg) -> INTEGER` en la conexión.
+
+    Si no se pasan pre_pipe/kmeans se cargan desde `directorio`.
+    """
+    import pyarrow as pa
+
+    if pre_pipe is None or kmeans is None:
+        from .segmentation import cargar_modelos
+        pre_pipe, kmeans = cargar_modelos(directorio)
+    parametros = parametros_modelo(pre_pipe, kmeans)
+
+    # DuckDB inspecta la firma: se necesitan los nueve parámetros explícitos (no *args)
+    def _udf(categorias_distintas, log_price_avg, log_stock_avg, num_publicaciones,
+             porc_descuento, proporcion_refurb, proporcion_usados, rep_score, titulo_length_avg):
+        columnas = (categorias_distintas, log_price_avg, log_stock_avg, num_publicaciones,
+                    porc_descuento, proporcion_refurb, proporcion_usados, rep_score, titulo_length_avg)
+        X = np.column_stack([c.to_numpy(zero_copy_only=False).astype(np.float64) for c in columnas])
+        # pa.array con conversión de tipo copia a memoria de Arrow; devolver un array que
+        # apunte a memoria de NumPy hace abortar a DuckDB al cerrar el intérprete
+        return pa.array(asignar_cluster(X, parametros), type=pa.int32())
+
+    # null_handling="special": los NULL llegan a la función y se imputan como en pre_pipe
+    con.create_function(nombre, _udf, ["DOUBLE"] * len(FEATURES), "INTEGER",
+                        type="arrow", null_handling="special")
+    return con
+
+
+def nombrar_clusters(pre_pipe, kmeans, pre_pipe_ref, kmeans_ref, nombres: dict = None) -> dict:
+    """
+    {id de `kmeans`: nombre} para un KMeans reentrenado.
+
+    CLUSTER_NAME vale para los ids del kmeans.pkl del notebook; tras reentrenar,
+    los ids son arbitrarios. Los centroides de referencia se llevan a escala
+    original y de ahí a la escala de `pre_pipe`, y se emparejan con los nuevos
+    por asignación húngara (como stability.alinear_centroides). Si hay más clusters
+    que nombres, los que sobran toman el nombre del centroide de referencia más
+    cercano; si hay menos, hay nombres que no se asignan.
+    """
+    from scipy.optimize import linear_sum_assignment
+
+    nombres = CLUSTER_NAME if nombres is None else nombres
+    nuevo, ref = parametros_modelo(pre_pipe, kmeans), parametros_modelo(pre_pipe_ref, kmeans_ref)
+    referencia = (ref["centroides"] * ref["escala"] + ref["centro"] - nuevo["centro"]) / nuevo["escala"]
+    costo = ((nuevo["centroides"][:, None, :] - referencia[None, :, :]) ** 2).sum(axis=2)
+    asignado = costo.argmin(axis=1)
+    filas, columnas = linear_sum_assignment(costo)
+    asignado[filas] = columnas
+    return {int(j): nombres.get(int(r), "Desconocido") for j, r in enumerate(asignado)}
+
+
+def sql_nombre_cluster(columna: str = "cluster") -> str:
+    casos = " ".join(f"WHEN {k} THEN '{v}'" for k, v in CLUSTER_NAME.items())
+    return f"CASE {columna} {casos} ELSE 'Desconocido' END"
+
+
+def sql_cluster_seller(tabla: str, filtro: str = None, nombre_udf: str = NOMBRE_UDF) -> str:
+    """Features por seller más cluster y cluster_name, calculados dentro de DuckDB."""
+    argumentos = ", ".join(f"CAST({f} AS DOUBLE)" for f in FEATURES)
+    return f"""
+        SELECT *, {sql_nombre_cluster()} AS cluster_name
+        FROM (
+            SELECT *, {nombre_udf}({argumentos}) AS cluster
+            FROM ({sql_features_seller(tabla, filtro)})
+        )
+    """
+
+
+def sql_cluster_stats(tabla: str, filtro: str = None, nombre_udf: str = NOMBRE_UDF, pre_pipe=None) -> str:
+    """
+    Media y mediana de cada feature por cluster, más el número de sellers.
+
+    Con `pre_pipe` las features se imputan y escalan como en pre_pipe.transform,
+    igual que cluster_stats_empiricas del notebook 02 (calculado sobre
+    df_challenge_meli_limpio.csv, ya escalado). Sin pre_pipe son estadísticas
+    de las features crudas de sql_features_seller y no se comparan con ese CSV.
+    """
+    valores = {f: f for f in FEATURES}
+    if pre_pipe is not None:
+        p = parametros_escalado(pre_pipe)
+        valores = {f: f"((COALESCE({f}, {p['mediana'][i]!r}) - {p['centro'][i]!r}) / {p['escala'][i]!r})"
+                   for i, f in enumerate(FEATURES)}
+    agregados = ",\n            ".join(
+        f"ROUND(AVG({v}), 2) AS {f}_mean, ROUND(MEDIAN({v}), 2) AS {f}_median" for f, v in valores.items())
+    return f"""
+        SELECT cluster, ANY_VALUE(cluster_name) AS cluster_name, COUNT(*) AS n_sellers,
+            {agregados}
+        FROM ({sql_cluster_seller(tabla, filtro, nombre_udf)})
+        GROUP BY cluster
+        ORDER BY cluster
+    """
+
+
+def clusters_seller(con, tabla: str, filtro: str = None):
+    """DataFrame por seller con features, cluster y cluster_name (requiere registrar_udf_cluster)."""
+    return con.execute(sql_cluster_seller(tabla, filtro)).fetchdf()
+
+
+def cluster_stats_empiricas(con, tabla: str, filtro: str = None, pre_pipe=None):
+    """
+    Estadísticas por cluster en una sola consulta (requiere registrar_udf_cluster);
+    con `pre_pipe`, en la escala del notebook 02 (ver sql_cluster_stats).
+    """
+    return con.execute(sql_cluster_stats(tabla, filtro, pre_pipe=pre_pipe)).fetchdf()
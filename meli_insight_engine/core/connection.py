@@ -1,5 +1,14 @@
 import duckdb
 
-def conectar_duckdb(path_db: str = ":memory:"):
-    """Establece una conexión a DuckDB (por defecto, en memoria)."""
-    return duckdb.connect(path_db)
\ No newline at end of file
+def conectar_duckdb(path_db: str = ":memory:", modelos: str = None):
+    """
+    Establece una conexión a DuckDB (por defecto, en memoria).
+
+    Si se indica `modelos` (carpeta con pre_pipe.pkl y kmeans.pkl) se registra
+    además la UDF meli_cluster(...) para segmentar sellers desde SQL.
+    """
+    con = duckdb.connect(path_db)
+    if modelos:
+        from .cluster_udf import registrar_udf_cluster
+        registrar_udf_cluster(con, directorio=modelos)
+    return con
@@ -0,0 +1,193 @@
+"""
+Monitor de drift de las FEATURES contra la distribución de entrenamiento.
+
+Referencia (al entrenar pre_pipe / kmeans): por feature, los cortes de sus
+cuantiles y la proporción de sellers en cada bin, más un bin de nulos. Es un
+JSON de pocos KB.
+
+Por lote de scoring se cuentan los sellers por bin:
+- MonitorDrift.actualizar: np.searchsorted sobre la matriz del lote
+  (acumulable lote a lote, ~ms por 100k sellers)
+- drift_duckdb: una sola pasada de DuckDB con histogram() por feature
+
+y se comparan los conteos acumulados contra la referencia:
+- PSI = Σ (p - q) · ln(p / q)  (umbrales usuales 0.1 advertencia, 0.25 alerta)
+- KS sobre los bins: max |F_ref - F_lote| evaluada en los cortes. Con bins por
+  cuantil es una cota inferior del KS exacto con error < 1 / bins.
+"""
+import json
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from .features import FEATURES, sql_features_seller
+
+BINS_POR_DEFECTO = 20
+UMBRAL_PSI = (0.1, 0.25)
+UMBRAL_KS = (0.1, 0.2)
+EPSILON = 1e-4
+
+
+class ReferenciaDrift:
+    """
+    Args:
+        cortes: {feature: cortes internos crecientes}
+        proporciones: {feature: proporción por bin (len(cortes) + 1 bins + 1 de nulos)}
+        n: Sellers de la referencia
+    """
+
+    def __init__(self, cortes: dict, proporciones: dict, n: int):
+        self.cortes = {f: np.asarray(c, dtype=np.float64) for f, c in cortes.items()}
+        self.proporciones = {f: np.asarray(p, dtype=np.float64) for f, p in proporciones.items()}
+        self.n = int(n)
+
+    @property
+    def features(self):
+        return list(self.cortes)
+
+    @classmethod
+    def desde_features(cls, features: pd.DataFrame, bins: int = BINS_POR_DEFECTO, columnas=FEATURES):
+        """Cortes por cuantil (sin repetidos) y proporciones a partir de las features de entrenamiento."""
+        cortes, proporciones = {}, {}
+        for f in columnas:
+            valores = features[f].to_numpy(dtype=np.float64)
+            validos = valores[~np.isnan(valores)]
+            q = np.quantile(validos, np.linspace(0, 1, bins + 1)[1:-1]) if len(validos) else np.array([])
+            cortes[f] = np.unique(q)
+            proporciones[f] = _conteos(valores, cortes[f]) / max(len(valores), 1)
+        return cls(cortes, proporciones, len(features))
+
+    @classmethod
+    def desde_duckdb(cls, con, tabla: str, filtro: str = None, bins: int = BINS_POR_DEFECTO):
+        return cls.desde_features(con.execute(sql_features_seller(tabla, filtro)).fetchdf(), bins)
+
+    def guardar(self, ruta: str):
+        with open(ruta, "w", encoding="utf-8") as f:
+            json.dump({"n": self.n,
+                       "cortes": {k: v.tolist() for k, v in self.cortes.items()},
+                       "proporciones": {k: v.tolist() for k, v in self.proporciones.items()}}, f)
+        return ruta
+
+    @classmethod
+    def cargar(cls, ruta: str) -> "ReferenciaDrift":
+        with open(ruta, encoding="utf-8") as f:
+            datos = json.load(f)
+        return cls(datos["cortes"], datos["proporciones"], datos["n"])
+
+
+def _indices(valores: np.ndarray, cortes: np.ndarray) -> np.ndarray:
+    """Bin de cada valor: número de cortes <= valor; los NaN van al último bin."""
+    idx = np.searchsorted(cortes, valores, side="right")
+    idx[np.isnan(valores)] = len(cortes) + 1
+    return idx
+
+
+def _conteos(valores: np.ndarray, cortes: np.ndarray) -> np.ndarray:
+    return np.bincount(_indices(valores, cortes), minlength=len(cortes) + 2).astype(np.float64)
+
+
+def psi(p_ref: np.ndarray, p_nuevo: np.ndarray, epsilon: float = EPSILON) -> float:
+    p = np.maximum(p_ref, epsilon)
+    q = np.maximum(p_nuevo, epsilon)
+    return float(((q - p) * np.log(q / p)).sum())
+
+
+def ks_binned(p_ref: np.ndarray, p_nuevo: np.ndarray) -> float:
+    """KS entre las CDF de los valores no nulos (sin el bin de nulos), evaluada en los cortes."""
+    a, b = p_ref[:-1], p_nuevo[:-1]
+    if a.sum() == 0 or b.sum() == 0:
+        return 0.0
+    return float(np.abs(np.cumsum(a) / a.sum() - np.cumsum(b) / b.sum()).max())
+
+
+def _nivel(valor: float, umbrales) -> str:
+    return "alerta" if valor >= umbrales[1] else "advertencia" if valor >= umbrales[0] else "ok"
+
+
+def reporte_drift(referencia: ReferenciaDrift, conteos: dict, umbral_psi=UMBRAL_PSI,
+                  umbral_ks=UMBRAL_KS) -> pd.DataFrame:
+    """PSI, KS y nivel por feature a partir de conteos por bin."""
+    filas = []
+    for f in referencia.features:
+        c = np.asarray(conteos[f], dtype=np.float64)
+        n = c.sum()
+        p = c / n if n else c
+        valor_psi = psi(referencia.proporciones[f], p) if n else np.nan
+        valor_ks = ks_binned(referencia.proporciones[f], p) if n else np.nan
+        niveles = [_nivel(valor_psi, umbral_psi), _nivel(valor_ks, umbral_ks)] if n else ["ok"]
+        filas.append({"feature": f, "n": int(n), "psi": valor_psi, "ks": valor_ks,
+                      "nulos_ref": referencia.proporciones[f][-1], "nulos": p[-1] if n else np.nan,
+                      "nivel": max(niveles, key=["ok", "advertencia", "alerta"].index)})
+    return pd.DataFrame(filas)
+
+
+class MonitorDrift:
+    """
+    Acumula conteos por bin de los lotes de scoring y compara contra la referencia.
+
+    Args:
+        referencia: ReferenciaDrift (o ruta a su JSON)
+        umbral_psi / umbral_ks: (advertencia, alerta)
+        alertar: Si es True, reporte() emite un warnings.warn por feature en alerta
+    """
+
+    def __init__(self, referencia, umbral_psi=UMBRAL_PSI, umbral_ks=UMBRAL_KS, alertar: bool = True):
+        self.referencia = ReferenciaDrift.cargar(referencia) if isinstance(referencia, str) else referencia
+        self.umbral_psi = umbral_psi
+        self.umbral_ks = umbral_ks
+        self.alertar = alertar
+        self.reiniciar()
+
+    def reiniciar(self):
+        self.conteos = {f: np.zeros(len(c) + 2) for f, c in self.referencia.cortes.items()}
+        self.lotes = 0
+
+    def actualizar(self, lote) -> "MonitorDrift":
+        """
+        Args:
+            lote: DataFrame, pyarrow.Table/RecordBatch o matriz (n, 9) en el orden de FEATURES
+        """
+        for j, f in enumerate(self.referencia.features):
+            if isinstance(lote, np.ndarray):
+                valores = lote[:, j]
+            elif isinstance(lote, pd.DataFrame):
+                valores = lote[f].to_numpy(dtype=np.float64)
+            else:
+                valores = lote.column(f).to_numpy(zero_copy_only=False)
+            self.conteos[f] += _conteos(np.asarray(valores, dtype=np.float64), self.referencia.cortes[f])
+        self.lotes += 1
+        return self
+
+    def reporte(self) -> pd.DataFrame:
+        reporte = reporte_drift(self.referencia, self.conteos, self.umbral_psi, self.umbral_ks)
+        if self.alertar:
+            for fila in reporte[reporte["nivel"] == "alerta"].itertuples():
+                warnings.warn(f"Drift en {fila.feature}: PSI={fila.psi:.3f} KS={fila.ks:.3f}", stacklevel=2)
+        return reporte
+
+    def alertas(self) -> list:
+        reporte = reporte_drift(self.referencia, self.conteos, self.umbral_psi, self.umbral_ks)
+        return reporte.loc[reporte["nivel"] == "alerta", "feature"].tolist()
+
+
+def sql_histogramas_drift(tabla: str, referencia: ReferenciaDrift, filtro: str = None) -> str:
+    """Una sola pasada: histogram() del bin de cada feature sobre las features por seller."""
+    partes = []
+    for f, cortes in referencia.cortes.items():
+        comparaciones = " + ".join(f"CAST({f} >= {float(c)!r} AS INTEGER)" for c in cortes) or "0"
+        partes.append(f"histogram(CASE WHEN {f} IS NULL OR isnan({f}) THEN {len(cortes) + 1} "
+                      f"ELSE {comparaciones} END) AS {f}")
+    return f"SELECT {', '.join(partes)} FROM ({sql_features_seller(tabla, filtro)})"
+
+
+def drift_duckdb(con, tabla: str, referencia: ReferenciaDrift, filtro: str = None, **umbrales) -> pd.DataFrame:
+    """Reporte de drift de una tabla de publicaciones en una sola consulta."""
+    fila = con.execute(sql_histogramas_drift(tabla, referencia, filtro)).fetchone()
+    conteos = {}
+    for f, hist in zip(referencia.features, fila):
+        c = np.zeros(len(referencia.cortes[f]) + 2)
+        for k, v in (hist or {}).items():
+            c[int(k)] = v
+        conteos[f] = c
+    return reporte_drift(referencia, conteos, **umbrales)
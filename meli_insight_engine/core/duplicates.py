@@ -0,0 +1,258 @@
+"""
+Detección de títulos casi duplicados con MinHash + LSH.
+
+indice_variedad cuenta títulos exactos con COUNT(DISTINCT titulo) y no ve a
+los sellers que repiten el mismo título con pequeñas ediciones. Aquí:
+
+1. Se normaliza el título (minúsculas, solo alfanuméricos) con Arrow.
+2. Se calculan hashes de k-shingles de caracteres sobre el buffer UTF-8
+   completo de la partición (rolling hash vectorizado con NumPy).
+3. Firma MinHash por título (permutaciones afines de 32 bits) con np.minimum.reduceat.
+4. LSH por bandas: títulos del mismo seller con la misma banda son candidatos;
+   se verifican con la similitud estimada de la firma y se unen con
+   connected_components.
+
+Todo es lineal en el número de títulos (salvo el sort por banda) y las
+particiones de sellers se procesan en paralelo en procesos separados.
+"""
+import glob
+import os
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+K_SHINGLE = 5
+BANDAS = 16
+FILAS_POR_BANDA = 4
+UMBRAL_JACCARD = 0.8
+SEMILLA = 1234
+
+_MASCARA_32 = np.uint64(0xFFFFFFFF)
+_PRIMO_ROLLING = np.uint64(1099511628211)
+
+
+def normalizar_titulos(titulos, k: int = K_SHINGLE):
+    """Minúsculas, solo letras/dígitos separados por un espacio y relleno hasta k caracteres."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    arr = titulos if isinstance(titulos, (pa.Array, pa.ChunkedArray)) else pa.array(titulos, type=pa.string())
+    if isinstance(arr, pa.ChunkedArray):
+        arr = arr.combine_chunks()
+    arr = pc.utf8_lower(pc.cast(arr, pa.string()))
+    arr = pc.replace_substring_regex(arr, r"[^\pL\pN]+", " ")
+    arr = pc.utf8_trim_whitespace(arr)
+    return pc.utf8_rpad(pc.fill_null(arr, ""), width=k, padding=" ")
+
+
+def hashes_shingles(titulos_norm, k: int = K_SHINGLE):
+    """
+    Hashes de 32 bits de todos los k-shingles (en bytes) de cada título.
+
+    Returns:
+        (hashes uint32, inicios int64): los shingles del título t son
+        hashes[inicios[t]:inicios[t + 1]]
+    """
+    n = len(titulos_norm)
+    offsets = np.frombuffer(titulos_norm.buffers()[1], dtype=np.int32)[
+        titulos_norm.offset:titulos_norm.offset + n + 1].astype(np.int64)
+    datos = np.frombuffer(titulos_norm.buffers()[2], dtype=np.uint8)
+    datos = datos[offsets[0]:offsets[-1]].astype(np.uint64)
+    offsets -= offsets[0]
+
+    # Rolling hash de cada ventana de k bytes (aritmética uint64 con desborde)
+    ventanas = max(0, len(datos) - k + 1)
+    h = np.zeros(ventanas, dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for j in range(k):
+            h = h * _PRIMO_ROLLING + datos[j:j + ventanas]
+
+    # Solo ventanas que no cruzan el final del título (todos miden >= k por el relleno)
+    por_titulo = np.diff(offsets) - k + 1
+    inicios = np.concatenate([[0], np.cumsum(por_titulo)])
+    pos = np.arange(inicios[-1]) + np.repeat(offsets[:-1] - inicios[:-1], por_titulo)
+    s = h[pos]
+    return ((s ^ (s >> np.uint64(32))) & _MASCARA_32).astype(np.uint32), inicios
+
+
+def firmas_minhash(hashes: np.ndarray, inicios: np.ndarray, num_perm: int = BANDAS * FILAS_POR_BANDA,
+                   semilla: int = SEMILLA, shingles_por_bloque: int = 1 << 16) -> np.ndarray:
+    """
+    Firma MinHash (n_titulos, num_perm) uint32.
+
+    Cada permutación es h -> a·h + b (mod 2^32) con a impar, una biyección de 32
+    bits. Se recorre por bloques de ~64k shingles para que el bloque quede en
+    caché mientras se aplican todas las permutaciones (≈8x más rápido que
+    recorrer el arreglo completo una vez por permutación).
+    """
+    rng = np.random.default_rng(semilla)
+    a = rng.integers(0, 2 ** 32, num_perm, dtype=np.uint64).astype(np.uint32) | np.uint32(1)
+    b = rng.integers(0, 2 ** 32, num_perm, dtype=np.uint64).astype(np.uint32)
+    n = len(inicios) - 1
+    firmas = np.empty((num_perm, n), dtype=np.uint32)
+    if len(hashes) == 0:
+        firmas[:] = np.iinfo(np.uint32).max
+        return firmas.T
+    i0 = 0
+    while i0 < n:
+        # Bloque de títulos completos (al menos uno) con ~shingles_por_bloque shingles
+        i1 = np.searchsorted(inicios, inicios[i0] + shingles_por_bloque, side="right") - 1
+        i1 = min(max(i1, i0 + 1), n)
+        segmento = hashes[inicios[i0]:inicios[i1]]
+        locales = inicios[i0:i1] - inicios[i0]
+        tmp = np.empty(len(segmento), dtype=np.uint32)
+        for j in range(num_perm):
+            np.multiply(segmento, a[j], out=tmp)
+            tmp += b[j]
+            firmas[j, i0:i1] = np.minimum.reduceat(tmp, locales)
+        i0 = i1
+    return np.ascontiguousarray(firmas.T)
+
+
+def componentes_casi_duplicados(codigos_seller: np.ndarray, firmas: np.ndarray,
+                                validos: np.ndarray = None, bandas: int = BANDAS,
+                                filas: int = FILAS_POR_BANDA, umbral: float = UMBRAL_JACCARD):
+    """
+    Etiqueta de componente por título: títulos del mismo seller con similitud
+    estimada >= umbral quedan en el mismo componente.
+    """
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
+
+    n = len(firmas)
+    candidatos = np.flatnonzero(validos) if validos is not None else np.arange(n)
+    origen, destino = [], []
+    with np.errstate(over="ignore"):
+        for banda in range(bandas):
+            clave = codigos_seller[candidatos].astype(np.uint64)
+            for col in firmas[candidatos, banda * filas:(banda + 1) * filas].T:
+                clave = (clave ^ col.astype(np.uint64)) * _PRIMO_ROLLING
+            orden = np.argsort(clave, kind="stable")
+            ordenada = clave[orden]
+            nuevo = np.concatenate([[True], ordenada[1:] != ordenada[:-1]])
+            primero = orden[np.maximum.accumulate(np.where(nuevo, np.arange(len(orden)), 0))]
+            i, j = candidatos[orden[~nuevo]], candidatos[primero[~nuevo]]
+            # Verificación: fracción de coincidencias de la firma ≈ Jaccard
+            similares = (firmas[i] == firmas[j]).mean(axis=1) >= umbral
+            origen.append(i[similares])
+            destino.append(j[similares])
+
+    origen = np.concatenate(origen) if origen else np.array([], dtype=np.int64)
+    destino = np.concatenate(destino) if destino else np.array([], dtype=np.int64)
+    grafo = coo_matrix((np.ones(len(origen), dtype=np.int8), (origen, destino)), shape=(n, n))
+    return connected_components(grafo, directed=False)[1]
+
+
+def variedad_difusa(sellers, titulos, k: int = K_SHINGLE, bandas: int = BANDAS,
+                    filas: int = FILAS_POR_BANDA, umbral: float = UMBRAL_JACCARD,
+                    semilla: int = SEMILLA) -> pd.DataFrame:
+    """
+    Conteos por seller de grupos de títulos casi duplicados e índice de variedad difuso.
+
+    Args:
+        sellers: seller_nickname por publicación
+        titulos: titulo por publicación (array, lista o pyarrow.Array)
+
+    Returns:
+        DataFrame con seller_nickname, total_publicaciones, titulos_distintos_difusos,
+        grupos_casi_duplicados, publicaciones_casi_duplicadas e indice_variedad_difuso
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    if len(sellers) == 0:
+        return pd.DataFrame(columns=["seller_nickname", "total_publicaciones", "titulos_distintos_difusos",
+                                     "grupos_casi_duplicados", "publicaciones_casi_duplicadas",
+                                     "indice_variedad_difuso"])
+    sellers = sellers.to_numpy(zero_copy_only=False) if isinstance(sellers, (pa.Array, pa.ChunkedArray)) \
+        else np.asarray(sellers, dtype=object)
+    codigos, nombres = pd.factorize(sellers)
+    norm = normalizar_titulos(titulos, k)
+    validos = ~np.asarray(pc.is_null(titulos if isinstance(titulos, (pa.Array, pa.ChunkedArray))
+                                              else pa.array(titulos, type=pa.string())))
+    hashes, inicios = hashes_shingles(norm, k)
+    firmas = firmas_minhash(hashes, inicios, bandas * filas, semilla)
+    etiquetas = componentes_casi_duplicados(codigos, firmas, validos, bandas, filas, umbral)
+
+    tam = np.bincount(etiquetas)
+    _, raices = np.unique(etiquetas, return_index=True)
+    n_sellers = len(nombres)
+    total = np.bincount(codigos, minlength=n_sellers)
+    componentes = np.bincount(codigos[raices], minlength=n_sellers)
+    grupos = np.bincount(codigos[raices], weights=tam[etiquetas[raices]] >= 2, minlength=n_sellers)
+    en_grupo = np.bincount(codigos, weights=tam[etiquetas] >= 2, minlength=n_sellers)
+    return pd.DataFrame({
+        "seller_nickname": nombres,
+        "total_publicaciones": total,
+        "titulos_distintos_difusos": componentes,
+        "grupos_casi_duplicados": grupos.astype(np.int64),
+        "publicaciones_casi_duplicadas": en_grupo.astype(np.int64),
+        "indice_variedad_difuso": componentes / np.maximum(total, 1),
+    })
+
+
+def _procesar_particion(args):
+    ruta, parametros = args
+    import pyarrow.parquet as pq
+
+    lote = pq.read_table(ruta, columns=["seller_nickname", "titulo"])
+    return variedad_difusa(lote.column("seller_nickname"), lote.column("titulo"), **parametros)
+
+
+def indice_variedad_difuso(con, tabla: str, filtro: str = None, titulos_por_particion: int = 500_000,
+                           max_workers: int = None, directorio_temporal: str = None, verbose: bool = True,
+                           **parametros) -> pd.DataFrame:
+    """
+    Variante difusa de indice_variedad sobre una tabla de DuckDB.
+
+    Los sellers se reparten en particiones por hash(seller_nickname) (cada seller
+    cae completo en una partición) en un único escaneo: COPY ... PARTITION_BY
+    escribe una carpeta Parquet por partición. Cada proceso lee solo la suya y
+    hay a lo sumo 2 x max_workers particiones en vuelo, así que la memoria del
+    proceso principal no crece con la cantidad de particiones.
+
+    Args:
+        titulos_por_particion: Tamaño objetivo de partición (acota la memoria por proceso)
+        directorio_temporal: Dónde escribir las particiones (por defecto el temporal del sistema)
+        **parametros: k, bandas, filas, umbral, semilla de variedad_difusa
+    """
+    where = f"WHERE ({filtro})" if filtro else ""
+    inicio = time.perf_counter()
+    total = con.execute(f'SELECT COUNT(*) FROM "{tabla}" {where}').fetchone()[0]
+    n_particiones = max(1, -(-total // titulos_por_particion))
+
+    with tempfile.TemporaryDirectory(dir=directorio_temporal, prefix="variedad_") as tmp:
+        con.execute(f"""
+            COPY (SELECT seller_nickname, titulo, hash(seller_nickname) % {n_particiones} AS particion
+                  FROM "{tabla}" {where})
+            TO '{tmp}' (FORMAT PARQUET, PARTITION_BY (particion), OVERWRITE_OR_IGNORE)
+        """)
+        # Las particiones sin filas no tienen carpeta
+        tareas = [(ruta, parametros) for ruta in sorted(glob.glob(os.path.join(tmp, "particion=*")))]
+
+        if len(tareas) <= 1 or max_workers == 1:
+            resultados = [_procesar_particion(t) for t in tareas]
+        else:
+            resultados = []
+            pendientes = iter(tareas)
+
+            def enviar(ex, n):
+                return {ex.submit(_procesar_particion, t) for _, t in zip(range(n), pendientes)}
+
+            with ProcessPoolExecutor(max_workers=max_workers) as ex:
+                en_vuelo = enviar(ex, 2 * (max_workers or os.cpu_count() or 1))
+                while en_vuelo:
+                    listos, en_vuelo = wait(en_vuelo, return_when=FIRST_COMPLETED)
+                    resultados.extend(f.result() for f in listos)
+                    en_vuelo |= enviar(ex, len(listos))
+
+    # Particiones vacías fuera: concatenar DataFrames vacíos altera los dtypes
+    resultados = [r for r in resultados if len(r)] or [variedad_difusa([], [])]
+    resultado = pd.concat(resultados, ignore_index=True)
+    if verbose:
+        print(f"🔁 Casi duplicados: {total:,} títulos en {n_particiones} particiones "
+              f"({time.perf_counter() - inicio:.1f}s)")
+    return resultado
@@ -0,0 +1,209 @@
+"""
+Transformaciones de features compartidas entre entrenamiento e inferencia.
+
+Las mismas definiciones se exponen en dos formas equivalentes:
+- calcular_features_listing: lotes Arrow/NumPy (vectorizado, sin dicts de Python por fila)
+- sql_features_listing / sql_features_seller: SQL para DuckDB
+
+Ambas se generan a partir de las constantes de este módulo, de modo que el
+notebook de entrenamiento, el CLI y las consultas SQL no pueden divergir.
+"""
+import numpy as np
+
+# Mapa de reputación usado para entrenar pre_pipe (notebook 01)
+REP_MAP = {
+    "green_platinum": 5, "green_gold": 4, "green_silver": 4,
+    "green": 3, "light_green": 3, "yellow": 2,
+    "orange": 1, "red": 1, "newbie": 0,
+}
+REPUTACIONES = np.array(list(REP_MAP), dtype=object)
+# Tabla de búsqueda por código; el último código corresponde a valores nulos o desconocidos
+CODIGO_DESCONOCIDO = len(REP_MAP)
+REP_SCORE_POR_CODIGO = np.array(list(REP_MAP.values()) + [0], dtype=np.float64)
+# Notebook 01 calcula titulo.astype(str).str.len(): un título nulo pasa a "nan" y mide 3
+LARGO_TITULO_NULO = 3
+
+# Orden de columnas que espera pre_pipe.feature_names_in_
+FEATURES = [
+    "categorias_distintas", "log_price_avg", "log_stock_avg", "num_publicaciones",
+    "porc_descuento", "proporcion_refurb", "proporcion_usados", "rep_score",
+    "titulo_length_avg",
+]
+
+
+def _a_arrow(valores):
+    import pyarrow as pa
+
+    if isinstance(valores, pa.ChunkedArray):
+        return valores.combine_chunks()
+    if isinstance(valores, pa.Array):
+        return valores
+    return pa.array(np.asarray(valores, dtype=object), from_pandas=True)
+
+
+def codificar_reputacion(valores) -> np.ndarray:
+    """
+    Codifica seller_reputation como códigos categóricos (int8).
+
+    Solo el diccionario de valores distintos se compara contra REPUTACIONES; las
+    filas se resuelven con un take sobre los índices, sin recorrer strings por fila.
+    Nulos y valores desconocidos reciben CODIGO_DESCONOCIDO.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    arr = _a_arrow(valores)
+    if not pa.types.is_dictionary(arr.type):
+        arr = pc.dictionary_encode(arr)
+    codigos_dic = pc.index_in(arr.dictionary, value_set=pa.array(REPUTACIONES.tolist()))
+    codigos_dic = pc.fill_null(codigos_dic, CODIGO_DESCONOCIDO).to_numpy(zero_copy_only=False)
+    indices = arr.indices
+    if indices.null_count:
+        indices = pc.fill_null(indices, len(codigos_dic))
+    codigos = np.append(codigos_dic, CODIGO_DESCONOCIDO).astype(np.int8)
+    return codigos.take(indices.to_numpy(zero_copy_only=False))
+
+
+def rep_score(valores) -> np.ndarray:
+    """Puntaje de reputación por fila a partir de los códigos categóricos."""
+    return REP_SCORE_POR_CODIGO[codificar_reputacion(valores)]
+
+
+def descuento_pct(price, regular_price) -> np.ndarray:
+    """(regular_price - price) / regular_price, con 0 si regular_price es nulo o 0."""
+    price = np.asarray(price, dtype=np.float64)
+    regular = np.asarray(regular_price, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        resultado = np.subtract(regular, price)
+        np.divide(resultado, regular, out=resultado)
+    # regular_price nulo (NaN) o 0 -> 0; se evalúa sobre regular, no sobre el cociente
+    resultado[~(regular != 0) | np.isnan(regular)] = 0.0
+    return resultado
+
+
+def largo_titulo(titulos) -> np.ndarray:
+    """Número de caracteres del título (LARGO_TITULO_NULO si es nulo, como en el notebook 01)."""
+    import pyarrow.compute as pc
+
+    largos = pc.cast(pc.fill_null(pc.utf8_length(_a_arrow(titulos)), LARGO_TITULO_NULO), "float64")
+    return largos.to_numpy(zero_copy_only=False)
+
+
+def _columna(lote, nombre):
+    import pyarrow as pa
+
+    col = lote.column(nombre) if isinstance(lote, (pa.Table, pa.RecordBatch)) else lote[nombre]
+    if isinstance(col, (pa.Array, pa.ChunkedArray)):
+        return col
+    return np.asarray(col)
+
+
+def _numerica(col) -> np.ndarray:
+    import pyarrow as pa
+
+    if isinstance(col, (pa.Array, pa.ChunkedArray)):
+        return col.to_numpy(zero_copy_only=False).astype(np.float64)
+    return np.asarray(col, dtype=np.float64)
+
+
+def calcular_features_listing(lote):
+    """
+    Añade discount_pct, title_len y rep_score a un lote de publicaciones.
+
+    Args:
+        lote: pyarrow.Table / RecordBatch o dict de arrays NumPy con las columnas
+            price, regular_price, titulo y seller_reputation
+
+    Returns:
+        Mismo tipo de entrada con las tres columnas derivadas añadidas
+    """
+    import pyarrow as pa
+
+    derivadas = {
+        "discount_pct": descuento_pct(_numerica(_columna(lote, "price")),
+                                      _numerica(_columna(lote, "regular_price"))),
+        "title_len": largo_titulo(_columna(lote, "titulo")),
+        "rep_score": rep_score(_columna(lote, "seller_reputation")),
+    }
+    if isinstance(lote, pa.Table):
+        for nombre, valores in derivadas.items():
+            lote = lote.append_column(nombre, pa.array(valores, from_pandas=True))
+        return lote
+    if isinstance(lote, pa.RecordBatch):
+        arrays = list(lote.columns) + [pa.array(v, from_pandas=True) for v in derivadas.values()]
+        return pa.RecordBatch.from_arrays(arrays, names=list(lote.schema.names) + list(derivadas))
+    salida = dict(lote)
+    salida.update(derivadas)
+    return salida
+
+
+def calcular_features_en_lotes(lotes, max_workers: int = None):
+    """
+    Aplica calcular_features_listing a un iterable de lotes (p. ej. un
+    RecordBatchReader de DuckDB) usando hilos: Arrow y NumPy liberan el GIL.
+    Conserva el orden de los lotes.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=max_workers) as ex:
+        yield from ex.map(calcular_features_listing, lotes)
+
+
+# ---------------------------------------------------------------------------
+# Equivalentes SQL (DuckDB)
+# ---------------------------------------------------------------------------
+
+def sql_rep_score(columna: str = "seller_reputation") -> str:
+    casos = " ".join(f"WHEN '{k}' THEN {v}" for k, v in REP_MAP.items())
+    return f'CAST(CASE "{columna}" {casos} ELSE 0 END AS DOUBLE)'
+
+
+SQL_DISCOUNT_PCT = ('CASE WHEN regular_price IS NULL OR regular_price = 0 THEN 0.0 '
+                    'ELSE (regular_price - price) / regular_price END')
+SQL_TITLE_LEN = f'CAST(COALESCE(length(titulo), {LARGO_TITULO_NULO}) AS DOUBLE)'
+
+
+def sql_features_listing(tabla: str, filtro: str = None) -> str:
+    """SELECT con las columnas originales más discount_pct, title_len y rep_score."""
+    where = f"WHERE ({filtro})" if filtro else ""
+    return f"""
+        SELECT *,
+            {SQL_DISCOUNT_PCT} AS discount_pct,
+            {SQL_TITLE_LEN} AS title_len,
+            {sql_rep_score()} AS rep_score
+        FROM "{tabla}" {where}
+    """
+
+
+def _log1p(columna: str) -> str:
+    # Igual que np.log1p: fuera de dominio devuelve NULL (NaN en pandas) y se ignora en el promedio
+    return f"CASE WHEN {columna} > -1 THEN LN(1 + {columna}) END"
+
+
+def sql_features_seller(tabla: str, filtro: str = None) -> str:
+    """
+    Agregación a nivel seller con las nueve FEATURES de pre_pipe, en el mismo
+    orden y con la misma semántica que el notebook de entrenamiento.
+    """
+    return f"""
+        SELECT
+            seller_nickname,
+            COUNT(DISTINCT category_id) AS categorias_distintas,
+            AVG({_log1p('price')}) AS log_price_avg,
+            AVG({_log1p('stock')}) AS log_stock_avg,
+            COUNT(*) AS num_publicaciones,
+            AVG(discount_pct) AS porc_descuento,
+            AVG(CAST(is_refurbished AS DOUBLE)) AS proporcion_refurb,
+            AVG(CASE WHEN condition = 'used' THEN 1.0 ELSE 0.0 END) AS proporcion_usados,
+            AVG(rep_score) AS rep_score,
+            AVG(title_len) AS titulo_length_avg,
+            AVG(stock) AS stock_promedio,
+            AVG(price) AS precio_medio
+        FROM ({sql_features_listing(tabla, filtro)})
+        GROUP BY seller_nickname
+    """
+
+
+def features_seller(con, tabla: str, filtro: str = None):
+    """Devuelve un DataFrame por seller con las FEATURES (más stock y precio medios)."""
+    return con.execute(sql_features_seller(tabla, filtro)).fetchdf()
@@ -3,6 +3,7 @@ import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 from matplotlib.ticker import PercentFormatter
+from .catalog import catalogo
 
 
 def resumen_columnas(con, tabla: str):
@@ -171,7 +172,8 @@ def porcentaje_nulos(con, tabla: str):
     
     return pd.concat(resultados, ignore_index=True).sort_values('porcentaje_nulos', ascending=False)
 
-def analisis_inicial_completo(con, tabla: str, top_categorias: int = 5):
+def analisis_inicial_completo(con, tabla: str, top_categorias: int = 5, filtro: str = None,
+                              validar: bool = False):
     """
     Realiza un análisis inicial completo del dataset y devuelve un diccionario con todos los resultados.
 
@@ -179,35 +181,41 @@ def analisis_inicial_completo(con, tabla: str, top_categorias: int = 5):
         con: Conexión a la base de datos
         tabla: Nombre de la tabla a analizar
         top_categorias: Número de categorías a mostrar en el análisis de distribución
+        filtro: Predicado SQL opcional (p. ej. "category_id = 'MCO1234'") aplicado a todas
+            las consultas; sobre vistas particionadas solo se leen las particiones relevantes
+        validar: Si es True corre además validar_calidad (reglas por fila) y su tasa de
+            violaciones descuenta del score de calidad de cada columna
 
     Returns:
         Dict con todos los resultados del análisis inicial
     """
+    # resumen_columnas se calcula una vez y lo reutilizan nulos, constantes y booleanas
+    resumen = resumen_columnas(con, tabla, filtro=filtro)
     resultados = {
-        'dimensiones': dimensiones_tabla(con, tabla),
+        'dimensiones': dimensiones_tabla(con, tabla, filtro=filtro),
         'esquema': info_tabla(con, tabla),
         'tipos_datos': tipos_datos(con, tabla),
-        'resumen_columnas': resumen_columnas(con, tabla),
-        'estadisticos_numericos': estadisticos_numericos(con, tabla),
-        'valores_constantes': valores_constantes(con, tabla),
-        'porcentaje_nulos': porcentaje_nulos(con, tabla),
-        'distribuciones': distribucion_categoria(con, tabla, top_n=top_categorias),
-        'dominancia_categoria': skew_categorico(con, tabla),
-        'entropia': entropia_columna(con, tabla),
-        'booleanas': columnas_booleanas(con, tabla),
-        'fechas_invalidas': columnas_fecha_invalida(con, tabla),
-        'correlacion_numerica': correlaciones_numericas(con, tabla),
+        'resumen_columnas': resumen,
+        'estadisticos_numericos': estadisticos_numericos(con, tabla, filtro=filtro),
+        'valores_constantes': valores_constantes(con, tabla, resumen=resumen),
+        'porcentaje_nulos': porcentaje_nulos(con, tabla, resumen=resumen),
+        'distribuciones': distribucion_categoria(con, tabla, top_n=top_categorias, filtro=filtro),
+        'dominancia_categoria': skew_categorico(con, tabla, filtro=filtro),
+        'entropia': entropia_columna(con, tabla, filtro=filtro),
+        'booleanas': columnas_booleanas(con, tabla, filtro=filtro, resumen=resumen),
+        'fechas_invalidas': columnas_fecha_invalida(con, tabla, filtro=filtro),
+        'correlacion_numerica': correlaciones_numericas(con, tabla, filtro=filtro),
 
         # Nuevas métricas por seller_nickname
-        'indice_variedad': indice_variedad(con, tabla),
+        'indice_variedad': indice_variedad(con, tabla, filtro=filtro),
         # 'tasa_renovacion': tasa_renovacion(con, tabla),
-        'desviacion_precio': desviacion_precio(con, tabla),
-        'proporcion_premium': proporcion_premium(con, tabla),
-        'densidad_categoria': densidad_categoria(con, tabla),
+        'desviacion_precio': desviacion_precio(con, tabla, filtro=filtro),
+        'proporcion_premium': proporcion_premium(con, tabla, filtro=filtro),
+        'densidad_categoria': densidad_categoria(con, tabla, filtro=filtro),
         # 'frecuencia_temporal': frecuencia_temporal(con, tabla),
-        'relacion_publicaciones_stock': relacion_publicaciones_stock(con, tabla),
-        'ratio_nuevos_vs_reacondicionados': ratio_nuevos_vs_reacondicionados(con, tabla),
-        'proporcion_precios_bajos': proporcion_precios_bajos(con, tabla)
+        'relacion_publicaciones_stock': relacion_publicaciones_stock(con, tabla, filtro=filtro),
+        'ratio_nuevos_vs_reacondicionados': ratio_nuevos_vs_reacondicionados(con, tabla, filtro=filtro),
+        'proporcion_precios_bajos': proporcion_precios_bajos(con, tabla, filtro=filtro)
     }
 
 
@@ -223,62 +231,133 @@ def analisis_inicial_completo(con, tabla: str, top_categorias: int = 5):
         on='columna'
     )
 
-    # Score de calidad de columna (bonus)
-    resumen['score_calidad'] = resumen.apply(lambda row: calcular_score_calidad(row), axis=1)
+    violaciones = None
+    if validar:
+        from .validation import validar_calidad
+
+        resultados['validacion'] = validar_calidad(con, tabla, filtro=filtro, verbose=False)
+        violaciones = resultados['validacion']['reporte']
+
+    # Score de calidad de columna (bonus), vectorizado sobre todo el resumen
+    resumen['score_calidad'] = calcular_score_calidad(resumen, violaciones)
 
     resultados['resumen_consolidado'] = resumen
 
     return resultados
 
 # Puedes definir esta función para calcular el score según reglas simples:
-def calcular_score_calidad(row):
-    score = 1.0
-    if row['nulos'] > 0:
-        score -= 0.2
-    if row['unicos'] == 1:
-        score -= 0.5
-    if 'char' in row['column_type'].lower() and row['unicos'] > 100:
-        score -= 0.1
-    return max(score, 0)
+def calcular_score_calidad(resumen, violaciones=None):
+    """
+    Score de calidad por columna (1 = sin problemas), vectorizado sobre el resumen consolidado.
+
+    Args:
+        resumen: DataFrame con columna, nulos, unicos y column_type (o una sola fila como Series)
+        violaciones: Reporte de validar_calidad (opcional); cada columna pierde
+            hasta 0.3 según la mayor tasa de violación de las reglas que la usan
+
+    Returns:
+        Series de scores alineada con `resumen` (float si se pasó una fila)
+    """
+    if isinstance(resumen, pd.Series):
+        return float(calcular_score_calidad(resumen.to_frame().T, violaciones).iloc[0])
+    score = (1.0
+             - 0.2 * (resumen['nulos'].to_numpy() > 0)
+             - 0.5 * (resumen['unicos'].to_numpy() == 1)
+             - 0.1 * (resumen['column_type'].str.contains('char', case=False).to_numpy()
+                      & (resumen['unicos'].to_numpy() > 100)))
+    if violaciones is not None and len(violaciones):
+        tasas = (violaciones.assign(columna=violaciones['columnas'].str.split(', '))
+                 .explode('columna').groupby('columna')['tasa'].max())
+        score = score - 0.3 * resumen['columna'].map(tasas).fillna(0).to_numpy()
+    return pd.Series(np.maximum(score, 0), index=resumen.index)
 
 # Funciones auxiliares necesarias
 
-def dimensiones_tabla(con, tabla: str):
-    return con.execute(f"SELECT COUNT(*) AS filas FROM \"{tabla}\"").fetchdf().assign(columnas=len(info_tabla(con, tabla)))
+def _where(filtro: str = None, conector: str = "WHERE") -> str:
+    """Cláusula opcional de filtro; sobre vistas Parquet con hive_partitioning se empuja hasta la lectura."""
+    return f"{conector} ({filtro})" if filtro else ""
+
+
+# Columnas de texto repetitivas que se entregan como category (diccionario en Arrow)
+COLUMNAS_CATEGORICAS = ("seller_nickname", "category_id", "condition")
+
+
+def _a_pandas(tabla_arrow, categoricas=COLUMNAS_CATEGORICAS):
+    """
+    Convierte un resultado Arrow a pandas en la frontera pública.
+
+    Las columnas de `categoricas` se codifican como diccionario y llegan como
+    pandas.Categorical (códigos + categorías únicas) en vez de strings object,
+    salvo cuando casi todos los valores son distintos (p. ej. una fila por
+    seller), donde el diccionario ocupa más que los propios strings.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    for i, campo in enumerate(tabla_arrow.schema):
+        # SUM de enteros es HUGEINT (decimal128 en Arrow); fetchdf lo entregaba como float64
+        if pa.types.is_decimal(campo.type):
+            tabla_arrow = tabla_arrow.set_column(i, campo.name, pc.cast(tabla_arrow.column(i), pa.float64()))
+        elif campo.name in categoricas and pa.types.is_string(campo.type):
+            columna = tabla_arrow.column(i)
+            if pc.count_distinct(columna).as_py() <= len(columna) // 2:
+                tabla_arrow = tabla_arrow.set_column(i, campo.name, pc.dictionary_encode(columna))
+    return tabla_arrow.to_pandas(split_blocks=True, self_destruct=True)
+
+
+def _consulta_df(con, query: str, parametros=None):
+    """Ejecuta la consulta por la ruta Arrow (sin fetchdf) y devuelve pandas."""
+    return _a_pandas(con.execute(query, parametros).fetch_arrow_table())
+
+
+def _columnas(con, tabla: str, tipos: str = None):
+    """Nombres de columna (opcionalmente solo los de tipo que coincida con la regex `tipos`) desde el catálogo."""
+    return catalogo(con).columnas(tabla, tipos)
+
+
+def _filas(con, tabla: str, filtro: str = None) -> int:
+    """Conteo de filas; sin filtro sale del catálogo, con filtro depende del predicado y se consulta."""
+    if not filtro:
+        return catalogo(con).filas(tabla)
+    return con.execute(f'SELECT COUNT(*) FROM "{tabla}" {_where(filtro)}').fetchone()[0]
+
+
+def dimensiones_tabla(con, tabla: str, filtro: str = None):
+    return pd.DataFrame({'filas': [_filas(con, tabla, filtro)], 'columnas': [len(_columnas(con, tabla))]})
 
 def info_tabla(con, tabla: str):
-    return con.execute(f'DESCRIBE TABLE "{tabla}"').fetchdf()
+    return catalogo(con).esquema(tabla)
 
 def tipos_datos(con, tabla: str):
     return info_tabla(con, tabla)[['column_name', 'column_type']]
 
-def resumen_columnas(con, tabla: str):
-    cols = con.execute(f'DESCRIBE TABLE "{tabla}"').fetchdf()['column_name'].tolist()
-    resumen = []
-    for col in cols:
-        met = con.execute(f'''
-            SELECT 
-                '{col}' AS columna,
-                COUNT(*) AS total,
-                COUNT(DISTINCT "{col}") AS unicos,
-                COUNT(*) - COUNT("{col}") AS nulos
-            FROM "{tabla}"
-        ''').fetchdf()
-        resumen.append(met)
-    return pd.concat(resumen, ignore_index=True) if resumen else None
-
-def porcentaje_nulos(con, tabla: str):
-    df = resumen_columnas(con, tabla)
-    df['porcentaje_nulos'] = df['nulos'] / df['total']
-    return df[['columna', 'porcentaje_nulos']]
-
-def valores_constantes(con, tabla: str):
-    df = resumen_columnas(con, tabla)
+def resumen_columnas(con, tabla: str, filtro: str = None):
+    # Un solo escaneo con los conteos de todas las columnas en lugar de uno por columna
+    cols = _columnas(con, tabla)
+    if not cols:
+        return None
+    conteos = ", ".join(f'COUNT(DISTINCT "{c}"), COUNT("{c}")' for c in cols)
+    fila = con.execute(f'SELECT COUNT(*), {conteos} FROM "{tabla}" {_where(filtro)}').fetchone()
+    total = fila[0]
+    if not filtro:
+        catalogo(con).anotar_filas(tabla, total)
+    return pd.DataFrame({
+        'columna': cols,
+        'total': np.full(len(cols), total, dtype=np.int64),
+        'unicos': np.array(fila[1::2], dtype=np.int64),
+        'nulos': total - np.array(fila[2::2], dtype=np.int64),
+    })
+
+def porcentaje_nulos(con, tabla: str, filtro: str = None, resumen=None):
+    df = resumen_columnas(con, tabla, filtro=filtro) if resumen is None else resumen
+    return pd.DataFrame({'columna': df['columna'], 'porcentaje_nulos': df['nulos'] / df['total']})
+
+def valores_constantes(con, tabla: str, filtro: str = None, resumen=None):
+    df = resumen_columnas(con, tabla, filtro=filtro) if resumen is None else resumen
     return df[df['unicos'] == 1][['columna']]
 
-def estadisticos_numericos(con, tabla: str):
-    cols = info_tabla(con, tabla)
-    num_cols = cols[cols['column_type'].str.contains('INT|DOUBLE|FLOAT', case=False)]['column_name'].tolist()
+def estadisticos_numericos(con, tabla: str, filtro: str = None):
+    num_cols = _columnas(con, tabla, tipos="INT|DOUBLE|FLOAT")
     if not num_cols:
         return None
 
@@ -288,74 +367,70 @@ def estadisticos_numericos(con, tabla: str):
         partes.append(f'MAX("{c}") AS max_{c}')
         partes.append(f'AVG("{c}") AS avg_{c}')
     
-    query = f'SELECT {", ".join(partes)} FROM "{tabla}"'
-    return con.execute(query).fetchdf()
-
-def distribucion_categoria(con, tabla: str, top_n: int = 10):
-    cols = con.execute(f'DESCRIBE TABLE "{tabla}"').fetchdf()['column_name'].tolist()
-    resultados = []
-    for col in cols:
-        df = con.execute(f'''
-            SELECT 
-                '{col}' AS columna,
-                "{col}" AS valor,
-                COUNT(*) AS frecuencia
-            FROM "{tabla}"
-            GROUP BY "{col}"
-            ORDER BY frecuencia DESC
-            LIMIT {top_n}
-        ''').fetchdf()
-        resultados.append(df)
-    return pd.concat(resultados, ignore_index=True) if resultados else None
+    query = f'SELECT {", ".join(partes)} FROM "{tabla}" {_where(filtro)}'
+    return _consulta_df(con, query)
 
-def skew_categorico(con, tabla: str, umbral: float = 0.95):
-    cols = con.execute(f'DESCRIBE TABLE "{tabla}"').fetchdf()['column_name'].tolist()
-    resultados = []
-    total = con.execute(f'SELECT COUNT(*) FROM "{tabla}"').fetchone()[0]
-
-    for col in cols:
-        top = con.execute(f'''
-            SELECT COUNT(*) AS freq
-            FROM "{tabla}"
-            GROUP BY "{col}"
-            ORDER BY freq DESC
-            LIMIT 1
-        ''').fetchone()
-        if top and top[0] / total >= umbral:
-            resultados.append({'columna': col, 'dominancia': round(top[0] / total, 3)})
-    return pd.DataFrame(resultados)
-
-def entropia_columna(con, tabla: str):
-    cols = con.execute(f'DESCRIBE TABLE "{tabla}"').fetchdf()['column_name'].tolist()
-    resultados = []
-    for col in cols:
-        df = con.execute(f'''
-            SELECT "{col}" AS valor, COUNT(*) AS freq
-            FROM "{tabla}"
-            GROUP BY "{col}"
-        ''').fetchdf()
-        total = df["freq"].sum()
-        probs = df["freq"] / total
-        entropia = -np.sum(probs * np.log2(probs + 1e-9))
-        resultados.append({'columna': col, 'entropia': round(entropia, 3)})
-    return pd.DataFrame(resultados)
-
-def columnas_booleanas(con, tabla: str):
-    cols = con.execute(f'DESCRIBE TABLE "{tabla}"').fetchdf()['column_name'].tolist()
+def distribucion_categoria(con, tabla: str, top_n: int = 10, filtro: str = None):
+    # Una sola consulta (UNION ALL) y una sola conversión en vez de un DataFrame por columna
+    cols = _columnas(con, tabla)
+    if not cols:
+        return None
+    partes = [f'''
+        (SELECT {i} AS orden, '{col}' AS columna, CAST("{col}" AS VARCHAR) AS valor, COUNT(*) AS frecuencia
+         FROM "{tabla}" {_where(filtro)}
+         GROUP BY "{col}"
+         ORDER BY frecuencia DESC
+         LIMIT {top_n})''' for i, col in enumerate(cols)]
+    query = f"SELECT columna, valor, frecuencia FROM ({' UNION ALL '.join(partes)}) ORDER BY orden, frecuencia DESC"
+    return _consulta_df(con, query)
+
+def skew_categorico(con, tabla: str, umbral: float = 0.95, filtro: str = None):
+    cols = _columnas(con, tabla)
+    total = _filas(con, tabla, filtro)
+    if not cols or not total:
+        return pd.DataFrame(columns=['columna', 'dominancia'])
+    partes = [f'''
+        SELECT {i} AS orden, MAX(freq) AS top
+        FROM (SELECT COUNT(*) AS freq FROM "{tabla}" {_where(filtro)} GROUP BY "{col}")'''
+        for i, col in enumerate(cols)]
+    top = con.execute(f"SELECT top FROM ({' UNION ALL '.join(partes)}) ORDER BY orden").fetchnumpy()['top']
+    dominancia = np.asarray(top, dtype=np.float64) / total
+    mascara = dominancia >= umbral
+    return pd.DataFrame({'columna': np.array(cols, dtype=object)[mascara],
+                         'dominancia': dominancia[mascara].round(3)})
+
+def entropia_columna(con, tabla: str, filtro: str = None):
+    # La entropía se agrega en DuckDB: no se traen las frecuencias de cada valor a pandas
+    cols = _columnas(con, tabla)
+    if not cols:
+        return pd.DataFrame(columns=['columna', 'entropia'])
+    partes = [f'''
+        SELECT {i} AS orden, -SUM(p * log2(p + 1e-9)) AS entropia
+        FROM (SELECT COUNT(*) / SUM(COUNT(*)) OVER () AS p
+              FROM "{tabla}" {_where(filtro)} GROUP BY "{col}")'''
+        for i, col in enumerate(cols)]
+    entropia = con.execute(f"SELECT entropia FROM ({' UNION ALL '.join(partes)}) ORDER BY orden").fetchnumpy()['entropia']
+    return pd.DataFrame({'columna': cols,
+                         'entropia': np.nan_to_num(np.asarray(entropia, dtype=np.float64)).round(3)})
+
+def columnas_booleanas(con, tabla: str, filtro: str = None, resumen=None):
+    # Valores distintos (NULL cuenta como uno) desde resumen_columnas; solo las candidatas se consultan
+    df = resumen_columnas(con, tabla, filtro=filtro) if resumen is None else resumen
+    if df is None:
+        return pd.DataFrame()
+    distintos = df['unicos'] + (df['nulos'] > 0)
     booleanas = []
-    for col in cols:
-        unicos = con.execute(f'SELECT DISTINCT "{col}" FROM "{tabla}"').fetchdf()
-        if 1 <= len(unicos) <= 2:
-            booleanas.append({'columna': col, 'valores': unicos[unicos.columns[0]].tolist()})
+    for col in df.loc[(distintos >= 1) & (distintos <= 2), 'columna']:
+        unicos = con.execute(f'SELECT DISTINCT "{col}" FROM "{tabla}" {_where(filtro)}').fetchnumpy()[col]
+        booleanas.append({'columna': col, 'valores': [None if v is np.ma.masked else v for v in unicos.tolist()]})
     return pd.DataFrame(booleanas)
 
-def columnas_fecha_invalida(con, tabla: str):
-    tipos = con.execute(f'DESCRIBE TABLE "{tabla}"').fetchdf()
-    posibles_fechas = tipos[tipos['column_type'].str.contains("CHAR|TEXT", case=False)]['column_name'].tolist()
+def columnas_fecha_invalida(con, tabla: str, filtro: str = None):
+    posibles_fechas = _columnas(con, tabla, tipos="CHAR|TEXT")
     resultados = []
     for col in posibles_fechas:
         try:
-            df = con.execute(f'SELECT "{col}" FROM "{tabla}" WHERE "{col}" IS NOT NULL LIMIT 100').fetchdf()
+            df = _consulta_df(con, f'SELECT "{col}" FROM "{tabla}" WHERE "{col}" IS NOT NULL {_where(filtro, conector="AND")} LIMIT 100')
             fechas_parseadas = pd.to_datetime(df[col], errors='coerce')
             parse_ratio = fechas_parseadas.notna().mean()
             if 0 < parse_ratio < 1:
@@ -364,7 +439,7 @@ def columnas_fecha_invalida(con, tabla: str):
             continue
     return pd.DataFrame(resultados)
 
-def tasa_rotacion(con, tabla: str):
+def tasa_rotacion(con, tabla: str, filtro: str = None):
     query = f"""
     SELECT 
         seller_nickname,
@@ -374,22 +449,23 @@ def tasa_rotacion(con, tabla: str):
             WHEN SUM(stock) > 0 THEN CAST(SUM(ventas) AS DOUBLE) / SUM(stock)
             ELSE NULL 
         END AS tasa_rotacion
-    FROM "{tabla}"
+    FROM "{tabla}" {_where(filtro)}
     GROUP BY seller_nickname
     """
-    return con.execute(query).fetchdf()
+    return _consulta_df(con, query)
 
-def indice_variedad(con, tabla: str):
+def indice_variedad(con, tabla: str, filtro: str = None):
+    # Solo títulos exactos; para casi duplicados ver duplicates.indice_variedad_difuso
     query = f"""
     SELECT 
         seller_nickname,
         COUNT(*) AS total_publicaciones,
         COUNT(DISTINCT titulo) AS titulos_unicos,
         CAST(COUNT(DISTINCT titulo) AS DOUBLE) / COUNT(*) AS indice_variedad
-    FROM "{tabla}"
+    FROM "{tabla}" {_where(filtro)}
     GROUP BY seller_nickname
     """
-    return con.execute(query).fetchdf()
+    return _consulta_df(con, query)
 
 
 
@@ -406,40 +482,43 @@ def indice_variedad(con, tabla: str):
 #     return con.execute(query).fetchdf()
 
 
-def desviacion_precio(con, tabla: str):
+def desviacion_precio(con, tabla: str, filtro: str = None):
     query = f"""
     SELECT 
         seller_nickname,
         STDDEV_SAMP(price) AS std_precio
-    FROM "{tabla}"
+    FROM "{tabla}" {_where(filtro)}
     GROUP BY seller_nickname
     """
-    return con.execute(query).fetchdf()
+    return _consulta_df(con, query)
 
-def proporcion_premium(con, tabla: str):
-    p75 = con.execute(f"SELECT approx_quantile(price, 0.75) AS p75 FROM '{tabla}'").fetchdf().iloc[0]['p75']
+def proporcion_premium(con, tabla: str, filtro: str = None, p75: float = None):
+    # p75 global explícito: en ejecución por shards lo calcula sharding.estadisticos_globales
+    if p75 is None:
+        p75 = con.execute(f'SELECT approx_quantile(price, 0.75) FROM "{tabla}" {_where(filtro)}').fetchone()[0]
+    # Umbral como parámetro: con un filtro sin filas p75 es None y se liga como NULL
     query = f"""
     SELECT 
         seller_nickname,
         COUNT(*) AS total,
-        SUM(CASE WHEN price > {p75} THEN 1 ELSE 0 END) AS premium,
-        CAST(SUM(CASE WHEN price > {p75} THEN 1 ELSE 0 END) AS DOUBLE) / COUNT(*) AS proporcion_premium
-    FROM "{tabla}"
+        SUM(CASE WHEN price > $umbral THEN 1 ELSE 0 END) AS premium,
+        CAST(SUM(CASE WHEN price > $umbral THEN 1 ELSE 0 END) AS DOUBLE) / COUNT(*) AS proporcion_premium
+    FROM "{tabla}" {_where(filtro)}
     GROUP BY seller_nickname
     """
-    return con.execute(query).fetchdf()
+    return _consulta_df(con, query, {"umbral": p75})
 
-def densidad_categoria(con, tabla: str):
+def densidad_categoria(con, tabla: str, filtro: str = None):
     query = f"""
     SELECT 
         seller_nickname,
         COUNT(*) AS total_publicaciones,
         COUNT(DISTINCT category_id) AS total_categorias,
         CAST(COUNT(*) AS DOUBLE) / COUNT(DISTINCT category_id) AS densidad_categoria
-    FROM "{tabla}"
+    FROM "{tabla}" {_where(filtro)}
     GROUP BY seller_nickname
     """
-    return con.execute(query).fetchdf()
+    return _consulta_df(con, query)
 
 
 # def frecuencia_temporal(con, tabla: str):
@@ -460,7 +539,7 @@ def densidad_categoria(con, tabla: str):
 #     return con.execute(query).fetchdf()
 
 
-def relacion_publicaciones_stock(con, tabla: str):
+def relacion_publicaciones_stock(con, tabla: str, filtro: str = None):
     query = f"""
     SELECT 
         seller_nickname,
@@ -470,12 +549,12 @@ def relacion_publicaciones_stock(con, tabla: str):
             WHEN COUNT(*) > 0 THEN AVG(stock) / COUNT(*)
             ELSE NULL
         END AS relacion_publicaciones_stock
-    FROM "{tabla}"
+    FROM "{tabla}" {_where(filtro)}
     GROUP BY seller_nickname
     """
-    return con.execute(query).fetchdf()
+    return _consulta_df(con, query)
 
-def ratio_nuevos_vs_reacondicionados(con, tabla: str):
+def ratio_nuevos_vs_reacondicionados(con, tabla: str, filtro: str = None):
     query = f"""
     SELECT 
         seller_nickname,
@@ -487,48 +566,55 @@ def ratio_nuevos_vs_reacondicionados(con, tabla: str):
                 SUM(CASE WHEN lower(condition) = 'used' THEN 1 ELSE 0 END)
             ELSE NULL
         END AS ratio_nuevo_usado
-    FROM "{tabla}"
+    FROM "{tabla}" {_where(filtro)}
     GROUP BY seller_nickname
     """
-    return con.execute(query).fetchdf()
+    return _consulta_df(con, query)
 
 
-def proporcion_precios_bajos(con, tabla: str):
-    avg_precio = con.execute(f"SELECT AVG(price) AS avg_precio FROM '{tabla}'").fetchdf().iloc[0]['avg_precio']
+def proporcion_precios_bajos(con, tabla: str, filtro: str = None, avg_precio: float = None):
+    if avg_precio is None:
+        avg_precio = con.execute(f'SELECT AVG(price) FROM "{tabla}" {_where(filtro)}').fetchone()[0]
     query = f"""
     SELECT 
         seller_nickname,
         COUNT(*) AS total,
-        SUM(CASE WHEN price < {avg_precio} THEN 1 ELSE 0 END) AS bajo_promedio,
-        CAST(SUM(CASE WHEN price < {avg_precio} THEN 1 ELSE 0 END) AS DOUBLE) / COUNT(*) AS proporcion_bajo_promedio
-    FROM "{tabla}"
+        SUM(CASE WHEN price < $umbral THEN 1 ELSE 0 END) AS bajo_promedio,
+        CAST(SUM(CASE WHEN price < $umbral THEN 1 ELSE 0 END) AS DOUBLE) / COUNT(*) AS proporcion_bajo_promedio
+    FROM "{tabla}" {_where(filtro)}
     GROUP BY seller_nickname
     """
-    return con.execute(query).fetchdf()
+    return _consulta_df(con, query, {"umbral": avg_precio})
 
 
-def correlaciones_numericas(con, tabla: str):
-    tipos = con.execute(f'DESCRIBE TABLE "{tabla}"').fetchdf()
-    numeric_cols = tipos[tipos['column_type'].str.contains("INT|DOUBLE|FLOAT", case=False)]['column_name'].tolist()
+def correlaciones_numericas(con, tabla: str, filtro: str = None):
+    # corr() por pares en DuckDB (mismas observaciones pareadas que DataFrame.corr) en un
+    # solo escaneo, sin traer las columnas numéricas completas a pandas
+    numeric_cols = _columnas(con, tabla, tipos="INT|DOUBLE|FLOAT")
     if not numeric_cols:
         return None
 
-    columnas_str = ", ".join(f'"{col}"' for col in numeric_cols)
-    query = f'SELECT {columnas_str} FROM "{tabla}"'
-    df = con.execute(query).fetchdf()
-    return df.corr().round(2)
+    n = len(numeric_cols)
+    pares = [(i, j) for i in range(n) for j in range(i, n)]
+    exprs = [f'CASE WHEN VAR_SAMP("{numeric_cols[i]}") > 0 THEN 1.0 END' if i == j
+             else f'CORR("{numeric_cols[i]}", "{numeric_cols[j]}")' for i, j in pares]
+    fila = con.execute(f'SELECT {", ".join(exprs)} FROM "{tabla}" {_where(filtro)}').fetchone()
+    matriz = np.full((n, n), np.nan)
+    for (i, j), valor in zip(pares, fila):
+        matriz[i, j] = matriz[j, i] = np.nan if valor is None else valor
+    return pd.DataFrame(matriz, index=numeric_cols, columns=numeric_cols).round(2)
 
 
-def guardar_resultados_como_txt(resultados, nombre_archivo="analisis_datos"):
+def guardar_resultados_como_txt(resultados, nombre_archivo="analisis_datos", ruta: str = None):
     """
     Guarda los resultados del análisis inicial en un archivo de texto formateado
-    (Versión que no requiere tabulate)
+    (Versión que no requiere tabulate). `ruta` reemplaza el destino por defecto.
     """
     from datetime import datetime
     import pandas as pd
     
     # Nombre del archivo con timestamp
-    nombre_completo = f"../data/outputs_prompts/inspector_stats.txt"
+    nombre_completo = ruta or f"../data/outputs_prompts/inspector_stats.txt"
     
     def df_to_text(df):
         """Convierte un DataFrame a texto formateado sin usar markdown"""
@@ -740,7 +826,7 @@ def plot_metricas_vendedores(resultados, titulo="Métricas por Vendedor"):
     
     # 1. Índice de variedad
     plt.subplot(4, 2, 1)
-    variedad = resultados['indice_variedad'].sort_values('indice_variedad', ascending=False).head(10)
+    variedad = resultados['indice_variedad'].nlargest(10, 'indice_variedad')
     sns.barplot(x='indice_variedad', y='seller_nickname', data=variedad, palette='viridis')
     plt.title('Top 10 Vendedores por Índice de Variedad')
     plt.xlabel('Índice de variedad (títulos únicos / total publicaciones)')
@@ -749,7 +835,7 @@ def plot_metricas_vendedores(resultados, titulo="Métricas por Vendedor"):
     
     # 2. Desviación de precios
     plt.subplot(4, 2, 2)
-    desviacion = resultados['desviacion_precio'].sort_values('std_precio', ascending=False).head(10)
+    desviacion = resultados['desviacion_precio'].nlargest(10, 'std_precio')
     sns.barplot(x='std_precio', y='seller_nickname', data=desviacion, palette='magma')
     plt.title('Top 10 Vendedores con Mayor Variabilidad de Precios')
     plt.xlabel('Desviación estándar de precios')
@@ -758,7 +844,7 @@ def plot_metricas_vendedores(resultados, titulo="Métricas por Vendedor"):
     
     # 3. Proporción de productos premium
     plt.subplot(4, 2, 3)
-    premium = resultados['proporcion_premium'].sort_values('proporcion_premium', ascending=False).head(10)
+    premium = resultados['proporcion_premium'].nlargest(10, 'proporcion_premium')
     sns.barplot(x='proporcion_premium', y='seller_nickname', data=premium, palette='rocket')
     plt.title('Top 10 Vendedores con Mayor % de Productos Premium')
     plt.xlabel('Proporción de productos premium (precio > P75)')
@@ -768,7 +854,7 @@ def plot_metricas_vendedores(resultados, titulo="Métricas por Vendedor"):
     
     # 4. Densidad por categoría
     plt.subplot(4, 2, 4)
-    densidad = resultados['densidad_categoria'].sort_values('densidad_categoria', ascending=False).head(10)
+    densidad = resultados['densidad_categoria'].nlargest(10, 'densidad_categoria')
     sns.barplot(x='densidad_categoria', y='seller_nickname', data=densidad, palette='flare')
     plt.title('Top 10 Vendedores con Mayor Densidad por Categoría')
     plt.xlabel('Publicaciones por categoría (mayor = más especializado)')
@@ -777,7 +863,7 @@ def plot_metricas_vendedores(resultados, titulo="Métricas por Vendedor"):
     
     # 5. Relación publicaciones/stock
     plt.subplot(4, 2, 5)
-    rel_stock = resultados['relacion_publicaciones_stock'].sort_values('relacion_publicaciones_stock', ascending=False).head(10)
+    rel_stock = resultados['relacion_publicaciones_stock'].nlargest(10, 'relacion_publicaciones_stock')
     sns.barplot(x='relacion_publicaciones_stock', y='seller_nickname', data=rel_stock, palette='crest')
     plt.title('Top 10 Vendedores con Mayor Stock por Publicación')
     plt.xlabel('Stock promedio / total publicaciones')
@@ -786,7 +872,7 @@ def plot_metricas_vendedores(resultados, titulo="Métricas por Vendedor"):
     
     # 6. Ratio nuevos vs reacondicionados
     plt.subplot(4, 2, 6)
-    ratio = resultados['ratio_nuevos_vs_reacondicionados'].sort_values('ratio_nuevo_usado', ascending=False).head(10)
+    ratio = resultados['ratio_nuevos_vs_reacondicionados'].nlargest(10, 'ratio_nuevo_usado')
     sns.barplot(x='ratio_nuevo_usado', y='seller_nickname', data=ratio, palette='mako')
     plt.title('Top 10 Vendedores con Mayor Ratio Nuevos/Usados')
     plt.xlabel('Ratio productos nuevos vs usados')
@@ -795,7 +881,7 @@ def plot_metricas_vendedores(resultados, titulo="Métricas por Vendedor"):
     
     # 7. Proporción de precios bajos
     plt.subplot(4, 2, 7)
-    bajos = resultados['proporcion_precios_bajos'].sort_values('proporcion_bajo_promedio', ascending=False).head(10)
+    bajos = resultados['proporcion_precios_bajos'].nlargest(10, 'proporcion_bajo_promedio')
     sns.barplot(x='proporcion_bajo_promedio', y='seller_nickname', data=bajos, palette='viridis')
     plt.title('Top 10 Vendedores con Mayor % de Precios Bajos')
     plt.xlabel('Proporción de productos con precio < promedio')
@@ -806,7 +892,7 @@ def plot_metricas_vendedores(resultados, titulo="Métricas por Vendedor"):
     # 8. Tasa de rotación (si está disponible)
     if 'tasa_rotacion' in resultados:
         plt.subplot(4, 2, 8)
-        rotacion = resultados['tasa_rotacion'].sort_values('tasa_rotacion', ascending=False).head(10)
+        rotacion = resultados['tasa_rotacion'].nlargest(10, 'tasa_rotacion')
         sns.barplot(x='tasa_rotacion', y='seller_nickname', data=rotacion, palette='rocket')
         plt.title('Top 10 Vendedores por Tasa de Rotación')
         plt.xlabel('Tasa de rotación (ventas / stock)')
@@ -861,12 +947,30 @@ def plot_estadisticos_numericos(estadisticos, titulo="Estadísticos de Columnas
     plt.tight_layout()
     plt.show()
 
-def visualizar_todo(con, tabla: str):
+def visualizar_todo(con, tabla: str, resultados: dict = None, directorio_salida: str = None,
+                    max_workers: int = None):
     """
     Ejecuta todas las funciones de análisis y visualización para una tabla.
+
+    Args:
+        con: Conexión a la base de datos
+        tabla: Nombre de la tabla a analizar
+        resultados: Resultados previos de analisis_inicial_completo (se reutilizan si se pasan)
+        directorio_salida: Si se indica, las figuras se agregan en DuckDB y se guardan
+            como PNG en paralelo en lugar de mostrarse (modo reporte sin interfaz)
+        max_workers: Número de procesos para el renderizado a PNG
+
+    Returns:
+        Dict nombre_figura -> ruta PNG cuando se usa directorio_salida, None en otro caso
     """
-    # Obtener todos los resultados
-    resultados = analisis_inicial_completo(con, tabla)
+    # Obtener todos los resultados (solo si no se suministraron)
+    if resultados is None:
+        resultados = analisis_inicial_completo(con, tabla)
+
+    if directorio_salida is not None:
+        from .plotting import preparar_figuras, renderizar_png
+        especificaciones = preparar_figuras(con, tabla, resultados)
+        return renderizar_png(especificaciones, directorio_salida, max_workers=max_workers)
     
     # Visualizar todo
     plot_analisis_inicial(resultados, f"Análisis Completo - {tabla}")
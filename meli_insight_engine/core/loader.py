@@ -1,9 +1,41 @@
 import os
+import glob
+import time
+import uuid
+
+from .catalog import catalogo
+
+# Esquema explícito del export de publicaciones (evita el sniffing de read_csv_auto)
+ESQUEMA_LISTINGS = {
+    "tim_day": "DATE",
+    "seller_nickname": "VARCHAR",
+    "titulo": "VARCHAR",
+    "seller_reputation": "VARCHAR",
+    "stock": "BIGINT",
+    "logistic_type": "VARCHAR",
+    "condition": "VARCHAR",
+    "is_refurbished": "BOOLEAN",
+    "price": "DOUBLE",
+    "regular_price": "DOUBLE",
+    "categoria": "VARCHAR",
+    "url": "VARCHAR",
+    "category_id": "VARCHAR",
+    "category_name": "VARCHAR",
+}
+
+# Layout hive de listings: una carpeta por fecha de ingesta y por categoría
+PARTICIONES_LISTINGS = ("fecha_ingesta", "category_id")
+TIPOS_PARTICION = {"fecha_ingesta": "DATE", "category_id": "VARCHAR"}
 
 def registrar_csvs_como_vistas(con, folder_path: str, schema: str = "data"):
     """
     Registra todos los archivos .csv de una carpeta como vistas en DuckDB.
+
+    Returns:
+        Catalogo de la conexión con las vistas registradas (esquema, filas y
+        estadísticas de archivos se cachean hasta que cambie la fuente)
     """
+    cat = catalogo(con)
     for file in os.listdir(folder_path):
         if file.endswith('.csv'):
             nombre_archivo = file.replace('.csv', '').replace('-', '_')
@@ -13,6 +45,56 @@ def registrar_csvs_como_vistas(con, folder_path: str, schema: str = "data"):
                 CREATE VIEW "{table_name}" AS 
                 SELECT * FROM read_csv_auto('{file_path}')
             """)
+            cat.registrar(table_name, [file_path])
+        elif _es_dataset_hive(os.path.join(folder_path, file)):
+            # Carpetas con layout hive (p. ej. las escritas por ingestar_listings_particionados)
+            registrar_parquet_como_vista(con, os.path.join(folder_path, file),
+                                         file.replace('-', '_'), schema=schema)
+    return cat
+
+
+def _es_dataset_hive(ruta: str) -> bool:
+    """True si la carpeta contiene subcarpetas con formato clave=valor."""
+    return os.path.isdir(ruta) and any(
+        '=' in d and os.path.isdir(os.path.join(ruta, d)) for d in os.listdir(ruta)
+    )
+
+
+def registrar_parquet_como_vista(con, carpeta: str, nombre: str, schema: str = "data",
+                                 tipos_particion: dict = None):
+    """
+    Registra un dataset Parquet (con o sin layout hive) como vista en DuckDB.
+
+    La vista usa hive_partitioning, así que los filtros sobre las columnas de
+    partición (fecha_ingesta, category_id) se empujan hasta la lectura y solo
+    se abren los archivos de las particiones que cumplen el predicado.
+    """
+    opciones = ""
+    if _es_dataset_hive(carpeta):
+        tipos = dict(TIPOS_PARTICION)
+        tipos.update(tipos_particion or {})
+        claves = _claves_particion(carpeta)
+        tipos = {k: v for k, v in tipos.items() if k in claves}
+        opciones = ", hive_partitioning = true"
+        if tipos:
+            opciones += ", hive_types = {" + ", ".join(f"'{k}': {v}" for k, v in tipos.items()) + "}"
+    patron = os.path.join(carpeta, "**", "*.parquet")
+    con.execute(f"""
+        CREATE OR REPLACE VIEW "{schema}.{nombre}" AS
+        SELECT * FROM read_parquet('{patron}'{opciones})
+    """)
+    return catalogo(con).registrar(f"{schema}.{nombre}", [patron])
+
+
+def _claves_particion(carpeta: str) -> set:
+    """Recorre el primer camino clave=valor para conocer todas las columnas de partición."""
+    claves, actual = set(), carpeta
+    while True:
+        subdirs = [d for d in os.listdir(actual) if '=' in d and os.path.isdir(os.path.join(actual, d))]
+        if not subdirs:
+            return claves
+        claves.add(subdirs[0].split('=', 1)[0])
+        actual = os.path.join(actual, subdirs[0])
 
 def verificar_vistas(con, schema="data"):
     """Lista las vistas registradas con el prefijo del esquema dado."""
@@ -21,4 +103,205 @@ def verificar_vistas(con, schema="data"):
         FROM information_schema.tables
         WHERE table_type = 'VIEW'
           AND table_name LIKE '{schema}.%'
-    """).fetchdf()
\ No newline at end of file
+    """).fetchdf()
+
+
+def _expandir_fuentes(fuentes):
+    """Convierte una ruta, un patrón glob o una lista de ambos en una lista ordenada de archivos."""
+    if isinstance(fuentes, (str, os.PathLike)):
+        fuentes = [fuentes]
+    archivos = []
+    for fuente in fuentes:
+        coincidencias = sorted(glob.glob(str(fuente)))
+        if not coincidencias:
+            raise FileNotFoundError(f"No se encontraron archivos para: {fuente}")
+        archivos.extend(coincidencias)
+    return archivos
+
+
+def _detectar_formato(archivo: str) -> str:
+    nombre = archivo.lower()
+    for ext in ('.gz', '.zst', '.zstd'):
+        if nombre.endswith(ext):
+            nombre = nombre[: -len(ext)]
+    if nombre.endswith(('.jsonl', '.ndjson', '.json')):
+        return 'jsonl'
+    if nombre.endswith(('.csv', '.tsv', '.txt')):
+        return 'csv'
+    raise ValueError(f"No se pudo inferir el formato de {archivo}; usa formato='csv' o 'jsonl'")
+
+
+def _validar_cabecera(archivo: str, esquema: dict, opciones_csv: dict = None):
+    """
+    Comprueba que la cabecera del CSV coincide con el esquema explícito.
+    read_csv asigna las columnas por posición, así que un export con otro orden
+    cargaría valores en columnas equivocadas sin ningún error.
+    """
+    import csv
+    import gzip
+
+    opciones = opciones_csv or {}
+    if opciones.get("header", True) is False or archivo.lower().endswith(('.zst', '.zstd')):
+        return
+    abrir = gzip.open if archivo.lower().endswith('.gz') else open
+    with abrir(archivo, 'rt', encoding='utf-8', newline='') as f:
+        cabecera = next(csv.reader(f, delimiter=opciones.get("delim", ","),
+                                   quotechar=opciones.get("quote", '"')), [])
+    if [c.strip() for c in cabecera] != list(esquema):
+        raise ValueError(f"La cabecera de {archivo} no coincide con el esquema: {cabecera} != {list(esquema)}")
+
+
+def _sql_lectura(archivos, esquema: dict, formato: str, opciones_csv: dict = None) -> str:
+    """SQL de lectura con todas las columnas como VARCHAR: el tipado se hace después con TRY_CAST."""
+    lista = ", ".join(f"'{a}'" for a in archivos)
+    columnas = "{" + ", ".join(f"'{c}': 'VARCHAR'" for c in esquema) + "}"
+    if formato == 'jsonl':
+        return f"read_json([{lista}], format='newline_delimited', columns={columnas})"
+    opciones = {"header": True, "delim": ",", "quote": '"'}
+    opciones.update(opciones_csv or {})
+    extra = ", ".join(
+        f"{k}={str(v).lower() if isinstance(v, bool) else repr(v)}" for k, v in opciones.items()
+    )
+    return f"read_csv([{lista}], columns={columnas}, auto_detect=false, {extra})"
+
+
+def ingestar_en_parquet(con, fuentes, destino: str, esquema: dict = None, formato: str = None,
+                        tamano_lote: int = 500_000, columnas_obligatorias=("seller_nickname",),
+                        particionar_por=None, opciones_csv: dict = None, columnas_extra: dict = None,
+                        verbose: bool = True):
+    """
+    Ingesta en streaming exports CSV/JSONL (comprimidos o partidos en varios archivos)
+    hacia un dataset Parquet particionado.
+
+    Los archivos se leen con un esquema explícito (sin sniffing), los tipos se validan
+    y convierten en DuckDB con TRY_CAST y el resultado se consume en lotes Arrow, de
+    modo que la memoria queda acotada por `tamano_lote` y no por el tamaño del archivo.
+    Una fila se rechaza si algún valor no nulo no se puede convertir a su tipo o si
+    falta una columna obligatoria.
+
+    Args:
+        con: Conexión a DuckDB
+        fuentes: Ruta, patrón glob o lista de rutas (.csv, .csv.gz, .jsonl, .jsonl.gz...)
+        destino: Carpeta del dataset Parquet (se crea si no existe; se añaden archivos)
+        esquema: Dict columna -> tipo DuckDB (por defecto ESQUEMA_LISTINGS)
+        formato: 'csv' o 'jsonl'; si es None se infiere de la extensión
+        tamano_lote: Filas por lote Arrow
+        columnas_obligatorias: Columnas que no pueden ser nulas
+        particionar_por: Columnas para particionar el dataset (layout hive)
+        opciones_csv: Opciones extra para read_csv (delim, quote, escape...)
+        columnas_extra: Dict columna -> valor constante que se añade a cada fila
+            (p. ej. la fecha de ingesta usada como partición)
+        verbose: Imprime el progreso por lote
+
+    Returns:
+        Dict con archivos, filas leídas/válidas/rechazadas, rechazos por columna y duración
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+
+    esquema = dict(esquema or ESQUEMA_LISTINGS)
+    archivos = _expandir_fuentes(fuentes)
+    formatos = {formato or _detectar_formato(a) for a in archivos}
+    if len(formatos) != 1:
+        raise ValueError(f"Las fuentes mezclan formatos: {sorted(formatos)}")
+    formato = formatos.pop()
+    if formato == 'csv':
+        for archivo in archivos:
+            _validar_cabecera(archivo, esquema, opciones_csv)
+
+    # Cada columna se convierte con TRY_CAST y se marca si el valor original no era convertible
+    selects, condiciones = [], {}
+    for col, tipo in esquema.items():
+        if tipo.upper() == 'VARCHAR':
+            selects.append(f'"{col}"')
+        else:
+            selects.append(f'TRY_CAST("{col}" AS {tipo}) AS "{col}"')
+            condiciones[col] = [f'("{col}" IS NOT NULL AND TRY_CAST("{col}" AS {tipo}) IS NULL)']
+    for col in columnas_obligatorias or ():
+        condiciones.setdefault(col, []).append(f'("{col}" IS NULL)')
+    errores = [f'({" OR ".join(c)}) AS "_err_{col}"' for col, c in condiciones.items()]
+    columnas_error = [f"_err_{col}" for col in condiciones]
+
+    query = f"""
+        SELECT {", ".join(selects + errores)}
+        FROM {_sql_lectura(archivos, esquema, formato, opciones_csv)}
+    """
+
+    os.makedirs(destino, exist_ok=True)
+    ejecucion = uuid.uuid4().hex[:8]
+    resumen = {
+        'archivos': archivos,
+        'bytes_fuente': sum(os.path.getsize(a) for a in archivos),
+        'filas_leidas': 0,
+        'filas_validas': 0,
+        'filas_rechazadas': 0,
+        'rechazos_por_columna': {c[len('_err_'):]: 0 for c in columnas_error},
+        'lotes': 0,
+    }
+    if verbose:
+        print(f"📥 Ingestando {len(archivos)} archivo(s) {formato} "
+              f"({resumen['bytes_fuente'] / 1e6:,.1f} MB) hacia {destino}")
+
+    inicio = time.perf_counter()
+    lector = con.execute(query).fetch_record_batch(tamano_lote)
+    for n, lote in enumerate(lector):
+        tabla = pa.Table.from_batches([lote])
+        validas = tabla
+        if columnas_error:
+            rechazo = None
+            for c in columnas_error:
+                marca = pc.fill_null(tabla[c], False)
+                resumen['rechazos_por_columna'][c[len('_err_'):]] += pc.sum(marca).as_py() or 0
+                rechazo = marca if rechazo is None else pc.or_(rechazo, marca)
+            validas = tabla.filter(pc.invert(rechazo)).drop_columns(columnas_error)
+
+        resumen['lotes'] += 1
+        resumen['filas_leidas'] += tabla.num_rows
+        resumen['filas_validas'] += validas.num_rows
+        resumen['filas_rechazadas'] += tabla.num_rows - validas.num_rows
+
+        for col, valor in (columnas_extra or {}).items():
+            validas = validas.append_column(col, pa.repeat(pa.scalar(valor), validas.num_rows))
+
+        if validas.num_rows:
+            ds.write_dataset(
+                validas, destino, format='parquet',
+                partitioning=list(particionar_por) if particionar_por else None,
+                partitioning_flavor='hive' if particionar_por else None,
+                basename_template=f"part-{ejecucion}-{n:05d}-{{i}}.parquet",
+                existing_data_behavior='overwrite_or_ignore',
+            )
+        if verbose:
+            print(f"   • lote {n + 1}: {resumen['filas_leidas']:,} filas leídas, "
+                  f"{resumen['filas_rechazadas']:,} rechazadas")
+
+    resumen['duracion_s'] = round(time.perf_counter() - inicio, 3)
+    if verbose:
+        print(f"✅ Ingesta completa: {resumen['filas_validas']:,} filas válidas, "
+              f"{resumen['filas_rechazadas']:,} rechazadas en {resumen['duracion_s']} s")
+    return resumen
+
+
+def ingestar_listings_particionados(con, fuentes, destino: str, fecha_ingesta=None, **kwargs):
+    """
+    Ingesta exports de listings en un dataset Parquet con layout hive
+    fecha_ingesta=YYYY-MM-DD/category_id=XXX/part-*.parquet.
+
+    Args:
+        con: Conexión a DuckDB
+        fuentes: Ruta, patrón glob o lista de rutas del export
+        destino: Carpeta raíz del dataset
+        fecha_ingesta: Fecha de la partición (por defecto, hoy)
+        **kwargs: Parámetros adicionales de ingestar_en_parquet
+
+    Returns:
+        Resumen de ingestar_en_parquet
+    """
+    from datetime import date
+
+    fecha = fecha_ingesta or date.today()
+    if isinstance(fecha, str):
+        fecha = date.fromisoformat(fecha)
+    return ingestar_en_parquet(con, fuentes, destino, particionar_por=PARTICIONES_LISTINGS,
+                               columnas_extra={"fecha_ingesta": fecha}, **kwargs)
@@ -0,0 +1,59 @@
+"""
+Payloads de cot_chain (INPUT_VARIABLES) a partir de las features por seller.
+
+payloads_desde_features arma el DataFrame de payloads de forma vectorizada y
+lotes_payloads lo hace en streaming: features por seller desde DuckDB como
+lotes Arrow, cluster en NumPy (asignar_cluster, equivalente a pre_pipe +
+kmeans) y payloads por lote, sin materializar la población completa.
+"""
+import numpy as np
+import pandas as pd
+
+from .cluster_udf import CLUSTER_NAME, asignar_cluster, parametros_modelo
+from .features import FEATURES, sql_features_seller
+
+FILAS_POR_LOTE = 10_000
+
+
+def payloads_desde_features(features: pd.DataFrame, clusters, fecha: str,
+                            tasa_cancelacion: float = 0.0, nombres: dict = None) -> pd.DataFrame:
+    """
+    Args:
+        features: Salida de features_seller (FEATURES + stock_promedio y precio_medio)
+        clusters: Id de cluster por fila (alineado con `features`)
+        fecha: fecha_actual del payload (ISO)
+        tasa_cancelacion: No viene en el export; valor constante para todos
+        nombres: {id: cluster_name} (por defecto CLUSTER_NAME, válido para models/kmeans.pkl;
+            para un KMeans reentrenado, ver cluster_udf.nombrar_clusters)
+
+    Returns:
+        DataFrame con seller_nickname, cluster y las INPUT_VARIABLES de cot_chain
+    """
+    clusters = np.asarray(clusters)
+    return pd.DataFrame({
+        "seller_nickname": features["seller_nickname"].to_numpy(),
+        "cluster": clusters,
+        "fecha_actual": fecha,
+        "cluster_name": pd.Series(clusters).map(CLUSTER_NAME if nombres is None else nombres)
+                          .fillna("Desconocido").to_numpy(),
+        "publicaciones": features["num_publicaciones"].astype(int).to_numpy(),
+        "categorias_distintas": features["categorias_distintas"].astype(int).to_numpy(),
+        "stock_promedio": features["stock_promedio"].fillna(0).round().astype(int).to_numpy(),
+        "precio_medio_cop": features["precio_medio"].fillna(0).round().astype(int).to_numpy(),
+        "descuento_pct": features["porc_descuento"].astype(float).to_numpy(),
+        "rep_score": features["rep_score"].round(2).to_numpy(),
+        "tasa_cancelacion": tasa_cancelacion,
+    })
+
+
+def lotes_payloads(con, tabla: str, pre_pipe, kmeans, fecha: str, filtro: str = None,
+                   filas_por_lote: int = FILAS_POR_LOTE, tasa_cancelacion: float = 0.0):
+    """Itera DataFrames de payloads (uno por lote Arrow de sellers) clasificados con pre_pipe + kmeans."""
+    parametros = parametros_modelo(pre_pipe, kmeans)
+    lector = con.execute(sql_features_seller(tabla, filtro)).fetch_record_batch(filas_por_lote)
+    for lote in lector:
+        if not lote.num_rows:
+            continue
+        features = lote.to_pandas()
+        clusters = asignar_cluster(features[FEATURES].to_numpy(dtype=np.float64), parametros)
+        yield payloads_desde_features(features, clusters, fecha, tasa_cancelacion)
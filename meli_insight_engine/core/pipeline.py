@@ -0,0 +1,358 @@
+"""
+Ejecutor de pipelines con caché por contenido.
+
+Cada Etapa declara archivos de entrada, archivos de salida y parámetros. Su
+clave de caché es el hash de:
+
+- el código de la función de la etapa y el de los módulos del proyecto que
+  usa (los que importa o cuyos nombres referencia, y sus importaciones,
+  transitivamente; stdlib y site-packages no cuentan),
+- su versión opcional y sus parámetros (JSON ordenado),
+- el contenido de cada entrada (blake2b; las carpetas se hashean archivo por archivo).
+
+Si la clave coincide con la de la última corrida y las salidas siguen
+intactas (mismo hash que al producirlas), la etapa se omite. Las dependencias
+se deducen de las rutas: una etapa depende de las que producen sus entradas.
+Las etapas cuyas dependencias ya terminaron corren en paralelo en hilos
+(DuckDB, NumPy y scikit-learn liberan el GIL en el trabajo pesado).
+
+El hash de un archivo se reutiliza mientras no cambien su tamaño ni su mtime,
+así que verificar la caché no relee datasets grandes.
+"""
+import ast
+import hashlib
+import importlib.util
+import inspect
+import json
+import os
+import sys
+import sysconfig
+import textwrap
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import pandas as pd
+
+ARCHIVO_ESTADO = "estado_pipeline.json"
+
+_RUTAS_EXTERNAS = tuple(sorted({os.path.realpath(ruta) for clave, ruta in sysconfig.get_paths().items()
+                                if clave in ("stdlib", "platstdlib", "purelib", "platlib")}))
+
+
+def _archivo_del_proyecto(nombre: str):
+    """
+    Ruta del código fuente del módulo `nombre` si es del proyecto (None para stdlib,
+    site-packages o nombres que no son módulos). No importa nada: si el módulo no está
+    cargado, la ruta se arma desde el paquete raíz.
+    """
+    modulo = sys.modules.get(nombre)
+    if modulo is not None:
+        ruta = getattr(modulo, "__file__", None)
+    else:
+        raiz, *partes = nombre.split(".")
+        try:
+            spec = importlib.util.find_spec(raiz)
+        except (ImportError, ValueError):
+            return None
+        if spec is None:
+            return None
+        ruta = spec.origin
+        # Carpetas donde buscar submódulos (también paquetes de espacio de nombres, sin __init__.py)
+        carpetas = list(spec.submodule_search_locations or [])
+        for parte in partes:
+            for carpeta in carpetas:
+                if os.path.isfile(os.path.join(carpeta, parte + ".py")):
+                    ruta, carpetas = os.path.join(carpeta, parte + ".py"), []
+                    break
+                if os.path.isdir(os.path.join(carpeta, parte)):
+                    carpetas = [os.path.join(carpeta, parte)]
+                    ruta = os.path.join(carpetas[0], "__init__.py")
+                    break
+            else:
+                return None
+    if not ruta or not ruta.endswith(".py") or not os.path.isfile(ruta):
+        return None
+    ruta = os.path.realpath(ruta)
+    if any(ruta.startswith(externa + os.sep) for externa in _RUTAS_EXTERNAS):
+        return None
+    return ruta
+
+
+def _importaciones(arbol, paquete: str) -> set:
+    nombres = set()
+    for nodo in ast.walk(arbol):
+        if isinstance(nodo, ast.Import):
+            nombres.update(a.name for a in nodo.names)
+        elif isinstance(nodo, ast.ImportFrom):
+            try:
+                base = importlib.util.resolve_name("." * nodo.level + (nodo.module or ""), paquete) \
+                    if nodo.level else nodo.module
+            except ImportError:
+                continue
+            nombres.add(base)
+            # from paquete import submodulo (los nombres que no son módulos se descartan luego)
+            nombres.update(f"{base}.{a.name}" for a in nodo.names)
+    return nombres
+
+
+def modulos_dependientes(funcion) -> dict:
+    """
+    {módulo: archivo} del proyecto de los que depende `funcion`: los que importa en su
+    cuerpo, los de los nombres globales que usa y, transitivamente, los que estos importan.
+    El módulo donde está definida no cuenta (su código ya entra con la función).
+    """
+    propio = getattr(funcion, "__module__", None)
+    semillas = set()
+    try:
+        paquete = getattr(sys.modules.get(propio), "__package__", None) or ""
+        semillas |= _importaciones(ast.parse(textwrap.dedent(inspect.getsource(funcion))), paquete)
+    except (OSError, TypeError, SyntaxError):
+        pass
+    codigos, usados = [getattr(funcion, "__code__", None)], set()
+    while codigos:
+        codigo = codigos.pop()
+        if codigo is not None:
+            usados.update(codigo.co_names)
+            codigos.extend(c for c in codigo.co_consts if inspect.iscode(c))
+    globales = getattr(funcion, "__globals__", {})
+    for nombre in usados & globales.keys():
+        objeto = globales[nombre]
+        semillas.add(objeto.__name__ if inspect.ismodule(objeto) else getattr(objeto, "__module__", None))
+
+    vistos, pila = {}, [s for s in semillas if s]
+    while pila:
+        nombre = pila.pop()
+        if nombre in vistos or nombre == propio:
+            continue
+        ruta = vistos[nombre] = _archivo_del_proyecto(nombre)
+        if ruta is not None:
+            paquete = nombre if os.path.basename(ruta) == "__init__.py" else nombre.rpartition(".")[0]
+            with open(ruta, encoding="utf-8") as f:
+                pila.extend(_importaciones(ast.parse(f.read()), paquete))
+    return {n: r for n, r in sorted(vistos.items()) if r is not None}
+
+
+class Etapa:
+    """
+    Args:
+        nombre: Identificador único de la etapa
+        funcion: Callable(**parametros) que lee `entradas` y escribe `salidas`
+        entradas: Rutas (archivos o carpetas) que lee la etapa
+        salidas: Rutas que produce la etapa
+        parametros: Argumentos de `funcion`; forman parte de la clave de caché
+        version: Clave opcional para invalidar la caché a mano (p. ej. cambios en
+            dependencias instaladas, que no se hashean)
+    """
+
+    def __init__(self, nombre: str, funcion, entradas=(), salidas=(), parametros: dict = None,
+                 version: str = None):
+        self.nombre = nombre
+        self.funcion = funcion
+        self.version = version
+        self.entradas = [os.path.normpath(e) for e in entradas]
+        self.salidas = [os.path.normpath(s) for s in salidas]
+        self.parametros = parametros or {}
+
+    def __repr__(self):
+        return f"Etapa({self.nombre!r}, entradas={self.entradas}, salidas={self.salidas})"
+
+
+class Pipeline:
+    """
+    Args:
+        etapas: Lista de Etapa
+        directorio_estado: Carpeta donde se guarda estado_pipeline.json
+        max_workers: Etapas simultáneas
+    """
+
+    def __init__(self, etapas, directorio_estado: str = ".pipeline", max_workers: int = 4):
+        self.etapas = {e.nombre: e for e in etapas}
+        if len(self.etapas) != len(etapas):
+            raise ValueError("Hay etapas con nombre repetido")
+        self.directorio_estado = directorio_estado
+        self.max_workers = max_workers
+        self.productor = {}
+        for etapa in etapas:
+            for salida in etapa.salidas:
+                if salida in self.productor:
+                    raise ValueError(f"{salida} lo producen {self.productor[salida]} y {etapa.nombre}")
+                self.productor[salida] = etapa.nombre
+        self.dependencias = {e.nombre: {self.productor[x] for x in e.entradas if x in self.productor}
+                             for e in etapas}
+        self._validar_aciclico()
+        self.estado = self._cargar_estado()
+        self.ultima_corrida = []
+
+    # -- grafo ---------------------------------------------------------------
+
+    def _validar_aciclico(self):
+        pendientes = {k: set(v) for k, v in self.dependencias.items()}
+        while pendientes:
+            listas = [k for k, v in pendientes.items() if not v]
+            if not listas:
+                raise ValueError(f"Ciclo entre las etapas: {sorted(pendientes)}")
+            for k in listas:
+                del pendientes[k]
+            for v in pendientes.values():
+                v.difference_update(listas)
+
+    def _seleccion(self, objetivos):
+        """Etapas necesarias para producir `objetivos` (todas si es None)."""
+        if not objetivos:
+            return set(self.etapas)
+        seleccion, pila = set(), list(objetivos)
+        while pila:
+            nombre = pila.pop()
+            if nombre not in self.etapas:
+                raise KeyError(f"Etapa desconocida: {nombre}")
+            if nombre not in seleccion:
+                seleccion.add(nombre)
+                pila.extend(self.dependencias[nombre])
+        return seleccion
+
+    # -- hashing -------------------------------------------------------------
+
+    def _cargar_estado(self) -> dict:
+        ruta = os.path.join(self.directorio_estado, ARCHIVO_ESTADO)
+        if os.path.exists(ruta):
+            with open(ruta, encoding="utf-8") as f:
+                return json.load(f)
+        return {"etapas": {}, "archivos": {}}
+
+    def _guardar_estado(self):
+        os.makedirs(self.directorio_estado, exist_ok=True)
+        ruta = os.path.join(self.directorio_estado, ARCHIVO_ESTADO)
+        with open(ruta + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(self.estado, f, indent=2, sort_keys=True)
+        os.replace(ruta + ".tmp", ruta)
+
+    def _hash_archivo(self, ruta: str) -> str:
+        st = os.stat(ruta)
+        firma = [st.st_size, st.st_mtime_ns]
+        previo = self.estado["archivos"].get(ruta)
+        if previo and previo["firma"] == firma:
+            return previo["hash"]
+        h = hashlib.blake2b(digest_size=16)
+        with open(ruta, "rb") as f:
+            for bloque in iter(lambda: f.read(1 << 20), b""):
+                h.update(bloque)
+        self.estado["archivos"][ruta] = {"firma": firma, "hash": h.hexdigest()}
+        return h.hexdigest()
+
+    def hash_ruta(self, ruta: str):
+        """Hash del contenido de un archivo o carpeta (None si no existe)."""
+        if os.path.isfile(ruta):
+            return self._hash_archivo(ruta)
+        if not os.path.isdir(ruta):
+            return None
+        h = hashlib.blake2b(digest_size=16)
+        for raiz, carpetas, archivos in os.walk(ruta):
+            carpetas.sort()
+            for nombre in sorted(archivos):
+                completo = os.path.join(raiz, nombre)
+                h.update(os.path.relpath(completo, ruta).encode())
+                h.update(self._hash_archivo(completo).encode())
+        return h.hexdigest()
+
+    def clave(self, etapa: Etapa) -> str:
+        h = hashlib.blake2b(digest_size=16)
+        try:
+            codigo = inspect.getsource(etapa.funcion)
+        except (OSError, TypeError):
+            codigo = getattr(etapa.funcion, "__qualname__", repr(etapa.funcion))
+        h.update(codigo.encode())
+        for nombre, ruta in modulos_dependientes(etapa.funcion).items():
+            h.update(nombre.encode())
+            h.update(self._hash_archivo(ruta).encode())
+        h.update(str(etapa.version).encode())
+        h.update(json.dumps(etapa.parametros, sort_keys=True, default=str).encode())
+        for entrada in etapa.entradas:
+            contenido = self.hash_ruta(entrada)
+            if contenido is None:
+                raise FileNotFoundError(f"La etapa {etapa.nombre} necesita {entrada}")
+            h.update(entrada.encode())
+            h.update(contenido.encode())
+        return h.hexdigest()
+
+    def _vigente(self, etapa: Etapa, clave: str) -> bool:
+        previo = self.estado["etapas"].get(etapa.nombre)
+        if not previo or previo["clave"] != clave:
+            return False
+        return all(self.hash_ruta(s) == previo["salidas"].get(s) for s in etapa.salidas)
+
+    # -- ejecución -----------------------------------------------------------
+
+    def _correr(self, etapa: Etapa, forzar: bool) -> dict:
+        inicio = time.perf_counter()
+        clave = self.clave(etapa)
+        if not forzar and self._vigente(etapa, clave):
+            return {"etapa": etapa.nombre, "estado": "cache", "segundos": time.perf_counter() - inicio,
+                    "clave": clave[:12]}
+        for salida in etapa.salidas:
+            os.makedirs(os.path.dirname(salida) or ".", exist_ok=True)
+        etapa.funcion(**etapa.parametros)
+        faltantes = [s for s in etapa.salidas if not os.path.exists(s)]
+        if faltantes:
+            raise RuntimeError(f"La etapa {etapa.nombre} no produjo {faltantes}")
+        self.estado["etapas"][etapa.nombre] = {
+            "clave": clave, "salidas": {s: self.hash_ruta(s) for s in etapa.salidas},
+        }
+        return {"etapa": etapa.nombre, "estado": "ejecutada", "segundos": time.perf_counter() - inicio,
+                "clave": clave[:12]}
+
+    def ejecutar(self, objetivos=None, forzar=(), verbose: bool = True) -> pd.DataFrame:
+        """
+        Ejecuta las etapas necesarias para `objetivos` (todas por defecto).
+
+        Args:
+            objetivos: Nombres de etapas a producir (con sus dependencias)
+            forzar: Nombres de etapas a recalcular aunque estén en caché, o True para todas
+
+        Returns:
+            Resumen por etapa: estado (cache / ejecutada / error / omitida), segundos y clave
+        """
+        seleccion = self._seleccion(objetivos)
+        forzadas = set(seleccion) if forzar is True else set(forzar)
+        pendientes = {n: self.dependencias[n] & seleccion for n in seleccion}
+        terminadas, filas, fallidas = set(), [], set()
+        inicio = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as ex:
+            en_curso = {}
+            while pendientes or en_curso:
+                for nombre in sorted(n for n, deps in pendientes.items() if deps <= terminadas):
+                    del pendientes[nombre]
+                    en_curso[ex.submit(self._correr, self.etapas[nombre], nombre in forzadas)] = nombre
+                if not en_curso:
+                    break
+                hechos, _ = wait(en_curso, return_when=FIRST_COMPLETED)
+                for futuro in hechos:
+                    nombre = en_curso.pop(futuro)
+                    try:
+                        fila = futuro.result()
+                    except Exception as e:
+                        fila = {"etapa": nombre, "estado": "error", "segundos": None, "clave": None,
+                                "error": f"{type(e).__name__}: {e}"}
+                        fallidas.add(nombre)
+                    else:
+                        terminadas.add(nombre)
+                    filas.append(fila)
+                    if verbose:
+                        icono = {"cache": "♻️ ", "ejecutada": "✅", "error": "❌"}[fila["estado"]]
+                        detalle = fila.get("error") or f"{fila['segundos']:.2f}s"
+                        print(f"{icono} {nombre}: {fila['estado']} ({detalle})")
+            # Lo que queda pendiente depende de una etapa fallida
+            for nombre in sorted(pendientes):
+                filas.append({"etapa": nombre, "estado": "omitida", "segundos": None, "clave": None})
+        self._guardar_estado()
+
+        resumen = pd.DataFrame(filas, columns=["etapa", "estado", "segundos", "clave", "error"])
+        self.ultima_corrida = resumen
+        if verbose:
+            conteo = resumen["estado"].value_counts().to_dict()
+            print(f"🏁 Pipeline en {time.perf_counter() - inicio:.2f}s | "
+                  + " · ".join(f"{k}: {v}" for k, v in sorted(conteo.items())))
+        if fallidas:
+            errores = resumen.loc[resumen["estado"] == "error", ["etapa", "error"]].to_dict("records")
+            raise RuntimeError(f"Etapas con error: {errores}")
+        return resumen
@@ -0,0 +1,333 @@
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+
+# Columnas por seller que se grafican a partir de los resultados de analisis_inicial_completo
+METRICAS_VENDEDOR = {
+    'indice_variedad': ('indice_variedad', 'Índice de variedad (títulos únicos / total publicaciones)', False),
+    'desviacion_precio': ('std_precio', 'Desviación estándar de precios', False),
+    'proporcion_premium': ('proporcion_premium', 'Proporción de productos premium (precio > P75)', True),
+    'densidad_categoria': ('densidad_categoria', 'Publicaciones por categoría', False),
+    'relacion_publicaciones_stock': ('relacion_publicaciones_stock', 'Stock promedio / total publicaciones', False),
+    'ratio_nuevos_vs_reacondicionados': ('ratio_nuevo_usado', 'Ratio productos nuevos vs usados', False),
+    'proporcion_precios_bajos': ('proporcion_bajo_promedio', 'Proporción de productos con precio < promedio', True),
+}
+
+
+def _como_relacion(con, fuente):
+    """
+    Devuelve un nombre de relación consultable en DuckDB.
+    Si la fuente es un DataFrame se registra temporalmente en la conexión.
+    """
+    if isinstance(fuente, pd.DataFrame):
+        nombre = f"_plot_{uuid.uuid4().hex[:8]}"
+        con.register(nombre, fuente)
+        return nombre, True
+    return fuente, False
+
+
+def _expresion_valor(columna: str, log: bool) -> str:
+    col = f'CAST("{columna}" AS DOUBLE)'
+    return f"LN(1 + GREATEST({col}, 0))" if log else col
+
+
+def histograma_duckdb(con, fuente, columna: str, bins: int = 50, log: bool = False, filtro: str = None):
+    """
+    Calcula un histograma de una columna dentro de DuckDB y devuelve solo los bins.
+
+    Args:
+        con: Conexión a DuckDB
+        fuente: Nombre de tabla/vista o DataFrame (por ejemplo un resultado por seller)
+        columna: Columna numérica a agrupar
+        bins: Número de intervalos
+        log: Si es True agrupa sobre ln(1 + x)
+        filtro: Predicado SQL opcional para la cláusula WHERE
+
+    Returns:
+        DataFrame con limite_inferior, limite_superior y frecuencia (uno por bin)
+    """
+    relacion, temporal = _como_relacion(con, fuente)
+    where = f"AND ({filtro})" if filtro else ""
+    try:
+        df = con.execute(f"""
+            WITH base AS (
+                SELECT {_expresion_valor(columna, log)} AS v
+                FROM "{relacion}"
+                WHERE "{columna}" IS NOT NULL {where}
+            ),
+            lim AS (SELECT MIN(v) AS lo, MAX(v) AS hi FROM base WHERE isfinite(v))
+            SELECT
+                CASE WHEN lim.hi = lim.lo THEN 0
+                     ELSE LEAST(CAST(FLOOR((v - lim.lo) / ((lim.hi - lim.lo) / {bins})) AS INTEGER), {bins - 1})
+                END AS bin,
+                ANY_VALUE(lim.lo) AS lo,
+                ANY_VALUE(lim.hi) AS hi,
+                COUNT(*) AS frecuencia
+            FROM base, lim
+            WHERE isfinite(v)
+            GROUP BY bin
+            ORDER BY bin
+        """).fetchdf()
+    finally:
+        if temporal:
+            con.unregister(relacion)
+
+    if df.empty:
+        return pd.DataFrame(columns=['limite_inferior', 'limite_superior', 'frecuencia'])
+
+    lo, hi = float(df['lo'].iloc[0]), float(df['hi'].iloc[0])
+    ancho = (hi - lo) / bins if hi > lo else 1.0
+    completo = pd.DataFrame({'bin': np.arange(bins if hi > lo else 1)})
+    completo = completo.merge(df[['bin', 'frecuencia']], on='bin', how='left').fillna({'frecuencia': 0})
+    completo['limite_inferior'] = lo + completo['bin'] * ancho
+    completo['limite_superior'] = completo['limite_inferior'] + ancho
+    completo['frecuencia'] = completo['frecuencia'].astype('int64')
+    return completo[['limite_inferior', 'limite_superior', 'frecuencia']]
+
+
+def hexbin_duckdb(con, fuente, x: str, y: str, resolucion: int = 200,
+                  log_x: bool = False, log_y: bool = False, filtro: str = None):
+    """
+    Agrega una nube de puntos en una rejilla fina dentro de DuckDB.
+
+    El resultado (centros de celda + conteos) se dibuja luego con figura_hexbin,
+    que reagrupa las celdas en hexágonos sin recibir nunca los puntos originales.
+    """
+    relacion, temporal = _como_relacion(con, fuente)
+    where = f"AND ({filtro})" if filtro else ""
+    try:
+        df = con.execute(f"""
+            WITH base AS (
+                SELECT {_expresion_valor(x, log_x)} AS vx, {_expresion_valor(y, log_y)} AS vy
+                FROM "{relacion}"
+                WHERE "{x}" IS NOT NULL AND "{y}" IS NOT NULL {where}
+            ),
+            lim AS (
+                SELECT MIN(vx) AS x0, MAX(vx) AS x1, MIN(vy) AS y0, MAX(vy) AS y1
+                FROM base WHERE isfinite(vx) AND isfinite(vy)
+            ),
+            celdas AS (
+                SELECT
+                    CASE WHEN x1 = x0 THEN 0 ELSE LEAST(CAST(FLOOR((vx - x0) / ((x1 - x0) / {resolucion})) AS INTEGER), {resolucion - 1}) END AS ix,
+                    CASE WHEN y1 = y0 THEN 0 ELSE LEAST(CAST(FLOOR((vy - y0) / ((y1 - y0) / {resolucion})) AS INTEGER), {resolucion - 1}) END AS iy,
+                    x0, x1, y0, y1
+                FROM base, lim
+                WHERE isfinite(vx) AND isfinite(vy)
+            )
+            SELECT ix, iy, ANY_VALUE(x0) AS x0, ANY_VALUE(x1) AS x1,
+                   ANY_VALUE(y0) AS y0, ANY_VALUE(y1) AS y1, COUNT(*) AS frecuencia
+            FROM celdas
+            GROUP BY ix, iy
+        """).fetchdf()
+    finally:
+        if temporal:
+            con.unregister(relacion)
+
+    if df.empty:
+        return pd.DataFrame(columns=['x', 'y', 'frecuencia'])
+
+    x0, x1, y0, y1 = (float(df[c].iloc[0]) for c in ['x0', 'x1', 'y0', 'y1'])
+    ancho_x = (x1 - x0) / resolucion if x1 > x0 else 1.0
+    ancho_y = (y1 - y0) / resolucion if y1 > y0 else 1.0
+    return pd.DataFrame({
+        'x': x0 + (df['ix'] + 0.5) * ancho_x,
+        'y': y0 + (df['iy'] + 0.5) * ancho_y,
+        'frecuencia': df['frecuencia'].astype('int64'),
+    })
+
+
+# ---------------------------------------------------------------------------
+# Constructores de figuras: reciben solo datos agregados y no usan pyplot,
+# de modo que pueden ejecutarse en procesos separados.
+# ---------------------------------------------------------------------------
+
+def _nueva_figura(figsize=(10, 6)):
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=figsize)
+    return fig, fig.add_subplot(1, 1, 1)
+
+
+def _limpiar_ejes(ax):
+    ax.spines['top'].set_visible(False)
+    ax.spines['right'].set_visible(False)
+
+
+def figura_histograma(datos, titulo: str, xlabel: str = '', log: bool = False):
+    """Dibuja un histograma ya agregado (salida de histograma_duckdb)."""
+    fig, ax = _nueva_figura()
+    if datos is None or datos.empty:
+        ax.text(0.5, 0.5, 'Sin datos', ha='center', va='center')
+        ax.axis('off')
+    else:
+        anchos = datos['limite_superior'] - datos['limite_inferior']
+        ax.bar(datos['limite_inferior'], datos['frecuencia'], width=anchos, align='edge',
+               color='#1f77b4', edgecolor='white')
+        ax.set_xlabel(f"ln(1 + {xlabel})" if log else xlabel)
+        ax.set_ylabel('Frecuencia')
+        _limpiar_ejes(ax)
+    ax.set_title(titulo)
+    fig.tight_layout()
+    return fig
+
+
+def figura_hexbin(datos, titulo: str, xlabel: str = '', ylabel: str = '', gridsize: int = 40):
+    """Dibuja en hexágonos una rejilla ya agregada (salida de hexbin_duckdb)."""
+    from matplotlib.colors import LogNorm
+    fig, ax = _nueva_figura()
+    if datos is None or datos.empty:
+        ax.text(0.5, 0.5, 'Sin datos', ha='center', va='center')
+        ax.axis('off')
+    else:
+        hb = ax.hexbin(datos['x'], datos['y'], C=datos['frecuencia'], reduce_C_function=np.sum,
+                       gridsize=gridsize, cmap='viridis', norm=LogNorm(), mincnt=1)
+        fig.colorbar(hb, ax=ax, label='Frecuencia')
+        ax.set_xlabel(xlabel)
+        ax.set_ylabel(ylabel)
+    ax.set_title(titulo)
+    fig.tight_layout()
+    return fig
+
+
+def figura_barras(datos, x: str, y: str, titulo: str, xlabel: str = '', porcentaje: bool = False):
+    """Barras horizontales para tablas pequeñas (top N, nulos, entropía...)."""
+    from matplotlib.ticker import PercentFormatter
+    fig, ax = _nueva_figura()
+    if datos is None or datos.empty:
+        ax.text(0.5, 0.5, 'Sin datos', ha='center', va='center')
+        ax.axis('off')
+    else:
+        ax.barh(datos[y].astype(str), datos[x], color='#1f77b4')
+        ax.invert_yaxis()
+        ax.set_xlabel(xlabel or x)
+        if porcentaje:
+            ax.xaxis.set_major_formatter(PercentFormatter(1))
+        _limpiar_ejes(ax)
+    ax.set_title(titulo)
+    fig.tight_layout()
+    return fig
+
+
+def figura_correlacion(corr, titulo: str = 'Matriz de Correlación (variables numéricas)'):
+    """Mapa de calor de una matriz de correlación ya calculada."""
+    fig, ax = _nueva_figura(figsize=(8, 7))
+    if corr is None or corr.empty:
+        ax.text(0.5, 0.5, 'No hay variables numéricas', ha='center', va='center')
+        ax.axis('off')
+    else:
+        im = ax.imshow(corr.values, cmap='coolwarm', vmin=-1, vmax=1)
+        ax.set_xticks(range(len(corr.columns)))
+        ax.set_xticklabels(corr.columns, rotation=45, ha='right')
+        ax.set_yticks(range(len(corr.index)))
+        ax.set_yticklabels(corr.index)
+        for i in range(corr.shape[0]):
+            for j in range(corr.shape[1]):
+                ax.text(j, i, f"{corr.values[i, j]:.2f}", ha='center', va='center', fontsize=8)
+        fig.colorbar(im, ax=ax)
+    ax.set_title(titulo)
+    fig.tight_layout()
+    return fig
+
+
+CONSTRUCTORES = {
+    'histograma': figura_histograma,
+    'hexbin': figura_hexbin,
+    'barras': figura_barras,
+    'correlacion': figura_correlacion,
+}
+
+
+def preparar_figuras(con, tabla: str, resultados: dict, top_n: int = 10, bins: int = 50):
+    """
+    Construye las especificaciones de figuras a partir de un diccionario `resultados`
+    ya calculado, sin volver a ejecutar analisis_inicial_completo.
+
+    Las tablas por seller nunca se envían completas a matplotlib: se resumen en
+    histogramas calculados en DuckDB y en un top N obtenido con nlargest.
+
+    Returns:
+        Dict nombre_figura -> (tipo_constructor, kwargs)
+    """
+    especificaciones = {}
+
+    nulos = resultados.get('porcentaje_nulos')
+    if isinstance(nulos, pd.DataFrame):
+        especificaciones['porcentaje_nulos'] = ('barras', dict(
+            datos=nulos[nulos['porcentaje_nulos'] > 0].nlargest(top_n * 2, 'porcentaje_nulos'),
+            x='porcentaje_nulos', y='columna', titulo='Porcentaje de Valores Nulos por Columna',
+            porcentaje=True))
+
+    entropia = resultados.get('entropia')
+    if isinstance(entropia, pd.DataFrame) and not entropia.empty:
+        especificaciones['entropia'] = ('barras', dict(
+            datos=entropia.nlargest(top_n, 'entropia'), x='entropia', y='columna',
+            titulo=f'Top {top_n} Columnas con Mayor Entropía', xlabel='Entropía (bits)'))
+
+    especificaciones['correlacion_numerica'] = ('correlacion', dict(
+        corr=resultados.get('correlacion_numerica')))
+
+    for clave, (columna, etiqueta, porcentaje) in METRICAS_VENDEDOR.items():
+        df = resultados.get(clave)
+        if not isinstance(df, pd.DataFrame) or columna not in df.columns:
+            continue
+        especificaciones[f'top_{clave}'] = ('barras', dict(
+            datos=df.nlargest(top_n, columna)[['seller_nickname', columna]],
+            x=columna, y='seller_nickname', titulo=f'Top {top_n} Vendedores - {clave}',
+            xlabel=etiqueta, porcentaje=porcentaje))
+        especificaciones[f'hist_{clave}'] = ('histograma', dict(
+            datos=histograma_duckdb(con, df[[columna]], columna, bins=bins),
+            titulo=f'Distribución por vendedor - {clave}', xlabel=etiqueta))
+
+    esquema = resultados.get('esquema')
+    columnas = set(esquema['column_name']) if isinstance(esquema, pd.DataFrame) else set()
+    if {'price', 'stock'} <= columnas:
+        especificaciones['hexbin_precio_stock'] = ('hexbin', dict(
+            datos=hexbin_duckdb(con, tabla, 'price', 'stock', log_x=True, log_y=True),
+            titulo='Densidad de publicaciones: precio vs stock',
+            xlabel='ln(1 + price)', ylabel='ln(1 + stock)'))
+        especificaciones['hist_precio'] = ('histograma', dict(
+            datos=histograma_duckdb(con, tabla, 'price', bins=bins, log=True),
+            titulo='Distribución de precios', xlabel='price', log=True))
+
+    variedad = resultados.get('indice_variedad')
+    if isinstance(variedad, pd.DataFrame) and {'total_publicaciones', 'indice_variedad'} <= set(variedad.columns):
+        especificaciones['hexbin_publicaciones_variedad'] = ('hexbin', dict(
+            datos=hexbin_duckdb(con, variedad[['total_publicaciones', 'indice_variedad']],
+                                'total_publicaciones', 'indice_variedad', log_x=True),
+            titulo='Vendedores: publicaciones vs índice de variedad',
+            xlabel='ln(1 + total_publicaciones)', ylabel='indice_variedad'))
+
+    return especificaciones
+
+
+def _renderizar_una(tarea):
+    tipo, kwargs, ruta = tarea
+    fig = CONSTRUCTORES[tipo](**kwargs)
+    fig.savefig(ruta, dpi=100, bbox_inches='tight')
+    return ruta
+
+
+def renderizar_png(especificaciones: dict, directorio_salida: str, max_workers: int = None):
+    """
+    Renderiza las figuras a archivos PNG en paralelo (un proceso por figura).
+
+    Pensado para reportes sin interfaz gráfica: cada proceso construye su figura
+    con la API orientada a objetos de matplotlib (sin pyplot) y la guarda en disco.
+
+    Returns:
+        Dict nombre_figura -> ruta del PNG generado
+    """
+    os.makedirs(directorio_salida, exist_ok=True)
+    tareas = [
+        (tipo, kwargs, os.path.join(directorio_salida, f"{nombre}.png"))
+        for nombre, (tipo, kwargs) in especificaciones.items()
+    ]
+    if max_workers == 1 or len(tareas) <= 1:
+        rutas = [_renderizar_una(t) for t in tareas]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as ex:
+            rutas = list(ex.map(_renderizar_una, tareas))
+    return dict(zip(especificaciones.keys(), rutas))
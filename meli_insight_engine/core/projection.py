@@ -0,0 +1,200 @@
+"""
+Proyección PCA 2D de sellers sin cargar la población completa en memoria.
+
+El notebook 02 ajusta PCA(n_components=2) dos veces sobre la matriz completa
+(una para el scatter y otra para pca_loadings.csv) y dibuja cada seller como
+un punto. Aquí:
+
+- Las features por seller salen de DuckDB como lotes Arrow (fetch_record_batch).
+- IncrementalPCA se ajusta con partial_fit lote a lote, en el mismo espacio
+  escalado por pre_pipe, y se persiste con joblib junto con una huella de los
+  parámetros de pre_pipe: si el escalador cambia, la proyección guardada se
+  descarta y se vuelve a ajustar.
+- Loadings y proyección reutilizan el mismo ajuste.
+- La figura es una rejilla de densidad 2D acumulada lote a lote con
+  np.histogram2d (opcionalmente una por cluster) que se dibuja con
+  figura_hexbin: nunca se guardan ni se dibujan los puntos individuales.
+"""
+import hashlib
+import time
+
+import numpy as np
+import pandas as pd
+
+from .cluster_udf import asignar_cluster, parametros_escalado, parametros_modelo
+from .features import FEATURES, sql_features_seller
+
+RUTA_PROYECCION = "models/proyeccion_pca.joblib"
+FILAS_POR_LOTE = 100_000
+# Límites de la rejilla: ±SIGMAS desviaciones estándar de cada componente
+SIGMAS = 5.0
+
+
+def lotes_features(con, tabla: str, filtro: str = None, filas_por_lote: int = FILAS_POR_LOTE):
+    """Itera lotes Arrow de features por seller calculadas en DuckDB."""
+    lector = con.execute(sql_features_seller(tabla, filtro)).fetch_record_batch(filas_por_lote)
+    for lote in lector:
+        if lote.num_rows:
+            yield lote
+
+
+def huella_pre_pipe(pre_pipe) -> str:
+    """Hash de la mediana, el centro y la escala de pre_pipe (identifica el espacio escalado)."""
+    h = hashlib.blake2b(digest_size=16)
+    for nombre, valores in sorted(parametros_escalado(pre_pipe).items()):
+        h.update(nombre.encode())
+        h.update(valores.tobytes())
+    return h.hexdigest()
+
+
+def _matriz(lote) -> np.ndarray:
+    return np.column_stack([lote.column(f).to_numpy(zero_copy_only=False).astype(np.float64)
+                            for f in FEATURES])
+
+
+class ProyeccionPCA:
+    """
+    Args:
+        pre_pipe: SimpleImputer + RobustScaler entrenados (mismo espacio que KMeans)
+        n_components: Componentes de la proyección
+    """
+
+    def __init__(self, pre_pipe, n_components: int = 2):
+        from sklearn.decomposition import IncrementalPCA
+
+        self.pre_pipe = pre_pipe
+        self.huella = huella_pre_pipe(pre_pipe)
+        self.n_components = n_components
+        self.pca = IncrementalPCA(n_components=n_components)
+        self.n_sellers = 0
+
+    def _escalar(self, X: np.ndarray) -> np.ndarray:
+        return self.pre_pipe.transform(pd.DataFrame(X, columns=FEATURES))
+
+    def ajustar(self, lotes) -> "ProyeccionPCA":
+        """partial_fit sobre un iterable de lotes (Arrow o matrices (n, 9) en escala original)."""
+        # partial_fit exige al menos n_components filas: se ajusta con un lote de
+        # retraso y los lotes más chicos que eso se suman al pendiente
+        pendiente = None
+        for lote in lotes:
+            X = self._escalar(lote if isinstance(lote, np.ndarray) else _matriz(lote))
+            if pendiente is not None and (len(X) < self.n_components or len(pendiente) < self.n_components):
+                pendiente = np.vstack([pendiente, X])
+                continue
+            if pendiente is not None:
+                self._partial_fit(pendiente)
+            pendiente = X
+        if pendiente is None or len(pendiente) < self.n_components:
+            raise ValueError(f"Se necesitan al menos {self.n_components} sellers para ajustar PCA")
+        self._partial_fit(pendiente)
+        return self
+
+    def _partial_fit(self, X: np.ndarray):
+        self.pca.partial_fit(X)
+        self.n_sellers += len(X)
+
+    def proyectar(self, X: np.ndarray) -> np.ndarray:
+        """Coordenadas PC de una matriz (n, 9) en escala original."""
+        return self.pca.transform(self._escalar(X))
+
+    def loadings(self, decimales: int = 3) -> pd.DataFrame:
+        """Misma tabla que data/pca_loadings.csv (features × PC1..PCn)."""
+        return pd.DataFrame(self.pca.components_.T, index=FEATURES,
+                            columns=[f"PC{i + 1}" for i in range(self.n_components)]).round(decimales)
+
+    def varianza_explicada(self) -> np.ndarray:
+        return self.pca.explained_variance_ratio_
+
+    def limites(self, sigmas: float = SIGMAS):
+        """((x0, x1), (y0, y1)) de la rejilla a partir de la varianza de PC1 y PC2."""
+        desvio = np.sqrt(self.pca.explained_variance_[:2]) * sigmas
+        return (-desvio[0], desvio[0]), (-desvio[1], desvio[1])
+
+    def rejilla_densidad(self, lotes, resolucion: int = 200, kmeans=None, sigmas: float = SIGMAS) -> pd.DataFrame:
+        """
+        Conteo de sellers por celda de una rejilla PC1 × PC2, acumulado lote a lote.
+
+        Los puntos fuera de ±sigmas desviaciones se cuentan en la celda del borde.
+        Con `kmeans` se cuenta además por cluster (columna cluster).
+
+        Returns:
+            DataFrame con x, y (centro de celda), frecuencia [y cluster], solo celdas no vacías
+        """
+        (x0, x1), (y0, y1) = self.limites(sigmas)
+        bordes_x = np.linspace(x0, x1, resolucion + 1)
+        bordes_y = np.linspace(y0, y1, resolucion + 1)
+        n_clusters = kmeans.n_clusters if kmeans is not None else 1
+        parametros = parametros_modelo(self.pre_pipe, kmeans) if kmeans is not None else None
+        conteos = np.zeros((n_clusters, resolucion, resolucion), dtype=np.int64)
+        for lote in lotes:
+            X = lote if isinstance(lote, np.ndarray) else _matriz(lote)
+            P = self.pca.transform(self._escalar(X))
+            px = np.clip(P[:, 0], x0, x1)
+            py = np.clip(P[:, 1], y0, y1)
+            etiquetas = asignar_cluster(X, parametros) if parametros else np.zeros(len(P), dtype=int)
+            for c in np.unique(etiquetas):
+                m = etiquetas == c
+                conteos[c] += np.histogram2d(px[m], py[m], bins=[bordes_x, bordes_y])[0].astype(np.int64)
+
+        centros_x = (bordes_x[:-1] + bordes_x[1:]) / 2
+        centros_y = (bordes_y[:-1] + bordes_y[1:]) / 2
+        c, ix, iy = np.nonzero(conteos)
+        rejilla = pd.DataFrame({"x": centros_x[ix], "y": centros_y[iy], "frecuencia": conteos[c, ix, iy]})
+        if kmeans is not None:
+            rejilla["cluster"] = c
+        return rejilla
+
+    def guardar(self, ruta: str = RUTA_PROYECCION):
+        import joblib
+
+        joblib.dump(self, ruta, compress=3)
+        return ruta
+
+    @staticmethod
+    def cargar(ruta: str = RUTA_PROYECCION) -> "ProyeccionPCA":
+        import joblib
+
+        return joblib.load(ruta)
+
+
+def construir_proyeccion(con, tabla: str, pre_pipe, kmeans=None, ruta: str = None, filtro: str = None,
+                         resolucion: int = 200, ruta_loadings: str = None, directorio_png: str = None,
+                         filas_por_lote: int = FILAS_POR_LOTE, verbose: bool = True) -> dict:
+    """
+    Ajusta (o carga desde `ruta` si existe y fue ajustada con el mismo pre_pipe) la
+    proyección, y devuelve loadings y rejilla.
+
+    Returns:
+        Dict con proyeccion, loadings, varianza_explicada, rejilla y (si se pide) png
+    """
+    import os
+
+    inicio = time.perf_counter()
+    proyeccion = ProyeccionPCA.cargar(ruta) if ruta and os.path.exists(ruta) else None
+    if proyeccion is not None and getattr(proyeccion, "huella", None) != huella_pre_pipe(pre_pipe):
+        if verbose:
+            print(f"♻️ {ruta} se ajustó con otro pre_pipe; se vuelve a ajustar")
+        proyeccion = None
+    if proyeccion is None:
+        proyeccion = ProyeccionPCA(pre_pipe).ajustar(lotes_features(con, tabla, filtro, filas_por_lote))
+        if ruta:
+            proyeccion.guardar(ruta)
+    rejilla = proyeccion.rejilla_densidad(lotes_features(con, tabla, filtro, filas_por_lote),
+                                          resolucion, kmeans)
+    loadings = proyeccion.loadings()
+    if ruta_loadings:
+        loadings.to_csv(ruta_loadings)
+    resultado = {"proyeccion": proyeccion, "loadings": loadings,
+                 "varianza_explicada": proyeccion.varianza_explicada(), "rejilla": rejilla}
+    if directorio_png:
+        from .plotting import renderizar_png
+
+        totales = rejilla.groupby(["x", "y"], as_index=False)["frecuencia"].sum()
+        var = proyeccion.varianza_explicada()
+        resultado["png"] = renderizar_png({"proyeccion_pca": ("hexbin", dict(
+            datos=totales, titulo=f"Sellers - Proyección PCA 2D ({proyeccion.n_sellers:,} sellers)",
+            xlabel=f"PC1 ({var[0]:.0%})", ylabel=f"PC2 ({var[1]:.0%})"))}, directorio_png, max_workers=1)
+    if verbose:
+        print(f"🗺️  Proyección PCA: {proyeccion.n_sellers:,} sellers, {len(rejilla):,} celdas "
+              f"({time.perf_counter() - inicio:.1f}s)")
+    return resultado
@@ -0,0 +1,238 @@
+"""
+Segmentación incremental de sellers.
+
+En la corrida nocturna la mayoría de sellers apenas mueve sus nueve features.
+Se guarda por seller el último vector escalado, su hash, el cluster, el margen
+a la frontera de decisión de KMeans y la recomendación; un seller se
+reclasifica solo si su desplazamiento puede cambiarle el cluster y la
+recomendación se regenera solo si el cambio supera la tolerancia.
+
+Margen: distancia del punto al hiperplano bisector más cercano entre su
+centroide c1 y cualquier otro centroide cj,
+
+    min_j (||x - cj||² - ||x - c1||²) / (2 ||c1 - cj||)
+
+Las celdas de KMeans son convexas, así que si el punto se desplaza menos que
+ese margen no puede salir de su celda.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from .features import FEATURES, features_seller
+
+TABLA_ESTADO = "estado_sellers"
+COLUMNAS_ESCALADAS = [f"esc_{f}" for f in FEATURES]
+
+
+def cargar_modelos(directorio: str = "models"):
+    """Carga (pre_pipe, kmeans) desde la carpeta de artefactos."""
+    import joblib
+
+    return (joblib.load(os.path.join(directorio, "pre_pipe.pkl")),
+            joblib.load(os.path.join(directorio, "kmeans.pkl")))
+
+
+def hash_features(features: pd.DataFrame, decimales: int = 6) -> np.ndarray:
+    """Hash uint64 por fila de las FEATURES redondeadas (vectorizado)."""
+    redondeadas = features[FEATURES].astype("float64").round(decimales)
+    return pd.util.hash_pandas_object(redondeadas, index=False).to_numpy()
+
+
+def margen_frontera(X_esc: np.ndarray, centroides: np.ndarray):
+    """
+    Cluster más cercano y margen a la frontera de decisión para cada fila.
+
+    Returns:
+        (cluster: int ndarray, margen: float ndarray)
+    """
+    d2 = ((X_esc[:, None, :] - centroides[None, :, :]) ** 2).sum(axis=2)
+    cluster = d2.argmin(axis=1)
+    d2_propio = d2[np.arange(len(X_esc)), cluster]
+    sep = np.linalg.norm(centroides[:, None, :] - centroides[None, :, :], axis=2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        margenes = (d2 - d2_propio[:, None]) / (2 * sep[cluster])
+    margenes[np.arange(len(X_esc)), cluster] = np.inf
+    return cluster, margenes.min(axis=1)
+
+
+def crear_tabla_estado(con, tabla_estado: str = TABLA_ESTADO):
+    columnas = ", ".join(f'"{c}" DOUBLE' for c in COLUMNAS_ESCALADAS)
+    con.execute(f"""
+        CREATE TABLE IF NOT EXISTS "{tabla_estado}" (
+            seller_nickname VARCHAR PRIMARY KEY,
+            hash UBIGINT,
+            {columnas},
+            cluster INTEGER,
+            margen DOUBLE,
+            recomendacion VARCHAR,
+            actualizado TIMESTAMP
+        )
+    """)
+
+
+class ReclasificadorIncremental:
+    """
+    Decide por seller si hay que reclasificar y/o regenerar la recomendación.
+
+    Args:
+        con: Conexión DuckDB donde vive la tabla de estado
+        pre_pipe: SimpleImputer + RobustScaler entrenados
+        kmeans: KMeans entrenado sobre la salida de pre_pipe
+        tolerancia: Desplazamiento máximo (norma L2 en el espacio escalado) que
+            no amerita una nueva recomendación
+        tabla_estado: Nombre de la tabla de estado
+        monitor: MonitorDrift opcional; cada lote evaluado actualiza sus conteos
+    """
+
+    def __init__(self, con, pre_pipe, kmeans, tolerancia: float = 0.1,
+                 tabla_estado: str = TABLA_ESTADO, monitor=None):
+        self.con = con
+        self.monitor = monitor
+        self.pre_pipe = pre_pipe
+        self.centroides = np.asarray(kmeans.cluster_centers_, dtype=np.float64)
+        self.tolerancia = tolerancia
+        self.tabla_estado = tabla_estado
+        crear_tabla_estado(con, tabla_estado)
+
+    def _estado(self) -> pd.DataFrame:
+        return self.con.execute(f'SELECT * FROM "{self.tabla_estado}"').fetchdf()
+
+    def evaluar(self, features: pd.DataFrame) -> pd.DataFrame:
+        """
+        Args:
+            features: DataFrame con seller_nickname y las FEATURES (p. ej. features_seller)
+
+        Returns:
+            DataFrame por seller con hash, vector escalado, cluster, margen,
+            desplazamiento, motivo, clasificado y requiere_llm
+        """
+        features = features.reset_index(drop=True)
+        if self.monitor is not None:
+            self.monitor.actualizar(features)
+        X_esc = self.pre_pipe.transform(features[FEATURES])
+        dec = pd.DataFrame(X_esc, columns=COLUMNAS_ESCALADAS)
+        dec.insert(0, "seller_nickname", features["seller_nickname"].to_numpy())
+        dec.insert(1, "hash", hash_features(features))
+
+        # get_indexer en lugar de reindex: un reindex con faltantes pasaría el hash uint64 a float
+        estado = self._estado()
+        pos = pd.Index(estado["seller_nickname"]).get_indexer(dec["seller_nickname"])
+        existe = pos >= 0
+        pos = np.where(existe, pos, 0)
+
+        def previo(col, dtype=np.float64):
+            valores = estado[col].to_numpy()[pos] if len(estado) else np.zeros(len(dec))
+            valores = valores.astype(dtype) if dtype is not object else valores
+            if dtype is np.float64:
+                valores[~existe] = np.nan
+            return valores
+
+        sin_cambios = existe & (previo("hash", np.uint64) == dec["hash"].to_numpy())
+        desplazamiento = np.linalg.norm(X_esc - np.column_stack([previo(c) for c in COLUMNAS_ESCALADAS]), axis=1)
+        margen_prev = previo("margen")
+        no_cruza = existe & (desplazamiento < margen_prev)
+        dentro_tol = existe & (desplazamiento <= self.tolerancia)
+
+        clasificar = ~sin_cambios & ~no_cruza
+        cluster_prev = previo("cluster")
+        cluster = cluster_prev.copy()
+        margen = margen_prev.copy()
+        if clasificar.any():
+            c, m = margen_frontera(X_esc[clasificar], self.centroides)
+            cluster[clasificar], margen[clasificar] = c, m
+        # Los que no pueden cruzar pero se guardarán con vector nuevo necesitan su margen actualizado
+        solo_margen = no_cruza & ~dentro_tol
+        if solo_margen.any():
+            margen[solo_margen] = margen_frontera(X_esc[solo_margen], self.centroides)[1]
+        cambia_cluster = clasificar & existe & (cluster != cluster_prev)
+
+        dec["cluster"] = cluster.astype(int)
+        dec["margen"] = margen
+        dec["desplazamiento"] = desplazamiento
+        dec["clasificado"] = clasificar
+        recomendacion = previo("recomendacion", object) if len(estado) else np.full(len(dec), None)
+        dec["recomendacion"] = np.where(existe, recomendacion, None)
+        # Guardados solo para clasificación (el generador no les devolvió recomendación)
+        sin_recomendacion = existe & pd.isna(dec["recomendacion"]).to_numpy()
+        dec["requiere_llm"] = ~existe | sin_recomendacion | cambia_cluster | (~sin_cambios & ~dentro_tol)
+        dec["motivo"] = np.select(
+            [~existe, sin_recomendacion, sin_cambios, cambia_cluster, no_cruza & dentro_tol, no_cruza, dentro_tol],
+            ["nuevo", "sin_recomendacion", "sin_cambios", "cambio_cluster", "estable", "cambio_sin_cruce",
+             "reclasificado_estable"],
+            default="cambio_mismo_cluster",
+        )
+        return dec
+
+    def actualizar(self, decisiones: pd.DataFrame, recomendaciones: dict = None):
+        """
+        Guarda el nuevo estado solo de los sellers con nueva recomendación en
+        `recomendaciones`. El resto (incluidos los reclasificados al mismo cluster dentro
+        de la tolerancia) conserva el vector de su última recomendación, así el desvío se
+        acumula contra esa referencia y al superar `tolerancia` se regenera. Los sellers
+        nuevos sin recomendación se guardan solo con su clasificación y se vuelven a pedir
+        en la próxima corrida (motivo sin_recomendacion); los que ya tenían una y el
+        generador omitió (o falló) no se tocan, así siguen pendientes.
+        """
+        recomendaciones = recomendaciones or {}
+        nuevas = decisiones["seller_nickname"].map(recomendaciones)
+        cambios = decisiones[decisiones["requiere_llm"]
+                             & (nuevas.notna() | (decisiones["motivo"] == "nuevo"))].copy()
+        if cambios.empty:
+            return 0
+        cambios["recomendacion"] = nuevas[cambios.index]
+        cambios["actualizado"] = pd.Timestamp.now()
+        columnas = ["seller_nickname", "hash", *COLUMNAS_ESCALADAS, "cluster", "margen",
+                    "recomendacion", "actualizado"]
+        self.con.register("_estado_nuevo", cambios[columnas])
+        lista = ", ".join(f'"{c}"' for c in columnas)
+        self.con.execute(f'INSERT OR REPLACE INTO "{self.tabla_estado}" ({lista}) '
+                         f'SELECT {lista} FROM _estado_nuevo')
+        self.con.unregister("_estado_nuevo")
+        return len(cambios)
+
+
+def reporte_reclasificacion(decisiones: pd.DataFrame) -> dict:
+    """Conteos de sellers omitidos vs recalculados, por motivo."""
+    return {
+        "sellers": len(decisiones),
+        "clasificados": int(decisiones["clasificado"].sum()),
+        "clasificacion_omitida": int((~decisiones["clasificado"]).sum()),
+        "llm_regenerados": int(decisiones["requiere_llm"].sum()),
+        "llm_omitidos": int((~decisiones["requiere_llm"]).sum()),
+        "por_motivo": decisiones["motivo"].value_counts().to_dict(),
+    }
+
+
+def reclasificar_incremental(con, tabla: str, pre_pipe, kmeans, generar_recomendaciones=None,
+                             tolerancia: float = 0.1, filtro: str = None,
+                             tabla_estado: str = TABLA_ESTADO, monitor=None, verbose: bool = True):
+    """
+    Corrida incremental completa: features por seller -> decisiones -> LLM solo
+    para los que lo requieren -> actualización del estado.
+
+    Args:
+        generar_recomendaciones: Función DataFrame(decisiones que requieren LLM) ->
+            {seller_nickname: recomendación}; si es None solo se reclasifica. Los sellers
+            que no vengan en el dict quedan pendientes para la próxima corrida
+        monitor: MonitorDrift opcional; su reporte se agrega al reporte como "drift"
+
+    Returns:
+        (decisiones, reporte)
+    """
+    reclasificador = ReclasificadorIncremental(con, pre_pipe, kmeans, tolerancia, tabla_estado, monitor)
+    decisiones = reclasificador.evaluar(features_seller(con, tabla, filtro))
+    recomendaciones = {}
+    pendientes = decisiones[decisiones["requiere_llm"]]
+    if generar_recomendaciones is not None and not pendientes.empty:
+        recomendaciones = generar_recomendaciones(pendientes)
+    reclasificador.actualizar(decisiones, recomendaciones)
+    reporte = reporte_reclasificacion(decisiones)
+    if monitor is not None:
+        reporte["drift"] = monitor.reporte()
+    if verbose:
+        print(f"🔁 {reporte['sellers']} sellers | reclasificados: {reporte['clasificados']} "
+              f"(omitidos {reporte['clasificacion_omitida']}) | LLM: {reporte['llm_regenerados']} "
+              f"(omitidos {reporte['llm_omitidos']})")
+    return decisiones, reporte
@@ -0,0 +1,350 @@
+"""
+Agregación por seller en shards (varios procesos o varias máquinas).
+
+1. particionar_por_seller escribe las publicaciones en N shards Parquet por
+   hash(seller_nickname): cada seller cae completo en un shard, así que toda
+   métrica agrupada por seller se calcula en el shard sin mirar a los demás.
+2. Pre-pasada: cada shard devuelve un SketchCuantiles de price (buckets
+   logarítmicos al estilo DDSketch, combinables sumando conteos) más suma y
+   conteo exactos. El coordinador combina los sketches, ubica el bucket del
+   p75 y, con una segunda lectura solo de ese bucket, obtiene el valor exacto
+   (semántica de quantile_disc). La media sale de suma / conteo.
+3. Cada shard calcula features y métricas con esos estadísticos globales y
+   escribe su resultado en <directorio>/resultados/shard=<k>/.
+4. combinar_resultados concatena en orden de shard y ordena por
+   seller_nickname: el resultado no depende del orden en que terminan los
+   workers.
+
+Cada particionado vacía los datos, resultados y estadísticos que haya dejado
+una corrida anterior en el mismo directorio, y un shard sin filas borra su
+carpeta de resultados: relanzar con otro filtro no mezcla sellers viejos.
+
+Como todo se comunica por archivos, cada paso de shard puede correr en otra
+máquina que monte el mismo directorio:
+
+    python -m core.sharding estadisticos --directorio D --shard 3
+    python -m core.sharding agregar --directorio D --shard 3
+"""
+import argparse
+import glob
+import json
+import math
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from .features import features_seller
+
+ALPHA_SKETCH = 0.01
+CUANTIL_PREMIUM = 0.75
+ARCHIVO_MANIFIESTO = "manifiesto.json"
+ARCHIVO_ESTADISTICOS = "estadisticos_globales.json"
+# Bucket único para valores <= 0 (se ordena antes que cualquier bucket positivo)
+BUCKET_NO_POSITIVO = -(2 ** 31)
+
+# Métricas por seller del inspector que se calculan en cada shard
+METRICAS = (
+    "indice_variedad", "desviacion_precio", "proporcion_premium", "densidad_categoria",
+    "relacion_publicaciones_stock", "ratio_nuevos_vs_reacondicionados", "proporcion_precios_bajos",
+)
+
+
+def sql_bucket(columna: str, gamma: float) -> str:
+    """Índice de bucket k con columna en (gamma^(k-1), gamma^k]."""
+    return (f"CASE WHEN {columna} > 0 THEN CAST(ceil(ln({columna}) / ln({gamma!r})) AS INTEGER) "
+            f"ELSE {BUCKET_NO_POSITIVO} END")
+
+
+class SketchCuantiles:
+    """
+    Sketch de cuantiles combinable con error relativo `alpha`.
+
+    Args:
+        alpha: Precisión relativa de cuantil(); gamma = (1 + alpha) / (1 - alpha)
+        conteos: {bucket: n} ya calculados
+        suma: Suma exacta de los valores (para la media global)
+    """
+
+    def __init__(self, alpha: float = ALPHA_SKETCH, conteos: dict = None, suma: float = 0.0):
+        self.alpha = alpha
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self.conteos = {int(k): int(v) for k, v in (conteos or {}).items()}
+        self.suma = float(suma)
+
+    @classmethod
+    def desde_duckdb(cls, con, tabla: str, columna: str = "price", alpha: float = ALPHA_SKETCH):
+        """Construye el sketch con un GROUP BY por bucket dentro de DuckDB."""
+        sketch = cls(alpha)
+        filas = con.execute(f"""
+            SELECT {sql_bucket(columna, sketch.gamma)} AS bucket, COUNT(*), SUM({columna})
+            FROM "{tabla}" WHERE {columna} IS NOT NULL
+            GROUP BY bucket
+        """).fetchall()
+        # Suma en orden de bucket: mismo resultado en cualquier corrida
+        for bucket, n, suma in sorted(filas):
+            sketch.conteos[bucket] = n
+            sketch.suma += suma
+        return sketch
+
+    @property
+    def n(self) -> int:
+        return sum(self.conteos.values())
+
+    def combinar(self, otro: "SketchCuantiles") -> "SketchCuantiles":
+        if otro.alpha != self.alpha:
+            raise ValueError(f"No se pueden combinar sketches con alpha {self.alpha} y {otro.alpha}")
+        conteos = dict(self.conteos)
+        for k, v in otro.conteos.items():
+            conteos[k] = conteos.get(k, 0) + v
+        return SketchCuantiles(self.alpha, conteos, self.suma + otro.suma)
+
+    __add__ = combinar
+
+    def media(self) -> float:
+        return self.suma / self.n if self.n else None
+
+    def rango(self, q: float) -> int:
+        """Posición (base 0) del cuantil q en los valores ordenados, como quantile_disc."""
+        return max(0, math.ceil(q * self.n) - 1)
+
+    def ubicar(self, q: float):
+        """(bucket que contiene el cuantil q, posición del cuantil dentro del bucket)."""
+        r = self.rango(q)
+        acumulado = 0
+        for bucket in sorted(self.conteos):
+            if acumulado + self.conteos[bucket] > r:
+                return bucket, r - acumulado
+            acumulado += self.conteos[bucket]
+        raise ValueError("Sketch vacío")
+
+    def cuantil(self, q: float) -> float:
+        """Cuantil aproximado con error relativo <= alpha (para valores positivos)."""
+        bucket, _ = self.ubicar(q)
+        if bucket == BUCKET_NO_POSITIVO:
+            return 0.0
+        return 2 * self.gamma ** bucket / (self.gamma + 1)
+
+    def a_dict(self) -> dict:
+        return {"alpha": self.alpha, "suma": self.suma,
+                "conteos": {str(k): v for k, v in sorted(self.conteos.items())}}
+
+    @classmethod
+    def desde_dict(cls, datos: dict) -> "SketchCuantiles":
+        return cls(datos["alpha"], datos["conteos"], datos["suma"])
+
+
+# ---------------------------------------------------------------------------
+# Particionado y lectura de shards
+# ---------------------------------------------------------------------------
+
+def particionar_por_seller(con, tabla: str, directorio: str, n_shards: int, filtro: str = None,
+                           verbose: bool = True) -> dict:
+    """
+    Escribe `tabla` en n_shards particiones Parquet por hash(seller_nickname).
+    Antes borra datos, resultados y estadísticos de una corrida previa en `directorio`.
+
+    Returns:
+        Manifiesto (también guardado en <directorio>/manifiesto.json)
+    """
+    inicio = time.perf_counter()
+    ruta_datos = os.path.join(directorio, "datos")
+    _limpiar_corrida(directorio)
+    where = f"WHERE ({filtro})" if filtro else ""
+    con.execute(f"""
+        COPY (
+            SELECT *, CAST(hash(seller_nickname) % {n_shards} AS INTEGER) AS shard
+            FROM "{tabla}" {where}
+        ) TO '{ruta_datos}' (FORMAT PARQUET, PARTITION_BY (shard), OVERWRITE_OR_IGNORE)
+    """)
+    filas = dict(con.execute(f"""
+        SELECT shard, COUNT(*) FROM read_parquet('{ruta_datos}/*/*.parquet', hive_partitioning = true)
+        GROUP BY shard
+    """).fetchall())
+    manifiesto = {"tabla": tabla, "n_shards": n_shards,
+                  "filas_por_shard": {str(k): int(filas.get(k, 0)) for k in range(n_shards)}}
+    with open(os.path.join(directorio, ARCHIVO_MANIFIESTO), "w") as f:
+        json.dump(manifiesto, f, indent=2)
+    if verbose:
+        print(f"🧩 {sum(filas.values()):,} publicaciones en {n_shards} shards "
+              f"({time.perf_counter() - inicio:.1f}s)")
+    return manifiesto
+
+
+def _limpiar_corrida(directorio: str):
+    for carpeta in ("datos", "resultados"):
+        shutil.rmtree(os.path.join(directorio, carpeta), ignore_errors=True)
+    for archivo in glob.glob(os.path.join(directorio, "estadisticos_*.json")):
+        os.remove(archivo)
+
+
+def _conectar_shard(directorio: str, shard: int, vista: str = "listings"):
+    import duckdb
+
+    con = duckdb.connect()
+    archivos = glob.glob(os.path.join(directorio, "datos", f"shard={shard}", "*.parquet"))
+    if archivos:
+        lista = ", ".join(f"'{a}'" for a in sorted(archivos))
+        con.execute(f'CREATE VIEW "{vista}" AS SELECT * EXCLUDE (shard) '
+                    f'FROM read_parquet([{lista}], hive_partitioning = true)')
+    return con, bool(archivos)
+
+
+def estadisticos_shard(directorio: str, shard: int, alpha: float = ALPHA_SKETCH) -> dict:
+    """Pre-pasada de un shard: sketch de price (incluye suma y conteo)."""
+    con, hay_datos = _conectar_shard(directorio, shard)
+    try:
+        sketch = SketchCuantiles.desde_duckdb(con, "listings", "price", alpha) if hay_datos \
+            else SketchCuantiles(alpha)
+    finally:
+        con.close()
+    resultado = sketch.a_dict()
+    with open(os.path.join(directorio, f"estadisticos_shard_{shard}.json"), "w") as f:
+        json.dump(resultado, f)
+    return resultado
+
+
+def _valores_bucket(directorio: str, shard: int, gamma: float, bucket: int):
+    con, hay_datos = _conectar_shard(directorio, shard)
+    try:
+        if not hay_datos:
+            return []
+        return [v for (v,) in con.execute(f"""
+            SELECT price FROM listings
+            WHERE price IS NOT NULL AND {sql_bucket('price', gamma)} = {bucket}
+        """).fetchall()]
+    finally:
+        con.close()
+
+
+def estadisticos_globales(directorio: str, sketches=None, q: float = CUANTIL_PREMIUM,
+                          max_workers: int = None) -> dict:
+    """
+    Combina los sketches de todos los shards y calcula p75 exacto y media de price.
+
+    El p75 exacto requiere una segunda lectura, pero solo de las filas del
+    bucket que lo contiene (una fracción ~alpha de los precios alrededor del p75).
+    """
+    with open(os.path.join(directorio, ARCHIVO_MANIFIESTO)) as f:
+        n_shards = json.load(f)["n_shards"]
+    if sketches is None:
+        sketches = []
+        for k in range(n_shards):
+            with open(os.path.join(directorio, f"estadisticos_shard_{k}.json")) as f:
+                sketches.append(json.load(f))
+    total = SketchCuantiles.desde_dict(sketches[0])
+    for datos in sketches[1:]:
+        total = total + SketchCuantiles.desde_dict(datos)
+
+    p75 = None
+    if total.n:
+        bucket, posicion = total.ubicar(q)
+        with ProcessPoolExecutor(max_workers=max_workers) as ex:
+            partes = ex.map(_valores_bucket, [directorio] * n_shards, range(n_shards),
+                            [total.gamma] * n_shards, [bucket] * n_shards)
+            valores = sorted(v for parte in partes for v in parte)
+        p75 = valores[posicion]
+    resultado = {"p75_precio": p75, "avg_precio": total.media(), "n_precios": total.n,
+                 "p75_aproximado": total.cuantil(q) if total.n else None, "alpha": total.alpha}
+    with open(os.path.join(directorio, ARCHIVO_ESTADISTICOS), "w") as f:
+        json.dump(resultado, f, indent=2)
+    return resultado
+
+
+# ---------------------------------------------------------------------------
+# Agregación por shard y combinación
+# ---------------------------------------------------------------------------
+
+def agregar_shard(directorio: str, shard: int, metricas=METRICAS) -> dict:
+    """
+    Features por seller y métricas del inspector para un shard, con los
+    estadísticos globales de <directorio>/estadisticos_globales.json.
+    Escribe un Parquet por resultado en <directorio>/resultados/shard=<k>/, que se
+    vacía antes (queda vacía si el shard no tiene filas).
+    """
+    from . import inspector
+
+    with open(os.path.join(directorio, ARCHIVO_ESTADISTICOS)) as f:
+        globales = json.load(f)
+    salida = os.path.join(directorio, "resultados", f"shard={shard}")
+    shutil.rmtree(salida, ignore_errors=True)
+    os.makedirs(salida)
+    con, hay_datos = _conectar_shard(directorio, shard)
+    filas = {}
+    try:
+        if not hay_datos:
+            return filas
+        parametros = {"proporcion_premium": {"p75": globales["p75_precio"]},
+                      "proporcion_precios_bajos": {"avg_precio": globales["avg_precio"]}}
+        resultados = {"features": features_seller(con, "listings")}
+        for nombre in metricas:
+            resultados[nombre] = getattr(inspector, nombre)(con, "listings", **parametros.get(nombre, {}))
+        for nombre, df in resultados.items():
+            df.to_parquet(os.path.join(salida, f"{nombre}.parquet"), index=False)
+            filas[nombre] = len(df)
+    finally:
+        con.close()
+    return filas
+
+
+def combinar_resultados(directorio: str, nombres=("features",) + METRICAS) -> dict:
+    """Concatena los resultados de todos los shards de forma determinista."""
+    with open(os.path.join(directorio, ARCHIVO_MANIFIESTO)) as f:
+        n_shards = json.load(f)["n_shards"]
+    combinados = {}
+    for nombre in nombres:
+        rutas = [os.path.join(directorio, "resultados", f"shard={k}", f"{nombre}.parquet")
+                 for k in range(n_shards)]
+        partes = [p for p in (pd.read_parquet(r) for r in rutas if os.path.exists(r)) if len(p)]
+        if not partes:
+            continue
+        df = pd.concat(partes, ignore_index=True)
+        combinados[nombre] = df.sort_values("seller_nickname", kind="stable").reset_index(drop=True)
+    return combinados
+
+
+def agregacion_por_shards(con, tabla: str, directorio: str, n_shards: int = 8, filtro: str = None,
+                          max_workers: int = None, alpha: float = ALPHA_SKETCH,
+                          metricas=METRICAS, verbose: bool = True) -> dict:
+    """
+    Ejecución local completa: particionado, pre-pasada de sketches, agregación
+    por shard en procesos separados y combinación.
+
+    Returns:
+        Dict {"features": DataFrame, <métrica>: DataFrame, ..., "estadisticos": dict}
+    """
+    inicio = time.perf_counter()
+    os.makedirs(directorio, exist_ok=True)
+    particionar_por_seller(con, tabla, directorio, n_shards, filtro, verbose)
+    shards = range(n_shards)
+    with ProcessPoolExecutor(max_workers=max_workers) as ex:
+        sketches = list(ex.map(estadisticos_shard, [directorio] * n_shards, shards, [alpha] * n_shards))
+    globales = estadisticos_globales(directorio, sketches, max_workers=max_workers)
+    with ProcessPoolExecutor(max_workers=max_workers) as ex:
+        list(ex.map(agregar_shard, [directorio] * n_shards, shards, [metricas] * n_shards))
+    resultados = combinar_resultados(directorio, ("features",) + tuple(metricas))
+    resultados["estadisticos"] = globales
+    if verbose:
+        print(f"🧮 {len(resultados.get('features', [])):,} sellers en {n_shards} shards | "
+              f"p75={globales['p75_precio']} media={globales['avg_precio']} "
+              f"({time.perf_counter() - inicio:.1f}s)")
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Paso de un shard en otra máquina (directorio compartido)")
+    parser.add_argument("paso", choices=["estadisticos", "agregar"])
+    parser.add_argument("--directorio", required=True)
+    parser.add_argument("--shard", type=int, required=True)
+    parser.add_argument("--alpha", type=float, default=ALPHA_SKETCH)
+    args = parser.parse_args()
+    if args.paso == "estadisticos":
+        estadisticos_shard(args.directorio, args.shard, args.alpha)
+    else:
+        print(agregar_shard(args.directorio, args.shard))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Estabilidad de los clusters por bootstrap.
+
+kmeans.pkl se eligió con un solo ajuste y silhouette / Davies-Bouldin sobre
+una muestra. Aquí se mide si los segmentos se sostienen al remuestrear:
+
+1. La matriz escalada (n, 9) y las etiquetas de referencia se copian UNA vez a
+   memoria compartida (multiprocessing.shared_memory); cada worker la mapea
+   sin copiarla.
+2. Cada bootstrap toma n filas con reemplazo (o una fracción, m-de-n),
+   reajusta KMeans con k-means++ y alinea sus centroides a los de referencia
+   con el algoritmo húngaro (linear_sum_assignment sobre distancias²).
+3. Con los centroides alineados se reasignan TODOS los sellers y el worker
+   devuelve solo la matriz de confusión k×k contra la referencia.
+
+De las matrices de confusión salen, por cluster, el Jaccard
+|ref ∩ boot| / |ref ∪ boot| y el churn (fracción de sus sellers que cambian
+de segmento). Cada worker usa un hilo de BLAS/OpenMP para no sobresuscribir
+los núcleos.
+"""
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .cluster_udf import CLUSTER_NAME
+from .features import FEATURES, features_seller
+
+# Estado de cada worker: vistas NumPy sobre la memoria compartida
+_COMPARTIDO = {}
+
+
+def _asignar(X: np.ndarray, centroides: np.ndarray, tamano_bloque: int = 200_000) -> np.ndarray:
+    """Centroide más cercano por fila, por bloques para acotar la memoria temporal."""
+    norma_c = (centroides ** 2).sum(axis=1)
+    etiquetas = np.empty(len(X), dtype=np.int32)
+    for i in range(0, len(X), tamano_bloque):
+        bloque = X[i:i + tamano_bloque]
+        etiquetas[i:i + tamano_bloque] = (norma_c - 2 * bloque @ centroides.T).argmin(axis=1)
+    return etiquetas
+
+
+def alinear_centroides(referencia: np.ndarray, centroides: np.ndarray) -> np.ndarray:
+    """
+    Permutación húngara: perm[j] = cluster de referencia que corresponde al centroide j.
+    """
+    from scipy.optimize import linear_sum_assignment
+
+    costo = ((centroides[:, None, :] - referencia[None, :, :]) ** 2).sum(axis=2)
+    filas, columnas = linear_sum_assignment(costo)
+    perm = np.empty(len(centroides), dtype=np.int64)
+    perm[filas] = columnas
+    return perm
+
+
+def _crear_compartido(arr: np.ndarray):
+    from multiprocessing import shared_memory
+
+    shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+    np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[:] = arr
+    return shm, (shm.name, arr.shape, arr.dtype.str)
+
+
+def _iniciar_worker(desc_X, desc_ref, referencia):
+    from multiprocessing import shared_memory
+
+    from threadpoolctl import threadpool_limits
+
+    for clave, (nombre, forma, dtype) in (("X", desc_X), ("ref", desc_ref)):
+        shm = shared_memory.SharedMemory(name=nombre)
+        _COMPARTIDO[clave + "_shm"] = shm  # mantener viva la referencia mientras dure el worker
+        _COMPARTIDO[clave] = np.ndarray(forma, dtype=np.dtype(dtype), buffer=shm.buf)
+    _COMPARTIDO["referencia"] = referencia
+    _COMPARTIDO["limites"] = threadpool_limits(1)
+
+
+def _un_bootstrap(tarea):
+    from sklearn.cluster import KMeans
+
+    b, semilla, fraccion, max_iter = tarea
+    X, ref, referencia = _COMPARTIDO["X"], _COMPARTIDO["ref"], _COMPARTIDO["referencia"]
+    k = len(referencia)
+    rng = np.random.default_rng(semilla)
+    idx = rng.integers(0, len(X), int(len(X) * fraccion))
+    modelo = KMeans(n_clusters=k, n_init=1, max_iter=max_iter, random_state=semilla).fit(X[idx])
+    perm = alinear_centroides(referencia, modelo.cluster_centers_)
+    centroides = np.empty_like(modelo.cluster_centers_)
+    centroides[perm] = modelo.cluster_centers_
+    etiquetas = _asignar(X, centroides)
+    confusion = np.bincount(ref.astype(np.int64) * k + etiquetas, minlength=k * k).reshape(k, k)
+    desplazamiento = np.linalg.norm(centroides - referencia, axis=1)
+    return b, confusion, desplazamiento
+
+
+def metricas_confusion(confusion: np.ndarray):
+    """(jaccard por cluster, churn por cluster, churn global) de una matriz ref × boot."""
+    diag = np.diag(confusion).astype(np.float64)
+    ref = confusion.sum(axis=1)
+    boot = confusion.sum(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        jaccard = diag / (ref + boot - diag)
+        churn = 1 - diag / ref
+    return jaccard, churn, 1 - diag.sum() / confusion.sum()
+
+
+def estabilidad_bootstrap(X: np.ndarray, centroides: np.ndarray, B: int = 100, fraccion: float = 1.0,
+                          max_iter: int = 100, max_workers: int = None, semilla: int = 42,
+                          verbose: bool = True) -> dict:
+    """
+    Args:
+        X: Matriz escalada (n, d) en el espacio de los centroides
+        centroides: Centroides de referencia (k, d), p. ej. kmeans.cluster_centers_
+        B: Número de remuestreos
+        fraccion: Tamaño de cada remuestreo como fracción de n (1.0 = bootstrap clásico)
+
+    Returns:
+        Dict con por_cluster (DataFrame), por_bootstrap (DataFrame), churn_medio,
+        confusiones (B, k, k) y segundos
+    """
+    inicio = time.perf_counter()
+    # float32: mitad de memoria compartida y KMeans más rápido; las métricas no cambian
+    X = np.ascontiguousarray(X, dtype=np.float32)
+    referencia = np.asarray(centroides, dtype=np.float32)
+    k = len(referencia)
+    ref = _asignar(X, referencia)
+    semillas = np.random.SeedSequence(semilla).generate_state(B)
+    tareas = [(b, int(s), fraccion, max_iter) for b, s in enumerate(semillas)]
+
+    shm_X, desc_X = _crear_compartido(X)
+    shm_ref, desc_ref = _crear_compartido(ref)
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_iniciar_worker,
+                                 initargs=(desc_X, desc_ref, referencia)) as ex:
+            resultados = sorted(ex.map(_un_bootstrap, tareas), key=lambda r: r[0])
+    finally:
+        for shm in (shm_X, shm_ref):
+            shm.close()
+            shm.unlink()
+
+    confusiones = np.stack([r[1] for r in resultados])
+    desplazamientos = np.stack([r[2] for r in resultados])
+    jaccard, churn, churn_global = zip(*(metricas_confusion(c) for c in confusiones))
+    jaccard, churn = np.vstack(jaccard), np.vstack(churn)
+
+    por_cluster = pd.DataFrame({
+        "cluster": np.arange(k),
+        "cluster_name": [CLUSTER_NAME.get(c, "Desconocido") for c in range(k)],
+        "n_sellers": np.bincount(ref, minlength=k),
+        "jaccard_medio": np.nanmean(jaccard, axis=0),
+        "jaccard_p05": np.nanpercentile(jaccard, 5, axis=0),
+        "jaccard_min": np.nanmin(jaccard, axis=0),
+        "churn_medio": np.nanmean(churn, axis=0),
+        "desplazamiento_centroide": desplazamientos.mean(axis=0),
+    })
+    # Regla usual (Hennig): Jaccard medio >= 0.75 estable, < 0.5 el cluster se disuelve
+    por_cluster["estable"] = por_cluster["jaccard_medio"] >= 0.75
+    por_bootstrap = pd.DataFrame({"bootstrap": np.arange(B), "churn": churn_global,
+                                  "jaccard_min": np.nanmin(jaccard, axis=1)})
+    segundos = time.perf_counter() - inicio
+    if verbose:
+        print(f"🎲 Estabilidad: {B} bootstraps sobre {len(X):,} sellers en {segundos:.1f}s | "
+              f"churn medio {np.mean(churn_global):.2%} | "
+              f"Jaccard min {por_cluster['jaccard_medio'].min():.2f}")
+    return {"por_cluster": por_cluster, "por_bootstrap": por_bootstrap,
+            "churn_medio": float(np.mean(churn_global)), "confusiones": confusiones, "segundos": segundos}
+
+
+def evaluar_estabilidad(con, tabla: str, pre_pipe, kmeans, B: int = 100, filtro: str = None, **kwargs) -> dict:
+    """Features por seller desde DuckDB -> pre_pipe -> estabilidad_bootstrap contra kmeans."""
+    X = pre_pipe.transform(features_seller(con, tabla, filtro)[FEATURES])
+    return estabilidad_bootstrap(X, kmeans.cluster_centers_, B=B, **kwargs)
@@ -0,0 +1,158 @@
+"""
+Validación de calidad fila a fila en una sola pasada de DuckDB.
+
+El inspector resume columnas (nulos, únicos, tipos); aquí se revisan
+condiciones POR FILA (precio sobre el precio regular, stock negativo,
+reputación fuera de REP_MAP, fechas no parseables...). Cada regla es un
+predicado SQL de violación, y todas se evalúan en un único escaneo:
+
+    CREATE TEMP TABLE _violaciones_xxx AS
+    SELECT *, <pred_1> AS "_v_regla_1", ... FROM tabla WHERE <pred_1> OR ... OR <pred_n>
+
+Solo las filas con alguna violación se materializan, con una bandera por
+regla. Los conteos, las filas de muestra y la cuarentena en Parquet salen de
+esa tabla temporal (que DuckDB vuelca a disco si no cabe en memoria), así
+que la tabla original se lee una sola vez sin importar cuántas reglas haya.
+"""
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from .catalog import catalogo
+from .features import REP_MAP
+
+
+class ReglaCalidad:
+    """
+    Args:
+        nombre: Identificador (se usa como nombre de columna, sin espacios)
+        violacion: Predicado SQL que es verdadero para las filas que INCUMPLEN la regla
+        columnas: Columnas que usa el predicado; la regla se omite si falta alguna
+        descripcion: Texto para el reporte
+    """
+
+    def __init__(self, nombre: str, violacion: str, columnas, descripcion: str = ""):
+        self.nombre = nombre
+        self.violacion = violacion
+        self.columnas = tuple(columnas)
+        self.descripcion = descripcion
+
+    @property
+    def bandera(self) -> str:
+        return f"_v_{self.nombre}"
+
+    def __repr__(self):
+        return f"ReglaCalidad({self.nombre!r}, {self.violacion!r})"
+
+
+def _lista_sql(valores) -> str:
+    return ", ".join("'" + str(v).replace("'", "''") + "'" for v in valores)
+
+
+# La fecha se valida sobre su texto: funciona igual si la vista la tipó como DATE o como VARCHAR
+_FECHA = 'TRY_CAST(CAST("tim_day" AS VARCHAR) AS DATE)'
+
+REGLAS_CALIDAD = [
+    ReglaCalidad("seller_nulo", '"seller_nickname" IS NULL', ["seller_nickname"],
+                 "Publicación sin seller_nickname"),
+    ReglaCalidad("precio_no_positivo", '"price" <= 0', ["price"], "price menor o igual a cero"),
+    ReglaCalidad("precio_sobre_regular", '"price" > "regular_price"', ["price", "regular_price"],
+                 "price mayor que regular_price (descuento negativo)"),
+    ReglaCalidad("stock_negativo", '"stock" < 0', ["stock"], "stock negativo"),
+    ReglaCalidad("reputacion_desconocida",
+                 f'"seller_reputation" NOT IN ({_lista_sql(REP_MAP)})', ["seller_reputation"],
+                 "seller_reputation fuera de REP_MAP (cuenta como rep_score 0)"),
+    ReglaCalidad("condicion_desconocida", "\"condition\" NOT IN ('new', 'used', 'not_specified')",
+                 ["condition"], "condition distinta de new / used / not_specified"),
+    ReglaCalidad("titulo_vacio", "trim(\"titulo\") = ''", ["titulo"], "titulo vacío"),
+    ReglaCalidad("fecha_invalida", f'"tim_day" IS NOT NULL AND {_FECHA} IS NULL', ["tim_day"],
+                 "tim_day no se puede interpretar como fecha"),
+    ReglaCalidad("fecha_futura", f"{_FECHA} > CURRENT_DATE", ["tim_day"], "tim_day posterior a hoy"),
+]
+
+
+def validar_calidad(con, tabla: str, reglas=None, filtro: str = None, muestras: int = 5,
+                    ruta_cuarentena: str = None, conservar: bool = False, verbose: bool = True) -> dict:
+    """
+    Evalúa todas las reglas en un solo escaneo de `tabla`.
+
+    Args:
+        con: Conexión a DuckDB
+        tabla: Vista o tabla de publicaciones
+        reglas: Lista de ReglaCalidad (por defecto REGLAS_CALIDAD)
+        filtro: Predicado SQL opcional sobre la tabla
+        muestras: Filas de ejemplo por regla
+        ruta_cuarentena: Si se indica, escribe las filas inválidas en este Parquet con la
+            columna reglas_violadas
+        conservar: Si es True no se borra la tabla temporal (su nombre va en el resultado)
+
+    Returns:
+        Dict con reporte (DataFrame por regla: violaciones y tasa), muestras (DataFrame con
+        columna regla), filas, filas_invalidas, omitidas (reglas sin sus columnas),
+        tabla_violaciones, cuarentena y segundos
+    """
+    inicio = time.perf_counter()
+    where = f"WHERE ({filtro})" if filtro else ""
+    reglas = REGLAS_CALIDAD if reglas is None else reglas
+    disponibles = set(catalogo(con).columnas(tabla))
+    activas = [r for r in reglas if set(r.columnas) <= disponibles]
+    omitidas = [r.nombre for r in reglas if r not in activas]
+    if not activas:
+        raise ValueError(f"Ninguna regla aplica a las columnas de {tabla}")
+
+    # COALESCE: un predicado NULL (p. ej. regular_price nulo) no es una violación
+    banderas = [f'COALESCE({r.violacion}, false) AS "{r.bandera}"' for r in activas]
+    alguna = " OR ".join(f"COALESCE({r.violacion}, false)" for r in activas)
+    temporal = f"_violaciones_{uuid.uuid4().hex[:8]}"
+    con.execute(f"""
+        CREATE TEMP TABLE {temporal} AS
+        SELECT *, {", ".join(banderas)}
+        FROM "{tabla}"
+        WHERE ({alguna}) {f"AND ({filtro})" if filtro else ""}
+    """)
+    try:
+        filas = catalogo(con).filas(tabla) if not filtro else \
+            con.execute(f'SELECT COUNT(*) FROM "{tabla}" {where}').fetchone()[0]
+        por_regla = ", ".join(f'COUNT(*) FILTER (WHERE "{r.bandera}")' for r in activas)
+        conteos = con.execute(f"SELECT COUNT(*), {por_regla} FROM {temporal}").fetchone()
+        violaciones = np.array(conteos[1:], dtype=np.int64)
+        reporte = pd.DataFrame({
+            "regla": [r.nombre for r in activas],
+            "descripcion": [r.descripcion for r in activas],
+            "columnas": [", ".join(r.columnas) for r in activas],
+            "violaciones": violaciones,
+            "tasa": violaciones / filas if filas else np.zeros(len(activas)),
+        })
+
+        excluir = ", ".join(f'"{r.bandera}"' for r in activas)
+        partes = [f"""(SELECT {i} AS orden, '{r.nombre}' AS regla, * EXCLUDE ({excluir})
+                       FROM {temporal} WHERE "{r.bandera}" LIMIT {int(muestras)})"""
+                  for i, r in enumerate(activas) if muestras]
+        ejemplos = (con.execute(f"SELECT * EXCLUDE (orden) FROM ({' UNION ALL '.join(partes)}) ORDER BY orden")
+                    .fetchdf() if partes else pd.DataFrame())
+
+        if ruta_cuarentena:
+            nombres = "[" + ", ".join(f"""CASE WHEN "{r.bandera}" THEN '{r.nombre}' END""" for r in activas) + "]"
+            con.execute(f"""
+                COPY (SELECT * EXCLUDE ({excluir}),
+                             list_filter({nombres}, x -> x IS NOT NULL) AS reglas_violadas
+                      FROM {temporal})
+                TO '{ruta_cuarentena}' (FORMAT PARQUET, COMPRESSION ZSTD)
+            """)
+    finally:
+        if not conservar:
+            con.execute(f"DROP TABLE IF EXISTS {temporal}")
+
+    resultado = {
+        "reporte": reporte, "muestras": ejemplos, "filas": int(filas), "filas_invalidas": int(conteos[0]),
+        "omitidas": omitidas, "tabla_violaciones": temporal if conservar else None,
+        "cuarentena": ruta_cuarentena, "segundos": time.perf_counter() - inicio,
+    }
+    if verbose:
+        print(f"🧪 Validación de {tabla}: {resultado['filas_invalidas']:,} de {filas:,} filas con "
+              f"violaciones ({len(activas)} reglas, {resultado['segundos']:.2f}s)")
+        for fila in reporte[reporte["violaciones"] > 0].itertuples():
+            print(f"   • {fila.regla}: {fila.violaciones:,} ({fila.tasa:.2%})")
+    return resultado
@@ -2,9 +2,46 @@
 
 from .agents.agent_template import TemplateAgent
 from .prompts.templates import *
-from .agents.rasoner_meli import cot_chain
+from .agents.rasoner_meli import construir_cadenas
+from .fake_model import FakeChatModel
+from .archetype_cache import CacheArquetipos
+from .batch_strategy import EstrategiaPorLotes
+from .rules import Regla, MotorReglas, RecomendadorReglas
+from .nightly import FlujoRecomendaciones, generador_llm
+from .checkpoint import Bitacora, Progreso, recomendar_con_checkpoint
+from .scheduler import ClasePrioridad, ColaPlanificada, LimitadorTasa, PlanificadorLLM, simular
+from .client import obtener_llm, obtener_metricas, configurar_pool, reiniciar_clientes
 
 __all__ = [
     "TemplateAgent",
-    "cot_chain"
+    "cot_chain",
+    "construir_cadenas",
+    "FakeChatModel",
+    "CacheArquetipos",
+    "EstrategiaPorLotes",
+    "Regla",
+    "MotorReglas",
+    "RecomendadorReglas",
+    "FlujoRecomendaciones",
+    "generador_llm",
+    "Bitacora",
+    "Progreso",
+    "recomendar_con_checkpoint",
+    "ClasePrioridad",
+    "ColaPlanificada",
+    "LimitadorTasa",
+    "PlanificadorLLM",
+    "simular",
+    "obtener_llm",
+    "obtener_metricas",
+    "configurar_pool",
+    "reiniciar_clientes"
 ]
+
+
+def __getattr__(nombre):
+    # cot_chain se resuelve en cada acceso (ver agents/rasoner_meli.py)
+    if nombre == "cot_chain":
+        from .agents import rasoner_meli
+        return rasoner_meli.cot_chain
+    raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
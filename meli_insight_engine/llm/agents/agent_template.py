@@ -3,21 +3,19 @@
 import os
 import json
 import datetime
-from langchain.chat_models import ChatOpenAI
 from langchain.prompts import PromptTemplate
 from langchain.chains import LLMChain
 
+from ..client import obtener_llm
+
 class TemplateAgent:
-    def __init__(self, prompt_template: str, template_name: str):
+    def __init__(self, prompt_template: str, template_name: str, llm=None):
         self.template_name = template_name
         self.prompt = PromptTemplate.from_template(prompt_template)
 
-        self.llm = ChatOpenAI(
-            api_key=os.getenv("DEEPSEEK_API_KEY", ""),
-            base_url="https://api.deepseek.com",
-            model="deepseek-chat",
-            temperature=0.3
-        )
+        # llm permite inyectar otro modelo (p. ej. FakeChatModel en pruebas y benchmarks);
+        # por defecto se usa el ChatOpenAI compartido con pool de conexiones
+        self.llm = llm or obtener_llm()
 
         self.chain = LLMChain(llm=self.llm, prompt=self.prompt)
 
@@ -1,26 +1,47 @@
-import os
-from langchain.chat_models import ChatOpenAI
+import threading
+
 from langchain.chains import LLMChain, SequentialChain
 from ..prompts.templates import season_prompt,strategy_prompt
+from ..client import obtener_llm
 
-# --- Inicializa el modelo Deepseek ---
-llm = ChatOpenAI(
-    api_key=os.getenv("DEEPSEEK_API_KEY", ""),
-    base_url="https://api.deepseek.com",
-    model="deepseek-chat",
-    temperature=0.3
-)
+INPUT_VARIABLES = [
+    "fecha_actual", "cluster_name", "publicaciones",
+    "categorias_distintas", "stock_promedio", "precio_medio_cop",
+    "descuento_pct", "rep_score", "tasa_cancelacion"
+]
 
 # --- Define las cadenas LangChain ---
-season_chain = LLMChain(llm=llm, prompt=season_prompt, output_key="temporada")
-strategy_chain = LLMChain(llm=llm, prompt=strategy_prompt, output_key="estrategia")
-
-cot_chain = SequentialChain(
-    chains=[season_chain, strategy_chain],
-    input_variables=[
-        "fecha_actual", "cluster_name", "publicaciones",
-        "categorias_distintas", "stock_promedio", "precio_medio_cop",
-        "descuento_pct", "rep_score", "tasa_cancelacion"
-    ],
-    output_variables=["temporada", "estrategia"]
-)
+def construir_cadenas(llm):
+    """
+    Construye season_chain, strategy_chain y cot_chain sobre el modelo dado.
+    Permite inyectar otro modelo (p. ej. FakeChatModel) sin tocar las cadenas por defecto.
+    """
+    season_chain = LLMChain(llm=llm, prompt=season_prompt, output_key="temporada")
+    strategy_chain = LLMChain(llm=llm, prompt=strategy_prompt, output_key="estrategia")
+
+    cot_chain = SequentialChain(
+        chains=[season_chain, strategy_chain],
+        input_variables=INPUT_VARIABLES,
+        output_variables=["temporada", "estrategia"]
+    )
+    return season_chain, strategy_chain, cot_chain
+
+
+# --- Modelo Deepseek y cadenas por defecto (cliente HTTP compartido con TemplateAgent) ---
+# llm, season_chain, strategy_chain y cot_chain se resuelven al accederlos: si
+# configurar_pool() / reiniciar_clientes() descartaron el modelo, se reconstruyen
+# sobre el nuevo en vez de quedar atados al cliente anterior.
+_POR_DEFECTO = ("llm", "season_chain", "strategy_chain", "cot_chain")
+_cadenas = {}
+_lock = threading.Lock()
+
+
+def __getattr__(nombre):
+    if nombre not in _POR_DEFECTO:
+        raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
+    llm = obtener_llm()
+    with _lock:
+        if _cadenas.get("llm") is not llm:
+            _cadenas.update(zip(_POR_DEFECTO, (llm, *construir_cadenas(llm))))
+        return _cadenas[nombre]
+
@@ -0,0 +1,140 @@
+# meli_insight_engine/llm/archetype_cache.py
+
+"""
+Caché de arquetipos de recomendación.
+
+Los sellers de un mismo segmento con métricas parecidas reciben prácticamente
+la misma respuesta de strategy_prompt. Aquí el payload de cot_chain se
+cuantiza en buckets (cluster × métricas discretizadas × temporada), se genera
+UNA estrategia por bucket y se replica a todos los sellers del bucket.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# Cortes por métrica (límites internos; n cortes -> n + 1 bins)
+BINS_POR_DEFECTO = {
+    "publicaciones": [10, 50, 200, 1000],
+    "descuento_pct": [0.05, 0.15, 0.30, 0.50],
+    "rep_score": [2.0, 3.0, 4.0, 4.5],
+    "tasa_cancelacion": [0.01, 0.03, 0.05, 0.10],
+}
+
+# Campos enteros del payload (el representante del bucket se redondea)
+CAMPOS_ENTEROS = ("publicaciones", "categorias_distintas", "stock_promedio", "precio_medio_cop")
+# Segmento de los sellers sin cluster_name (p. ej. los escalados por segmento_desconocido)
+SEGMENTO_DESCONOCIDO = "Desconocido"
+
+
+def asignar_buckets(payloads: pd.DataFrame, bins: dict = None) -> pd.DataFrame:
+    """
+    Devuelve un DataFrame con cluster_name, fecha_actual y el índice de bin de
+    cada métrica, alineado con `payloads`. Vectorizado con np.digitize. Un
+    cluster_name nulo se agrupa como SEGMENTO_DESCONOCIDO.
+    """
+    bins = bins or BINS_POR_DEFECTO
+    claves = pd.DataFrame({
+        "cluster_name": payloads["cluster_name"].fillna(SEGMENTO_DESCONOCIDO).to_numpy(),
+        "fecha_actual": payloads["fecha_actual"].astype(str).to_numpy(),
+    }, index=payloads.index)
+    for metrica, cortes in bins.items():
+        valores = pd.to_numeric(payloads[metrica], errors="coerce").to_numpy(dtype=np.float64)
+        idx = np.digitize(valores, np.asarray(cortes, dtype=np.float64))
+        idx[np.isnan(valores)] = -1
+        claves[f"bin_{metrica}"] = idx
+    return claves
+
+
+def payload_representativo(grupo: pd.DataFrame) -> dict:
+    """Payload del bucket: mediana de cada métrica numérica de sus sellers."""
+    payload = {}
+    for col in grupo.columns:
+        if pd.api.types.is_numeric_dtype(grupo[col]):
+            valor = float(grupo[col].median())
+            payload[col] = int(round(valor)) if col in CAMPOS_ENTEROS else round(valor, 4)
+        else:
+            payload[col] = grupo[col].iloc[0]
+    return payload
+
+
+class CacheArquetipos:
+    """
+    Genera estrategias por bucket de sellers en lugar de por seller.
+
+    Args:
+        season_chain: Cadena que devuelve "temporada" a partir de fecha_actual
+        strategy_chain: Cadena que devuelve "estrategia" a partir del payload + temporada
+        bins: Cortes por métrica (por defecto BINS_POR_DEFECTO)
+        max_workers: Llamadas LLM concurrentes (una por bucket)
+    """
+
+    def __init__(self, season_chain, strategy_chain, bins: dict = None, max_workers: int = 8):
+        self.season_chain = season_chain
+        self.strategy_chain = strategy_chain
+        self.bins = bins or BINS_POR_DEFECTO
+        self.max_workers = max_workers
+        self.temporadas = {}
+        self.estrategias = {}
+        self.sellers_atendidos = 0
+        self.llamadas_llm = 0
+
+    def _temporada(self, fecha: str) -> str:
+        if fecha not in self.temporadas:
+            self.temporadas[fecha] = self.season_chain.invoke({"fecha_actual": fecha})["temporada"]
+            self.llamadas_llm += 1
+        return self.temporadas[fecha]
+
+    def _generar(self, payload: dict) -> str:
+        return self.strategy_chain.invoke(payload)["estrategia"]
+
+    def recomendar(self, payloads) -> pd.DataFrame:
+        """
+        Args:
+            payloads: DataFrame o lista de dicts con las INPUT_VARIABLES de cot_chain
+
+        Returns:
+            DataFrame alineado con la entrada con temporada, estrategia y bucket
+            (número de bucket dentro de esta llamada)
+        """
+        df = pd.DataFrame(payloads).reset_index(drop=True)
+        claves = asignar_buckets(df, self.bins)
+        columnas_clave = list(claves.columns)
+        for fecha in claves["fecha_actual"].unique():
+            self._temporada(fecha)
+
+        # ngroup(sort=False) numera los buckets en orden de aparición, igual que drop_duplicates
+        codigo = claves.groupby(columnas_clave, sort=False, dropna=False).ngroup().to_numpy()
+        claves_bucket = list(claves.drop_duplicates().itertuples(index=False, name=None))
+        pendientes = {}
+        for i, indices in df.groupby(codigo).indices.items():
+            clave = claves_bucket[i]
+            if clave in self.estrategias:
+                continue
+            payload = payload_representativo(df.iloc[indices])
+            payload["cluster_name"] = clave[0]
+            payload["temporada"] = self.temporadas[clave[1]]
+            pendientes[clave] = payload
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as ex:
+            for clave, estrategia in zip(pendientes, ex.map(self._generar, pendientes.values())):
+                self.estrategias[clave] = estrategia
+        self.llamadas_llm += len(pendientes)
+        self.sellers_atendidos += len(df)
+
+        estrategias = np.array([self.estrategias[c] for c in claves_bucket], dtype=object)
+        return pd.DataFrame({
+            "temporada": claves["fecha_actual"].map(self.temporadas),
+            "estrategia": estrategias[codigo],
+            "bucket": codigo,
+        })
+
+    def resumen(self) -> dict:
+        """Sellers atendidos, buckets, llamadas LLM y ratio de compresión (sellers / llamada)."""
+        return {
+            "sellers": self.sellers_atendidos,
+            "buckets": len(self.estrategias),
+            "llamadas_llm": self.llamadas_llm,
+            "ratio_compresion": (self.sellers_atendidos / self.llamadas_llm
+                                 if self.llamadas_llm else 0.0),
+        }
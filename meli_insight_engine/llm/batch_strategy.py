@@ -0,0 +1,171 @@
+# meli_insight_engine/llm/batch_strategy.py
+
+"""
+Estrategias individuales por lotes de sellers.
+
+Empaqueta N payloads de strategy_prompt en una sola solicitud
+(batch_strategy_prompt), pide un arreglo JSON indexado por seller_id y lo
+valida. Los sellers que faltan o vienen mal formados se reintentan partiendo
+el lote en dos; un seller que falla solo se resuelve con strategy_chain.
+El tamaño de lote se ajusta a un presupuesto de tokens. Los sellers se
+agrupan por fecha_actual: cada lote comparte una sola fecha y su temporada.
+"""
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain.chains import LLMChain
+
+from .fake_model import estimar_tokens
+from .prompts.templates import batch_strategy_prompt, season_prompt, strategy_prompt
+
+# Métricas que viajan al modelo por seller (mismo contenido que strategy_prompt)
+CAMPOS_SELLER = (
+    "cluster_name", "publicaciones", "categorias_distintas", "stock_promedio",
+    "precio_medio_cop", "descuento_pct", "rep_score", "tasa_cancelacion",
+)
+# Reserva de salida por seller (≤150 palabras ≈ 200 tokens + JSON)
+TOKENS_SALIDA_POR_SELLER = 230
+
+
+def linea_seller(payload: dict, seller_id: str) -> str:
+    """Objeto JSON compacto de un seller para el bloque {vendedores}."""
+    datos = {"seller_id": seller_id}
+    datos.update({c: payload[c] for c in CAMPOS_SELLER if c in payload})
+    return json.dumps(datos, ensure_ascii=False, separators=(",", ":"))
+
+
+def parsear_respuesta(texto: str, ids_esperados) -> dict:
+    """
+    Extrae {seller_id: estrategia} del arreglo JSON de la respuesta.
+
+    Tolera cercos ``` y texto alrededor del arreglo. Descarta elementos con
+    seller_id desconocido o estrategia vacía; si el JSON no es válido devuelve {}.
+    """
+    inicio, fin = texto.find("["), texto.rfind("]")
+    if inicio < 0 or fin <= inicio:
+        return {}
+    try:
+        elementos = json.loads(texto[inicio:fin + 1])
+    except json.JSONDecodeError:
+        return {}
+    esperados = set(ids_esperados)
+    resultado = {}
+    for el in elementos if isinstance(elementos, list) else []:
+        if not isinstance(el, dict):
+            continue
+        sid, estrategia = str(el.get("seller_id", "")), el.get("estrategia")
+        if sid in esperados and isinstance(estrategia, str) and estrategia.strip():
+            resultado[sid] = estrategia.strip()
+    return resultado
+
+
+class EstrategiaPorLotes:
+    """
+    Args:
+        llm: Modelo de chat (ChatOpenAI compartido o FakeChatModel)
+        presupuesto_tokens: Máximo de tokens (prompt + salida reservada) por solicitud
+        max_por_lote: Tope de sellers por solicitud
+        campo_id: Clave del payload con el identificador del seller
+        max_workers: Solicitudes concurrentes
+    """
+
+    def __init__(self, llm, presupuesto_tokens: int = 8000, max_por_lote: int = 25,
+                 campo_id: str = "seller_id", max_workers: int = 4):
+        self.llm = llm
+        self.presupuesto_tokens = presupuesto_tokens
+        self.max_por_lote = max_por_lote
+        self.campo_id = campo_id
+        self.max_workers = max_workers
+        self.season_chain = LLMChain(llm=llm, prompt=season_prompt, output_key="temporada")
+        self.strategy_chain = LLMChain(llm=llm, prompt=strategy_prompt, output_key="estrategia")
+        self._lock = threading.Lock()
+        self.estadisticas = {"sellers": 0, "solicitudes": 0, "reintentos": 0, "individuales": 0}
+
+    def _contar(self, clave: str, n: int = 1):
+        with self._lock:
+            self.estadisticas[clave] += n
+
+    def armar_lotes(self, payloads, fecha_actual: str, temporada: str):
+        """Agrupa (seller_id, payload, línea) sin exceder presupuesto_tokens ni max_por_lote."""
+        base = estimar_tokens(batch_strategy_prompt.format(
+            fecha_actual=fecha_actual, temporada=temporada, n_vendedores=0, vendedores=""))
+        lotes, actual, tokens = [], [], base
+        for payload in payloads:
+            sid = str(payload[self.campo_id])
+            linea = linea_seller(payload, sid)
+            costo = estimar_tokens(linea) + TOKENS_SALIDA_POR_SELLER
+            if actual and (tokens + costo > self.presupuesto_tokens or len(actual) >= self.max_por_lote):
+                lotes.append(actual)
+                actual, tokens = [], base
+            actual.append((sid, payload, linea))
+            tokens += costo
+        if actual:
+            lotes.append(actual)
+        return lotes
+
+    def _individual(self, payload: dict, temporada: str) -> str:
+        self._contar("individuales")
+        return self.strategy_chain.invoke({**payload, "temporada": temporada})["estrategia"]
+
+    def _resolver(self, lote, fecha_actual: str, temporada: str) -> dict:
+        if len(lote) == 1:
+            sid, payload, _ = lote[0]
+            return {sid: self._individual(payload, temporada)}
+
+        prompt = batch_strategy_prompt.format(
+            fecha_actual=fecha_actual, temporada=temporada, n_vendedores=len(lote),
+            vendedores="\n".join(linea for _, _, linea in lote))
+        self._contar("solicitudes")
+        texto = self.llm.invoke(prompt).content
+        resultado = parsear_respuesta(texto, [sid for sid, _, _ in lote])
+
+        faltantes = [item for item in lote if item[0] not in resultado]
+        if faltantes:
+            # Reintento partiendo en mitades; un lote de 1 cae en strategy_chain
+            self._contar("reintentos")
+            mitad = (len(faltantes) + 1) // 2
+            for parte in (faltantes[:mitad], faltantes[mitad:]):
+                if parte:
+                    resultado.update(self._resolver(parte, fecha_actual, temporada))
+        return resultado
+
+    def recomendar(self, payloads, temporada: str = None) -> dict:
+        """
+        Args:
+            payloads: Lista de dicts con campo_id y las INPUT_VARIABLES de cot_chain
+            temporada: Contexto de temporada; si es None se obtiene con season_chain una
+                vez por fecha_actual. Solo se admite si todos los payloads tienen la misma fecha
+
+        Returns:
+            {seller_id: estrategia} para todos los sellers de la entrada
+        """
+        payloads = list(payloads)
+        if not payloads:
+            return {}
+        por_fecha = {}
+        for payload in payloads:
+            por_fecha.setdefault(str(payload["fecha_actual"]), []).append(payload)
+        if temporada is not None and len(por_fecha) > 1:
+            raise ValueError(f"temporada fija con {len(por_fecha)} fechas_actual distintas: {sorted(por_fecha)}")
+
+        tareas = []
+        for fecha_actual, grupo in por_fecha.items():
+            temporada_fecha = temporada
+            if temporada_fecha is None:
+                temporada_fecha = self.season_chain.invoke({"fecha_actual": fecha_actual})["temporada"]
+            tareas += [(lote, fecha_actual, temporada_fecha)
+                       for lote in self.armar_lotes(grupo, fecha_actual, temporada_fecha)]
+        resultado = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as ex:
+            for parcial in ex.map(lambda t: self._resolver(*t), tareas):
+                resultado.update(parcial)
+        self._contar("sellers", len(payloads))
+        return resultado
+
+    def resumen(self) -> dict:
+        """Solicitudes, reintentos, llamadas individuales y sellers por solicitud."""
+        stats = dict(self.estadisticas)
+        llamadas = stats["solicitudes"] + stats["individuales"]
+        stats["sellers_por_llamada"] = stats["sellers"] / llamadas if llamadas else 0.0
+        return stats
@@ -0,0 +1,278 @@
+# meli_insight_engine/llm/checkpoint.py
+
+"""
+Corridas por lotes reanudables: bitácora append-only de sellers completados.
+
+Cada resultado se agrega como una línea JSON a la bitácora (seller, salida y
+error). El fsync se hace cada `fsync_cada` filas o `fsync_segundos`, no por
+fila: ante una caída se pierde a lo sumo esa ventana, que se vuelve a pedir
+al reanudar.
+
+Al abrir una bitácora existente se leen los sellers ya completados (una
+última línea truncada por la caída se descarta y se corta del archivo) y la
+corrida solo envía los que faltan o terminaron con error. registrar() ignora
+un seller ya completado, así que reintentar una corrida entera, o una parte,
+es idempotente: nada se paga ni se escribe dos veces.
+
+El progreso y la ETA se calculan con el throughput observado en la corrida
+actual (ventana de los últimos segundos), sin contar lo reanudado.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import pandas as pd
+
+from .jsonl import linea_jsonl
+
+FSYNC_CADA = 100
+FSYNC_SEGUNDOS = 5.0
+
+
+class Bitacora:
+    """
+    Args:
+        ruta: Archivo .jsonl de la bitácora (se crea si no existe)
+        campo_id: Campo que identifica al seller
+        fsync_cada: Filas entre fsync
+        fsync_segundos: Tiempo máximo entre fsync
+    """
+
+    def __init__(self, ruta: str, campo_id: str = "seller_nickname", fsync_cada: int = FSYNC_CADA,
+                 fsync_segundos: float = FSYNC_SEGUNDOS):
+        self.ruta = ruta
+        self.campo_id = campo_id
+        self.fsync_cada = fsync_cada
+        self.fsync_segundos = fsync_segundos
+        self.completados = set()
+        self.fallidos = set()
+        self.estadisticas = {"previas": 0, "escritas": 0, "duplicadas": 0, "fsyncs": 0, "truncadas": 0}
+        self._lock = threading.Lock()
+        self._sin_sync = 0
+        self._ultimo_sync = time.monotonic()
+        os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+        self._cargar()
+        self._archivo = open(ruta, "a", encoding="utf-8")
+
+    def _anotar(self, fila: dict):
+        sid = fila.get(self.campo_id)
+        if fila.get("error") is None:
+            self.completados.add(sid)
+            self.fallidos.discard(sid)
+        elif sid not in self.completados:
+            self.fallidos.add(sid)
+
+    def _cargar(self):
+        if not os.path.exists(self.ruta):
+            return
+        valido = 0
+        with open(self.ruta, "rb") as f:
+            for linea in f:
+                try:
+                    fila = json.loads(linea)
+                except ValueError:
+                    break
+                if not linea.endswith(b"\n"):
+                    break
+                self._anotar(fila)
+                self.estadisticas["previas"] += 1
+                valido += len(linea)
+        if valido < os.path.getsize(self.ruta):
+            # Escritura a medias de la corrida anterior: se corta para que el append quede válido
+            self.estadisticas["truncadas"] += 1
+            with open(self.ruta, "r+b") as f:
+                f.truncate(valido)
+
+    def completado(self, sid) -> bool:
+        return sid in self.completados
+
+    def pendientes(self, payloads) -> pd.DataFrame:
+        """Filas de `payloads` cuyo seller no está completado (los fallidos se reintentan)."""
+        df = pd.DataFrame(payloads)
+        return df[~df[self.campo_id].isin(self.completados)]
+
+    def registrar(self, fila: dict) -> bool:
+        """Agrega una fila; devuelve False si el seller ya estaba completado."""
+        with self._lock:
+            if fila.get(self.campo_id) in self.completados:
+                self.estadisticas["duplicadas"] += 1
+                return False
+            self._archivo.write(linea_jsonl(fila))
+            self._anotar(fila)
+            self.estadisticas["escritas"] += 1
+            self._sin_sync += 1
+            if (self._sin_sync >= self.fsync_cada
+                    or time.monotonic() - self._ultimo_sync >= self.fsync_segundos):
+                self._sincronizar()
+            return True
+
+    def _sincronizar(self):
+        if self._archivo.closed:
+            return
+        self._archivo.flush()
+        os.fsync(self._archivo.fileno())
+        self.estadisticas["fsyncs"] += 1
+        self._sin_sync = 0
+        self._ultimo_sync = time.monotonic()
+
+    def sincronizar(self):
+        with self._lock:
+            self._sincronizar()
+
+    def cerrar(self):
+        with self._lock:
+            self._sincronizar()
+            self._archivo.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.cerrar()
+
+    def filas(self) -> pd.DataFrame:
+        """Estado final: la última fila de cada seller (un éxito prevalece sobre errores previos)."""
+        self.sincronizar()
+        df = pd.read_json(self.ruta, lines=True, dtype=False) if os.path.getsize(self.ruta) else pd.DataFrame()
+        if df.empty:
+            return df
+        df["_ok"] = df["error"].isna() if "error" in df else True
+        df = df.sort_values("_ok", kind="stable").drop_duplicates(self.campo_id, keep="last")
+        return df.drop(columns="_ok").sort_index().reset_index(drop=True)
+
+
+class Progreso:
+    """
+    Avance y ETA con el throughput observado (sellers/s en una ventana móvil).
+
+    Args:
+        total: Sellers pendientes en esta corrida
+        previos: Sellers ya completados (reanudados), solo para el porcentaje
+        ventana_segundos: Ventana del throughput
+    """
+
+    def __init__(self, total: int, previos: int = 0, ventana_segundos: float = 30.0):
+        self.total = total
+        self.previos = previos
+        self.ventana_segundos = ventana_segundos
+        self.hechos = 0
+        self.inicio = time.monotonic()
+        self._marcas = deque([(self.inicio, 0)])
+
+    def avanzar(self, n: int = 1):
+        self.hechos += n
+        ahora = time.monotonic()
+        self._marcas.append((ahora, self.hechos))
+        while len(self._marcas) > 2 and ahora - self._marcas[0][0] > self.ventana_segundos:
+            self._marcas.popleft()
+
+    def throughput(self) -> float:
+        (t0, h0), (t1, h1) = self._marcas[0], self._marcas[-1]
+        return (h1 - h0) / (t1 - t0) if t1 > t0 else 0.0
+
+    def eta(self) -> float:
+        """Segundos restantes estimados (inf sin throughput todavía)."""
+        restantes = self.total - self.hechos
+        if restantes <= 0:
+            return 0.0
+        tasa = self.throughput()
+        return restantes / tasa if tasa else float("inf")
+
+    def linea(self) -> str:
+        total = self.total + self.previos
+        hechos = self.hechos + self.previos
+        eta = self.eta()
+        texto_eta = "?" if eta == float("inf") else time.strftime("%H:%M:%S", time.gmtime(eta))
+        return (f"⏳ {hechos:,}/{total:,} sellers ({hechos / total if total else 1:.1%}) | "
+                f"{self.throughput():.1f} sellers/s | ETA {texto_eta}")
+
+
+def recomendar_con_checkpoint(payloads, generador, ruta_bitacora: str, workers: int = 8,
+                              campo_id: str = "seller_nickname", fsync_cada: int = FSYNC_CADA,
+                              max_errores_consecutivos: int = 50, reporte_segundos: float = 10.0,
+                              verbose: bool = True) -> dict:
+    """
+    Recomendaciones por seller con bitácora: al relanzar con la misma ruta solo se
+    piden los sellers que faltan o fallaron.
+
+    Args:
+        payloads: DataFrame / lista de dicts con campo_id y las INPUT_VARIABLES de cot_chain;
+            si un seller aparece más de una vez solo se envía su primera fila
+        generador: Callable payload -> {"temporada", "estrategia"} (generador_llm) o una
+            cadena con invoke (cot_chain)
+        ruta_bitacora: .jsonl append-only de resultados
+        workers: Llamadas concurrentes
+        max_errores_consecutivos: Corta la corrida (p. ej. límite de tasa del proveedor);
+            lo completado queda en la bitácora para reanudar
+
+    Returns:
+        Dict con total (sellers únicos), repetidos (filas descartadas), reanudados, procesados,
+        errores, detenida, segundos, throughput y las estadísticas de la bitácora
+    """
+    generar = generador.invoke if hasattr(generador, "invoke") else generador
+    inicio = time.monotonic()
+    with Bitacora(ruta_bitacora, campo_id, fsync_cada) as bitacora:
+        todos = pd.DataFrame(payloads)
+        repetidos = int(todos.duplicated(campo_id).sum())
+        if repetidos:
+            todos = todos.drop_duplicates(campo_id)
+            if verbose:
+                print(f"⚠️ {repetidos:,} filas con {campo_id} repetido; se envía solo la primera de cada seller")
+        pendientes = bitacora.pendientes(todos).to_dict("records")
+        progreso = Progreso(len(pendientes), previos=len(todos) - len(pendientes))
+        if verbose and progreso.previos:
+            print(f"♻️ Reanudando {ruta_bitacora}: {progreso.previos:,} sellers completados, "
+                  f"{len(pendientes):,} pendientes")
+
+        def tarea(payload):
+            fila = {campo_id: payload[campo_id], "cluster_name": payload.get("cluster_name")}
+            try:
+                respuesta = generar({k: v for k, v in payload.items() if k != campo_id})
+                return {**fila, "temporada": respuesta["temporada"], "estrategia": respuesta["estrategia"],
+                        "error": None}
+            except Exception as e:  # noqa: BLE001 (el error queda en la bitácora y se reintenta al reanudar)
+                return {**fila, "temporada": None, "estrategia": None, "error": f"{type(e).__name__}: {e}"}
+
+        errores = consecutivos = 0
+        detenida = False
+        ultimo_reporte = time.monotonic()
+        iterador = iter(pendientes)
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            # Como mucho 2 x workers en vuelo: al detenerse no quedan miles de llamadas encoladas
+            en_vuelo = {ex.submit(tarea, p) for p in _tomar(iterador, 2 * workers)}
+            while en_vuelo:
+                listos, en_vuelo = wait(en_vuelo, return_when=FIRST_COMPLETED)
+                for futuro in listos:
+                    fila = futuro.result()
+                    bitacora.registrar(fila)
+                    progreso.avanzar()
+                    if fila["error"] is None:
+                        consecutivos = 0
+                    else:
+                        errores += 1
+                        consecutivos += 1
+                detenida = detenida or consecutivos >= max_errores_consecutivos
+                if not detenida:
+                    en_vuelo |= {ex.submit(tarea, p) for p in _tomar(iterador, len(listos))}
+                if verbose and time.monotonic() - ultimo_reporte >= reporte_segundos:
+                    print(progreso.linea())
+                    ultimo_reporte = time.monotonic()
+
+    resumen = {"total": len(todos), "repetidos": repetidos, "reanudados": progreso.previos, "procesados": progreso.hechos,
+               "errores": errores, "detenida": detenida, "segundos": time.monotonic() - inicio,
+               "throughput": progreso.hechos / max(time.monotonic() - progreso.inicio, 1e-9),
+               **bitacora.estadisticas}
+    if verbose:
+        print(progreso.linea())
+        estado = (f"⛔ detenida tras {max_errores_consecutivos} errores seguidos; relanzar para reanudar"
+                  if detenida else "✅ completa")
+        print(f"📒 Bitácora {ruta_bitacora}: {resumen['procesados']:,} procesados, {errores:,} errores, "
+              f"{resumen['fsyncs']} fsync | {estado}")
+    return resumen
+
+
+def _tomar(iterador, n: int) -> list:
+    return [p for _, p in zip(range(n), iterador)]
@@ -0,0 +1,233 @@
+# meli_insight_engine/llm/client.py
+
+"""
+Cliente LLM compartido por todo el proceso.
+
+Un único httpx.Client (y su par asíncrono) con keep-alive se reutiliza en
+TemplateAgent, season_chain y strategy_chain, de modo que las llamadas
+sucesivas a Deepseek no repiten el handshake TCP/TLS. Las métricas de
+conexión se obtienen con la extensión `trace` de httpcore.
+"""
+import os
+import threading
+import time
+import weakref
+
+import httpx
+
+BASE_URL_DEEPSEEK = "https://api.deepseek.com"
+MODELO_DEEPSEEK = "deepseek-chat"
+
+# Configuración del pool; se puede cambiar con configurar_pool() antes del primer uso
+CONFIG_POOL = {
+    "max_conexiones": int(os.getenv("MELI_LLM_MAX_CONEXIONES", "20")),
+    "max_keepalive": int(os.getenv("MELI_LLM_MAX_KEEPALIVE", "10")),
+    "keepalive_s": float(os.getenv("MELI_LLM_KEEPALIVE_S", "60")),
+    "timeout_s": float(os.getenv("MELI_LLM_TIMEOUT_S", "60")),
+    "timeout_conexion_s": float(os.getenv("MELI_LLM_TIMEOUT_CONEXION_S", "10")),
+    "max_reintentos": int(os.getenv("MELI_LLM_MAX_REINTENTOS", "2")),
+}
+
+
+class MetricasConexion:
+    """
+    Contadores de solicitudes, conexiones nuevas y handshakes TLS (thread-safe).
+
+    Una solicitud que no abre conexión reutilizó una del pool; el ahorro por
+    llamada se estima con el tiempo medio de conexión + TLS observado.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inicios = {}
+        self.reiniciar()
+
+    def reiniciar(self):
+        with self._lock:
+            self.solicitudes = 0
+            self.conexiones_nuevas = 0
+            self.handshakes_tls = 0
+            self.segundos_conexion = 0.0
+            self.segundos_tls = 0.0
+
+    def registrar_solicitud(self):
+        with self._lock:
+            self.solicitudes += 1
+
+    def registrar_evento(self, nombre: str):
+        """Callback de la extensión `trace` de httpcore."""
+        ahora = time.perf_counter()
+        clave = (threading.get_ident(), nombre.rsplit(".", 1)[0])
+        if nombre.endswith(".started"):
+            self._inicios[clave] = ahora
+            return
+        if not nombre.endswith(".complete"):
+            return
+        duracion = ahora - self._inicios.pop(clave, ahora)
+        with self._lock:
+            if nombre.endswith("connect_tcp.complete"):
+                self.conexiones_nuevas += 1
+                self.segundos_conexion += duracion
+            elif nombre.endswith("start_tls.complete"):
+                self.handshakes_tls += 1
+                self.segundos_tls += duracion
+
+    def resumen(self) -> dict:
+        with self._lock:
+            reutilizadas = max(0, self.solicitudes - self.conexiones_nuevas)
+            handshake_medio = ((self.segundos_conexion + self.segundos_tls) / self.conexiones_nuevas
+                               if self.conexiones_nuevas else 0.0)
+            return {
+                "solicitudes": self.solicitudes,
+                "conexiones_nuevas": self.conexiones_nuevas,
+                "conexiones_reutilizadas": reutilizadas,
+                "handshakes_tls": self.handshakes_tls,
+                "tasa_reuso": reutilizadas / self.solicitudes if self.solicitudes else 0.0,
+                "handshake_medio_ms": handshake_medio * 1000,
+                "ahorro_estimado_ms": reutilizadas * handshake_medio * 1000,
+                "ahorro_por_llamada_ms": (reutilizadas * handshake_medio * 1000 / self.solicitudes
+                                          if self.solicitudes else 0.0),
+            }
+
+
+_lock = threading.Lock()
+_metricas = MetricasConexion()
+_http_client = None
+_http_client_async = None
+_llms = {}
+
+
+def _limites_y_timeout(config: dict):
+    limites = httpx.Limits(
+        max_connections=config["max_conexiones"],
+        max_keepalive_connections=config["max_keepalive"],
+        keepalive_expiry=config["keepalive_s"],
+    )
+    timeout = httpx.Timeout(config["timeout_s"], connect=config["timeout_conexion_s"])
+    return limites, timeout
+
+
+def crear_http_client(metricas: MetricasConexion = None, asincrono: bool = False, **config):
+    """
+    Crea un httpx.Client (o AsyncClient) con pool keep-alive e instrumentación.
+
+    Args:
+        metricas: Destino de las métricas de conexión (None = sin instrumentar)
+        asincrono: Si es True devuelve un httpx.AsyncClient
+        **config: Claves de CONFIG_POOL a sobrescribir
+    """
+    config = {**CONFIG_POOL, **config}
+    limites, timeout = _limites_y_timeout(config)
+
+    if metricas is None:
+        hooks = {}
+    elif asincrono:
+        async def _trace(nombre, info):
+            metricas.registrar_evento(nombre)
+
+        async def _instrumentar(request):
+            metricas.registrar_solicitud()
+            request.extensions["trace"] = _trace
+
+        hooks = {"request": [_instrumentar]}
+    else:
+        def _trace(nombre, info):
+            metricas.registrar_evento(nombre)
+
+        def _instrumentar(request):
+            metricas.registrar_solicitud()
+            request.extensions["trace"] = _trace
+
+        hooks = {"request": [_instrumentar]}
+
+    clase = httpx.AsyncClient if asincrono else httpx.Client
+    return clase(limits=limites, timeout=timeout, event_hooks=hooks)
+
+
+def configurar_pool(**config):
+    """
+    Actualiza CONFIG_POOL y descarta los clientes ya creados para que los modelos nuevos
+    la tomen (los ya creados siguen con su pool hasta que se liberan).
+    """
+    desconocidas = set(config) - set(CONFIG_POOL)
+    if desconocidas:
+        raise ValueError(f"Parámetros de pool desconocidos: {sorted(desconocidas)}")
+    CONFIG_POOL.update(config)
+    reiniciar_clientes()
+
+
+def obtener_http_client(asincrono: bool = False):
+    """httpx.Client compartido por el proceso (se crea en el primer uso)."""
+    global _http_client, _http_client_async
+    with _lock:
+        if asincrono:
+            if _http_client_async is None:
+                _http_client_async = crear_http_client(_metricas, asincrono=True)
+            return _http_client_async
+        if _http_client is None:
+            _http_client = crear_http_client(_metricas)
+        return _http_client
+
+
+def obtener_llm(modelo: str = MODELO_DEEPSEEK, temperatura: float = 0.3,
+                base_url: str = None, api_key: str = None):
+    """
+    ChatOpenAI apuntando a Deepseek que comparte el pool HTTP del proceso.
+
+    Se cachea una instancia por (modelo, temperatura, base_url, api_key), así que
+    varios agentes y cadenas reciben el mismo objeto.
+    """
+    import openai
+    from langchain.chat_models import ChatOpenAI
+
+    base_url = base_url or os.getenv("DEEPSEEK_BASE_URL", BASE_URL_DEEPSEEK)
+    api_key = api_key if api_key is not None else os.getenv("DEEPSEEK_API_KEY", "")
+    clave = (modelo, temperatura, base_url, api_key)
+    if clave in _llms:
+        return _llms[clave]
+
+    parametros = {
+        "api_key": api_key,
+        "base_url": base_url,
+        "max_retries": CONFIG_POOL["max_reintentos"],
+    }
+    # Se construyen los clientes openai aquí porque AsyncOpenAI exige un httpx.AsyncClient
+    cliente = openai.OpenAI(http_client=obtener_http_client(), **parametros)
+    cliente_async = openai.AsyncOpenAI(http_client=obtener_http_client(asincrono=True), **parametros)
+    llm = ChatOpenAI(
+        api_key=api_key,
+        base_url=base_url,
+        model=modelo,
+        temperature=temperatura,
+        max_retries=CONFIG_POOL["max_reintentos"],
+        client=cliente.chat.completions,
+        async_client=cliente_async.chat.completions,
+    )
+    with _lock:
+        return _llms.setdefault(clave, llm)
+
+
+def obtener_metricas() -> MetricasConexion:
+    """Métricas de conexión del pool compartido."""
+    return _metricas
+
+
+def _retirar(cliente: httpx.Client):
+    """
+    Cierra el pool de `cliente` cuando ya nadie lo referencia. Los ChatOpenAI creados
+    antes (p. ej. las cadenas por defecto de rasoner_meli) lo siguen usando hasta entonces.
+    """
+    weakref.finalize(cliente, cliente._transport.close)
+
+
+def reiniciar_clientes():
+    """Descarta los clientes compartidos y vacía la caché de modelos (p. ej. entre pruebas)."""
+    global _http_client, _http_client_async
+    with _lock:
+        if _http_client is not None:
+            _retirar(_http_client)
+        # El AsyncClient se libera sin await; sus conexiones se cierran al recolectarse
+        _http_client = None
+        _http_client_async = None
+        _llms.clear()
+    _metricas.reiniciar()
@@ -0,0 +1,135 @@
+# meli_insight_engine/llm/fake_model.py
+
+import random
+import re
+import threading
+import time
+from itertools import count
+from typing import Any, Callable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.pydantic_v1 import PrivateAttr
+
+RESPUESTAS_POR_DEFECTO = [
+    "Temporada baja. No hay campañas masivas activas en esta fecha.",
+    "Acción prioritaria: activar un cupón del 10 % en los 20 productos con más visitas "
+    "y reforzar Mercado Ads en la categoría principal para sostener el margen.",
+]
+
+
+def estimar_tokens(texto: str) -> int:
+    """Estimación rápida de tokens (~4 caracteres por token), suficiente para simulación."""
+    return max(1, len(texto) // 4)
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Modelo de chat determinista para pruebas y benchmarks sin llamar a Deepseek.
+
+    Se inyecta en TemplateAgent o en las cadenas de rasoner_meli en lugar de
+    ChatOpenAI. Con la misma semilla produce las mismas latencias y respuestas.
+
+    Args:
+        respuestas: Respuestas enlatadas que se devuelven en ciclo
+        responder: Función opcional prompt -> respuesta (tiene prioridad sobre `respuestas`)
+        latencia: Segundos fijos o distribución ("constante", s) | ("uniforme", a, b) |
+            ("normal", media, desvio) | ("lognormal", mu, sigma)
+        tokens_salida: Tokens de salida reportados (por defecto se estiman del texto)
+        semilla: Semilla del generador de latencias
+        dormir: Si es False no se duerme; la latencia solo se reporta (modo simulación)
+        latencia_token: Segundos entre tokens al transmitir con .stream(); `latencia`
+            actúa como tiempo hasta el primer token
+    """
+
+    respuestas: List[str] = RESPUESTAS_POR_DEFECTO
+    responder: Optional[Callable[[str], str]] = None
+    latencia: Union[float, Tuple[Any, ...]] = 0.0
+    tokens_salida: Optional[int] = None
+    semilla: int = 42
+    dormir: bool = True
+    latencia_token: float = 0.0
+
+    _rng: Any = PrivateAttr()
+    _lock: Any = PrivateAttr()
+    _contador: Any = PrivateAttr()
+    _llamadas: List[dict] = PrivateAttr()
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._rng = random.Random(self.semilla)
+        self._lock = threading.Lock()
+        self._contador = count()
+        self._llamadas = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat-meli"
+
+    @property
+    def llamadas(self) -> List[dict]:
+        """Registro de cada llamada: latencia simulada y tokens de entrada/salida."""
+        return list(self._llamadas)
+
+    def muestrear_latencia(self) -> float:
+        """Extrae una latencia de la distribución configurada (en segundos, >= 0)."""
+        if isinstance(self.latencia, (int, float)):
+            return float(self.latencia)
+        tipo, *params = self.latencia
+        with self._lock:
+            if tipo == "constante":
+                valor = params[0]
+            elif tipo == "uniforme":
+                valor = self._rng.uniform(*params)
+            elif tipo == "normal":
+                valor = self._rng.gauss(*params)
+            elif tipo == "lognormal":
+                valor = self._rng.lognormvariate(*params)
+            else:
+                raise ValueError(f"Distribución de latencia desconocida: {tipo}")
+        return max(0.0, float(valor))
+
+    def _texto_respuesta(self, prompt: str) -> str:
+        if self.responder is not None:
+            return self.responder(prompt)
+        with self._lock:
+            i = next(self._contador)
+        return self.respuestas[i % len(self.respuestas)]
+
+    def _preparar(self, messages: Sequence[BaseMessage]):
+        prompt = "\n".join(str(m.content) for m in messages)
+        texto = self._texto_respuesta(prompt)
+        latencia = self.muestrear_latencia()
+        uso = {
+            "prompt_tokens": estimar_tokens(prompt),
+            "completion_tokens": self.tokens_salida or estimar_tokens(texto),
+        }
+        uso["total_tokens"] = uso["prompt_tokens"] + uso["completion_tokens"]
+        with self._lock:
+            self._llamadas.append({"latencia_s": latencia, **uso})
+        return texto, latencia, uso
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager=None, **kwargs: Any) -> ChatResult:
+        texto, latencia, uso = self._preparar(messages)
+        if self.dormir and latencia:
+            time.sleep(latencia)
+        return ChatResult(
+            generations=[ChatGeneration(message=AIMessage(content=texto))],
+            llm_output={"token_usage": uso, "model_name": self._llm_type},
+        )
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        texto, latencia, _ = self._preparar(messages)
+        if self.dormir and latencia:
+            time.sleep(latencia)
+        # Tokens = palabras con su espacio final, así la concatenación reproduce el texto
+        for i, token in enumerate(re.findall(r"\S+\s*|\s+", texto)):
+            if i and self.dormir and self.latencia_token:
+                time.sleep(self.latencia_token)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
@@ -0,0 +1,25 @@
+# meli_insight_engine/llm/jsonl.py
+
+"""
+Serialización de filas de resultados a líneas JSON (bitácora y salidas .jsonl).
+
+Los escalares NumPy se convierten a tipos de Python y los NaN a null, para
+que las filas armadas desde DataFrames se puedan escribir con json.dumps.
+"""
+import json
+
+import numpy as np
+
+
+def valor_json(v):
+    """Escalar NumPy -> tipo de Python, NaN -> None; el resto queda igual."""
+    if isinstance(v, np.generic):
+        v = v.item()
+    if isinstance(v, float) and np.isnan(v):
+        return None
+    return v
+
+
+def linea_jsonl(fila: dict) -> str:
+    """Una fila como línea JSON terminada en salto de línea."""
+    return json.dumps({k: valor_json(v) for k, v in fila.items()}, ensure_ascii=False) + "\n"
@@ -0,0 +1,302 @@
+# meli_insight_engine/llm/nightly.py
+
+"""
+Corrida nocturna productor / consumidor: scoring y generación en paralelo.
+
+    lotes de payloads ──► productor ──► cola acotada ──► N workers LLM ──► escritor por chunks
+    (DuckDB + cluster)    (reglas)      (backpressure)                     (JSONL o Parquet)
+
+- El productor consume un iterable de lotes (p. ej. core.payloads.lotes_payloads,
+  que calcula features y cluster en DuckDB/NumPy) y encola un seller por
+  elemento. Con un MotorReglas, los sellers resueltos por la vía rápida van
+  directo al escritor sin pasar por la cola.
+- La cola tiene capacidad fija: cuando los workers van atrasados, put()
+  bloquea al productor y deja de leer lotes. La memoria queda acotada por
+  capacidad + un lote, no por la cantidad de sellers.
+- Los workers llaman al modelo en cuanto llega el primer lote; el tiempo
+  total tiende a max(scoring, generación) en vez de su suma.
+- El escritor junta `tamano_chunk` resultados y los escribe de una vez
+  (append a un .jsonl o una parte Parquet por chunk en una carpeta). Una
+  corrida nueva vacía el destino; solo al reanudar con bitácora se agrega a
+  lo que ya había.
+
+Un error del modelo en un seller no detiene la corrida: queda registrado en
+la columna error de su fila. Un error del productor o del escritor cancela
+todo y se relanza en ejecutar().
+
+Con una bitácora (llm.checkpoint.Bitacora) la corrida es reanudable: el
+productor descarta los sellers ya completados y el escritor registra cada
+resultado en ella además del destino.
+"""
+import glob
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from .checkpoint import Bitacora
+from .jsonl import linea_jsonl
+from .prompts.templates import season_prompt, strategy_prompt
+
+CAPACIDAD_COLA = 256
+TAMANO_CHUNK = 500
+_FIN = object()
+
+
+def _texto(respuesta) -> str:
+    return (respuesta.content if hasattr(respuesta, "content") else str(respuesta)).strip()
+
+
+def generador_llm(llm):
+    """
+    payload -> {"temporada", "estrategia"} con el modelo dado (misma secuencia que cot_chain).
+    La temporada se pide una vez por fecha_actual y se comparte entre workers.
+    """
+    temporadas, lock = {}, threading.Lock()
+
+    def generar(payload: dict) -> dict:
+        fecha = str(payload["fecha_actual"])
+        with lock:
+            if fecha not in temporadas:
+                temporadas[fecha] = _texto(llm.invoke(season_prompt.format(fecha_actual=fecha)))
+        temporada = temporadas[fecha]
+        campos = {k: payload[k] for k in strategy_prompt.input_variables if k != "temporada"}
+        estrategia = _texto(llm.invoke(strategy_prompt.format(**campos, temporada=temporada)))
+        return {"temporada": temporada, "estrategia": estrategia}
+
+    return generar
+
+
+class EscritorChunks:
+    """
+    Escribe filas (dicts) en chunks: append a un .jsonl o parte-NNNNN.parquet en una carpeta.
+
+    Args:
+        destino: Ruta .jsonl o carpeta de partes Parquet
+        tamano_chunk: Filas por escritura
+        reanudar: Conserva lo escrito por una corrida anterior (append al .jsonl, partes
+            nuevas numeradas después de las existentes). Si es False se vacía el destino
+    """
+
+    def __init__(self, destino: str, tamano_chunk: int = TAMANO_CHUNK, reanudar: bool = False):
+        self.destino = destino
+        self.tamano_chunk = tamano_chunk
+        self.jsonl = destino.endswith(".jsonl")
+        self.pendientes = []
+        self.chunks = 0
+        self.filas = 0
+        if self.jsonl:
+            os.makedirs(os.path.dirname(destino) or ".", exist_ok=True)
+            if not reanudar:
+                open(destino, "w", encoding="utf-8").close()
+            return
+        os.makedirs(destino, exist_ok=True)
+        partes = sorted(glob.glob(os.path.join(destino, "parte-*.parquet")))
+        if not reanudar:
+            for parte in partes:
+                os.remove(parte)
+            partes = []
+        self._siguiente = int(os.path.basename(partes[-1])[len("parte-"):-len(".parquet")]) + 1 if partes else 0
+
+    def agregar(self, fila: dict):
+        self.pendientes.append(fila)
+        if len(self.pendientes) >= self.tamano_chunk:
+            self.vaciar()
+
+    def vaciar(self):
+        if not self.pendientes:
+            return
+        if self.jsonl:
+            texto = "".join(linea_jsonl(f) for f in self.pendientes)
+            with open(self.destino, "a", encoding="utf-8") as f:
+                f.write(texto)
+        else:
+            pd.DataFrame(self.pendientes).to_parquet(
+                os.path.join(self.destino, f"parte-{self._siguiente + self.chunks:05d}.parquet"), index=False)
+        self.filas += len(self.pendientes)
+        self.chunks += 1
+        self.pendientes = []
+
+
+class FlujoRecomendaciones:
+    """
+    Args:
+        generador: Callable payload -> {"temporada", "estrategia"} (p. ej. generador_llm(llm))
+        workers: Llamadas LLM concurrentes
+        capacidad: Tamaño máximo de la cola productor -> workers (backpressure)
+        tamano_chunk: Resultados por escritura
+        motor_reglas: MotorReglas opcional para la vía rápida
+        campo_id: Columna del lote que identifica al seller
+    """
+
+    def __init__(self, generador, workers: int = 8, capacidad: int = CAPACIDAD_COLA,
+                 tamano_chunk: int = TAMANO_CHUNK, motor_reglas=None, campo_id: str = "seller_nickname"):
+        self.generador = generador
+        self.workers = workers
+        self.capacidad = capacidad
+        self.tamano_chunk = tamano_chunk
+        self.motor_reglas = motor_reglas
+        self.campo_id = campo_id
+
+    # -- hilos ---------------------------------------------------------------
+
+    def _poner(self, cola, item):
+        """put() bloqueante que se interrumpe si la corrida se canceló."""
+        while not self._cancelado.is_set():
+            try:
+                cola.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _productor(self, lotes):
+        try:
+            iterador = iter(lotes)
+            while True:
+                inicio = time.perf_counter()
+                lote = next(iterador, None)
+                if lote is None:
+                    break
+                df = pd.DataFrame(lote).reset_index(drop=True)
+                if self._bitacora is not None:
+                    completos = df[self.campo_id].isin(self._bitacora.completados).to_numpy()
+                    self.stats["reanudados"] += int(completos.sum())
+                    df = df[~completos].reset_index(drop=True)
+                rapidas = []
+                escalar = np.ones(len(df), dtype=bool)
+                if self.motor_reglas is not None:
+                    evaluacion = self.motor_reglas.evaluar(df)
+                    escalar = evaluacion["escalar"].to_numpy()
+                    for payload, regla, estrategia in zip(df[~escalar].to_dict("records"),
+                                                          evaluacion["regla"][~escalar],
+                                                          evaluacion["estrategia"][~escalar]):
+                        rapidas.append(self._fila(payload, None, estrategia, "regla", regla=regla))
+                registros = df[escalar].to_dict("records")
+                self.stats["segundos_scoring"] += time.perf_counter() - inicio
+                self.stats["lotes"] += 1
+                self.stats["sellers"] += len(df)
+
+                for fila in rapidas:
+                    if not self._poner(self._resultados, fila):
+                        return
+                for payload in registros:
+                    espera = time.perf_counter()
+                    if not self._poner(self._cola, payload):
+                        return
+                    self.stats["segundos_bloqueado"] += time.perf_counter() - espera
+                    self.stats["max_cola"] = max(self.stats["max_cola"], self._cola.qsize())
+        except BaseException as e:  # noqa: BLE001 (se relanza en ejecutar)
+            self._error = e
+            self._cancelado.set()
+        finally:
+            for _ in range(self.workers):
+                self._poner(self._cola, _FIN)
+
+    def _fila(self, payload: dict, temporada, estrategia, fuente: str, error: str = None,
+              regla: str = None) -> dict:
+        return {self.campo_id: payload.get(self.campo_id), "cluster_name": payload.get("cluster_name"),
+                "temporada": temporada, "estrategia": estrategia, "fuente": fuente, "regla": regla,
+                "error": error}
+
+    def _worker(self):
+        while True:
+            try:
+                payload = self._cola.get(timeout=0.1)
+            except queue.Empty:
+                if self._cancelado.is_set():
+                    return
+                continue
+            if payload is _FIN:
+                return
+            inicio = time.perf_counter()
+            try:
+                respuesta = self.generador(payload)
+                fila = self._fila(payload, respuesta["temporada"], respuesta["estrategia"], "llm")
+            except Exception as e:  # noqa: BLE001 (el error queda en la fila del seller)
+                fila = self._fila(payload, None, None, "llm", f"{type(e).__name__}: {e}")
+            with self._lock:
+                self.stats["segundos_llm"] += time.perf_counter() - inicio
+                self.stats["sellers_llm"] += 1
+                self.stats["errores"] += fila["error"] is not None
+            if not self._poner(self._resultados, fila):
+                return
+
+    def _escritor(self, escritor: EscritorChunks):
+        try:
+            while True:
+                try:
+                    fila = self._resultados.get(timeout=0.1)
+                except queue.Empty:
+                    if self._cancelado.is_set():
+                        break
+                    continue
+                if fila is _FIN:
+                    break
+                if self._bitacora is not None:
+                    self._bitacora.registrar(fila)
+                escritor.agregar(fila)
+            # También al cancelar: lo ya generado se escribe
+            escritor.vaciar()
+        except BaseException as e:  # noqa: BLE001
+            self._error = e
+            self._cancelado.set()
+
+    # -- corrida -------------------------------------------------------------
+
+    def ejecutar(self, lotes, destino: str, verbose: bool = True, bitacora: Bitacora = None) -> dict:
+        """
+        Args:
+            lotes: Iterable de lotes de payloads (DataFrame / lista de dicts) con campo_id
+            destino: .jsonl (append por chunk) o carpeta de partes Parquet; sin bitácora se
+                vacía al empezar
+            bitacora: Bitacora opcional; se omiten sus sellers completados, se registra cada
+                resultado y el destino conserva lo escrito por la corrida anterior (el estado
+                final de una corrida reanudada es bitacora.filas())
+
+        Returns:
+            Dict con sellers (procesados en esta corrida), reanudados, sellers_llm, via_rapida,
+            errores, chunks, segundos (total),
+            segundos_scoring, segundos_llm (suma de llamadas), segundos_bloqueado (productor
+            esperando a la cola) y max_cola
+        """
+        self.stats = {"lotes": 0, "sellers": 0, "reanudados": 0, "sellers_llm": 0, "errores": 0, "max_cola": 0,
+                      "segundos_scoring": 0.0, "segundos_llm": 0.0, "segundos_bloqueado": 0.0}
+        self._cola = queue.Queue(maxsize=self.capacidad)
+        self._resultados = queue.Queue(maxsize=max(self.capacidad, self.tamano_chunk))
+        self._cancelado = threading.Event()
+        self._lock = threading.Lock()
+        self._error = None
+        self._bitacora = bitacora
+        escritor = EscritorChunks(destino, self.tamano_chunk, reanudar=bitacora is not None)
+
+        inicio = time.perf_counter()
+        hilo_escritor = threading.Thread(target=self._escritor, args=(escritor,), name="escritor")
+        hilos = [threading.Thread(target=self._worker, name=f"llm-{i}") for i in range(self.workers)]
+        productor = threading.Thread(target=self._productor, args=(lotes,), name="productor")
+        for h in [hilo_escritor, *hilos, productor]:
+            h.start()
+        productor.join()
+        for h in hilos:
+            h.join()
+        self._poner(self._resultados, _FIN)
+        hilo_escritor.join()
+        if bitacora is not None:
+            bitacora.sincronizar()
+        if self._error is not None:
+            raise self._error
+
+        resumen = dict(self.stats, via_rapida=self.stats["sellers"] - self.stats["sellers_llm"],
+                       filas_escritas=escritor.filas, chunks=escritor.chunks,
+                       segundos=time.perf_counter() - inicio)
+        if verbose:
+            generacion = resumen["segundos_llm"] / max(self.workers, 1)
+            print(f"🌙 Corrida nocturna: {resumen['sellers']:,} sellers en {resumen['segundos']:.2f}s "
+                  f"(scoring {resumen['segundos_scoring']:.2f}s, generación ~{generacion:.2f}s con "
+                  f"{self.workers} workers) | LLM {resumen['sellers_llm']:,} · vía rápida "
+                  f"{resumen['via_rapida']:,} · errores {resumen['errores']:,} | "
+                  f"{resumen['chunks']} chunks | cola máx {resumen['max_cola']}/{self.capacidad}")
+        return resumen
@@ -287,3 +287,28 @@ Métricas:
         "descuento_pct", "rep_score", "tasa_cancelacion"
     ]
 )
+
+# Variante por lotes de strategy_prompt: el bloque de instrucciones se envía una
+# sola vez y la respuesta es un arreglo JSON indexado por seller_id.
+batch_strategy_prompt = PromptTemplate(
+    template="""
+Eres asesor comercial de Mercado Libre.
+
+Hoy es: {fecha_actual} | Temporada: {temporada}
+
+Para CADA vendedor de la lista propón UNA acción prioritaria para aumentar ventas y margen, considerando:
+– El segmento del vendedor (cluster_name).
+– Sus métricas clave.
+– El contexto de temporada (ej: Black Sale, vacaciones, etc).
+
+Vendedores ({n_vendedores}), un objeto JSON por línea:
+{vendedores}
+
+# Instrucción
+- Sé específico: si hay Black Sale, sugiere un boost fuerte, si es temporada baja, aconseja conservar margen.
+- No repitas las métricas textualmente; sé breve (≤150 palabras por vendedor) y orientado a negocio.
+- Responde ÚNICAMENTE con un arreglo JSON válido, sin texto adicional, con exactamente un elemento por vendedor:
+[{{"seller_id": "<seller_id>", "estrategia": "<acción recomendada>"}}]
+""",
+    input_variables=["fecha_actual", "temporada", "n_vendedores", "vendedores"]
+)
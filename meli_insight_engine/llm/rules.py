@@ -0,0 +1,244 @@
+# meli_insight_engine/llm/rules.py
+
+"""
+Vía rápida por reglas de negocio antes del LLM.
+
+Las reglas de la sección 8 del README (una acción por segmento) y las alertas
+de la sección 1 se declaran como datos: segmentos + condiciones
+(campo, operador, valor) sobre los campos del payload de cot_chain. Se
+evalúan sobre lotes completos (DataFrame, pyarrow Table/RecordBatch o dict
+de arrays) con máscaras NumPy: una comparación vectorizada por condición, no
+un if por seller.
+
+Un seller se ESCALA al LLM si no cumple ninguna regla o si cumple alguna
+anomalía (valores inválidos, segmento desconocido, riesgo de churn...), aunque
+también cumpla una regla. El resto recibe la estrategia de su regla sin
+llamar al modelo.
+"""
+import operator
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# cot_chain hace dos llamadas por seller (season_chain + strategy_chain)
+LLAMADAS_POR_SELLER = 2
+
+CAMPOS_NUMERICOS = ("publicaciones", "categorias_distintas", "stock_promedio", "precio_medio_cop",
+                    "descuento_pct", "rep_score", "tasa_cancelacion")
+
+OPERADORES = {
+    "<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge,
+    "==": operator.eq, "!=": operator.ne,
+    "in": lambda a, b: np.isin(a, list(b)), "not in": lambda a, b: ~np.isin(a, list(b)),
+}
+
+
+class Regla:
+    """
+    Args:
+        nombre: Identificador de la regla (aparece en el reporte)
+        segmentos: cluster_name a los que aplica (None = todos)
+        condiciones: Lista de (campo, operador, valor); todas deben cumplirse
+        estrategia: Texto de la recomendación (vacío en las anomalías)
+    """
+
+    def __init__(self, nombre: str, segmentos=None, condiciones=(), estrategia: str = ""):
+        self.nombre = nombre
+        self.segmentos = None if segmentos is None else tuple(segmentos)
+        self.condiciones = [tuple(c) for c in condiciones]
+        self.estrategia = estrategia
+        for _, op, _ in self.condiciones:
+            if op not in OPERADORES:
+                raise ValueError(f"Operador desconocido en {nombre}: {op}")
+
+    def mascara(self, columnas: dict, n: int) -> np.ndarray:
+        m = np.ones(n, dtype=bool)
+        if self.segmentos is not None:
+            m &= np.isin(columnas["cluster_name"], self.segmentos)
+        for campo, op, valor in self.condiciones:
+            # Las comparaciones con NaN dan False: un valor faltante nunca cumple una condición
+            m &= np.asarray(OPERADORES[op](columnas[campo], valor), dtype=bool)
+        return m
+
+    def __repr__(self):
+        return f"Regla({self.nombre!r}, segmentos={self.segmentos}, condiciones={self.condiciones})"
+
+
+# Sección 8 del README + alerta "Candidato a Power Seller" de la sección 1. El export no
+# trae GMV: el umbral de 50k USD se aproxima con catálogo grande y buena reputación.
+REGLAS_NEGOCIO = [
+    Regla("candidato_power", ["Sellers en Crecimiento"],
+          [("rep_score", ">=", 4.0), ("publicaciones", ">=", 200)],
+          "🎉 Candidato a Power Seller: ofrecer comisión preferencial a prueba y Fulfillment "
+          "para sostener el crecimiento. KPI: migración a Power Seller en el trimestre."),
+    Regla("power_sellers", ["Power Sellers"], [("rep_score", ">=", 4.0)],
+          "Comisión preferencial + Fulfillment: priorizar logística premium y stock en los "
+          "productos más vendidos. KPI: ↑ GMV mes a mes y retención."),
+    Regla("crecimiento", ["Sellers en Crecimiento"], [],
+          "Bundle Ads + asesor: activar un pack de Ads en sus categorías principales con "
+          "acompañamiento de un asesor comercial. KPI: % de migración a Premium."),
+    Regla("ocasionales", ["Sellers Ocasionales"], [],
+          "Onboarding guiado + micro-crédito: inscribir en Seller University y activar alertas "
+          "de calidad de publicación. KPI: reclamos < 2 % y crecimiento de ventas."),
+]
+
+# Casos que merecen una respuesta a medida aunque cumplan una regla
+ANOMALIAS = [
+    Regla("segmento_desconocido", None,
+          [("cluster_name", "not in", ["Power Sellers", "Sellers en Crecimiento", "Sellers Ocasionales",
+                                       "Cazadores de Oferta", "Liquidadores / Outlet"])]),
+    Regla("riesgo_churn", ["Power Sellers"], [("rep_score", "<", 3.0)]),
+    Regla("cancelacion_alta", None, [("tasa_cancelacion", ">", 0.10)]),
+    Regla("descuento_extremo", None, [("descuento_pct", ">", 0.5),
+                                      ("cluster_name", "!=", "Liquidadores / Outlet")]),
+]
+
+
+def columnas_lote(lote) -> tuple:
+    """({campo: ndarray}, n) desde un DataFrame, pyarrow Table/RecordBatch, dict de arrays o lista de dicts."""
+    if isinstance(lote, list):
+        lote = pd.DataFrame(lote)
+    if isinstance(lote, pd.DataFrame):
+        nombres, obtener = lote.columns, lambda c: lote[c].to_numpy()
+    elif isinstance(lote, dict):
+        nombres, obtener = lote.keys(), lambda c: np.asarray(lote[c])
+    else:
+        nombres, obtener = lote.schema.names, lambda c: lote.column(c).to_numpy(zero_copy_only=False)
+    columnas = {}
+    for c in nombres:
+        valores = obtener(c)
+        if c in CAMPOS_NUMERICOS:
+            valores = pd.to_numeric(pd.Series(valores), errors="coerce").to_numpy(dtype=np.float64)
+        elif c == "cluster_name":
+            valores = np.asarray(valores, dtype=object)
+        columnas[c] = valores
+    n = len(next(iter(columnas.values()))) if columnas else 0
+    return columnas, n
+
+
+class MotorReglas:
+    """
+    Evalúa reglas y anomalías sobre lotes y lleva el conteo de la vía rápida.
+
+    Args:
+        reglas: Reglas en orden de prioridad (gana la primera que se cumple)
+        anomalias: Condiciones que fuerzan el escalamiento al LLM
+        validar_numericos: Escala además los sellers con campos numéricos NaN o negativos
+            (descuento_pct puede ser negativo: precio por encima del precio regular)
+    """
+
+    def __init__(self, reglas=None, anomalias=None, validar_numericos: bool = True):
+        self.reglas = list(REGLAS_NEGOCIO if reglas is None else reglas)
+        self.anomalias = list(ANOMALIAS if anomalias is None else anomalias)
+        self.validar_numericos = validar_numericos
+        self.reiniciar()
+
+    def reiniciar(self):
+        self.sellers = 0
+        self.por_regla = Counter()
+        self.por_anomalia = Counter()
+        self.escalados = 0
+
+    def evaluar(self, lote) -> pd.DataFrame:
+        """
+        Returns:
+            DataFrame alineado con el lote: regla, estrategia (None si se escala),
+            anomalia y escalar
+        """
+        columnas, n = columnas_lote(lote)
+        regla = np.full(n, None, dtype=object)
+        estrategia = np.full(n, None, dtype=object)
+        libre = np.ones(n, dtype=bool)
+        for r in self.reglas:
+            m = libre & r.mascara(columnas, n)
+            regla[m] = r.nombre
+            estrategia[m] = r.estrategia
+            libre &= ~m
+
+        anomalia = np.full(n, None, dtype=object)
+        anomalo = np.zeros(n, dtype=bool)
+        if self.validar_numericos:
+            for c in CAMPOS_NUMERICOS:
+                if c in columnas:
+                    anomalo |= np.isnan(columnas[c])
+                    if c != "descuento_pct":
+                        anomalo |= columnas[c] < 0
+            anomalia[anomalo] = "valores_invalidos"
+        for a in self.anomalias:
+            m = ~anomalo & a.mascara(columnas, n)
+            anomalia[m] = a.nombre
+            anomalo |= m
+
+        escalar = libre | anomalo
+        estrategia[escalar] = None
+
+        self.sellers += n
+        self.escalados += int(escalar.sum())
+        self.por_regla.update(regla[~escalar].tolist())
+        self.por_anomalia.update(anomalia[anomalo].tolist())
+        return pd.DataFrame({"regla": regla, "estrategia": estrategia, "anomalia": anomalia, "escalar": escalar})
+
+    def resumen(self) -> dict:
+        """Tasa de acierto de la vía rápida y llamadas LLM evitadas frente a cot_chain por seller."""
+        rapidos = self.sellers - self.escalados
+        return {
+            "sellers": self.sellers,
+            "via_rapida": rapidos,
+            "escalados": self.escalados,
+            "tasa_acierto": rapidos / self.sellers if self.sellers else 0.0,
+            "llamadas_evitadas": rapidos * LLAMADAS_POR_SELLER,
+            "por_regla": dict(self.por_regla),
+            "por_anomalia": dict(self.por_anomalia),
+        }
+
+
+class RecomendadorReglas:
+    """
+    Vía rápida por reglas; solo los sellers escalados llegan al LLM.
+
+    Args:
+        escalar_a: CacheArquetipos (o cualquier objeto con recomendar(DataFrame)) o una
+            cadena con invoke(payload) que devuelva temporada y estrategia (p. ej. cot_chain)
+        motor: MotorReglas (por defecto reglas del README)
+        max_workers: Llamadas concurrentes cuando `escalar_a` es una cadena
+    """
+
+    def __init__(self, escalar_a, motor: MotorReglas = None, max_workers: int = 8):
+        self.escalar_a = escalar_a
+        self.motor = motor or MotorReglas()
+        self.max_workers = max_workers
+
+    def _escalar(self, df: pd.DataFrame) -> pd.DataFrame:
+        if hasattr(self.escalar_a, "recomendar"):
+            return self.escalar_a.recomendar(df)[["temporada", "estrategia"]]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as ex:
+            salidas = list(ex.map(self.escalar_a.invoke, df.to_dict("records")))
+        return pd.DataFrame({"temporada": [s["temporada"] for s in salidas],
+                             "estrategia": [s["estrategia"] for s in salidas]})
+
+    def recomendar(self, payloads) -> pd.DataFrame:
+        """
+        Returns:
+            DataFrame alineado con la entrada con temporada (None en la vía rápida),
+            estrategia, fuente ("regla" / "llm"), regla y anomalia
+        """
+        df = pd.DataFrame(payloads).reset_index(drop=True)
+        evaluacion = self.motor.evaluar(df)
+        salida = pd.DataFrame({
+            "temporada": np.full(len(df), None, dtype=object),
+            "estrategia": evaluacion["estrategia"].to_numpy(),
+            "fuente": np.where(evaluacion["escalar"], "llm", "regla"),
+            "regla": evaluacion["regla"].where(~evaluacion["escalar"], None),
+            "anomalia": evaluacion["anomalia"],
+        })
+        escalados = np.flatnonzero(evaluacion["escalar"].to_numpy())
+        if len(escalados):
+            respuesta = self._escalar(df.iloc[escalados].reset_index(drop=True))
+            salida.loc[escalados, "temporada"] = respuesta["temporada"].to_numpy()
+            salida.loc[escalados, "estrategia"] = respuesta["estrategia"].to_numpy()
+        return salida
+
+    def resumen(self) -> dict:
+        return self.motor.resumen()
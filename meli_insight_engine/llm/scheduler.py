@@ -0,0 +1,333 @@
+# meli_insight_engine/llm/scheduler.py
+
+"""
+Planificador de llamadas LLM por prioridad de segmento y plazo.
+
+Cada cluster_name (CLUSTER_NAME) pertenece a una ClasePrioridad con un peso y
+un plazo relativo: las recomendaciones de Power Sellers tienen que estar antes
+del push de la mañana, las de Sellers Ocasionales pueden esperar.
+
+Política de ColaPlanificada (elige la próxima llamada al momento de enviarla):
+
+1. Urgencia: si el plazo más próximo de alguna clase vence dentro de
+   `margen_urgencia` segundos (y todavía es alcanzable), se atiende esa clase.
+2. Weighted fair queuing: si no hay urgencias, la clase con menor tiempo
+   virtual (tokens de prompt servidos / peso). Una clase con peso 8 recibe
+   ~8 veces el servicio de una con peso 1 mientras ambas tengan pendientes, y
+   ninguna se queda sin servicio.
+3. Dentro de la clase, el prompt más corto primero (SJF por tokens estimados).
+
+Un LimitadorTasa (token bucket) aplica el límite global de solicitudes por
+segundo del proveedor. PlanificadorLLM ejecuta la política con hilos reales y
+simular() la reproduce sobre un reloj virtual con FakeChatModel(dormir=False),
+para comparar pesos, plazos y políticas offline en milisegundos. Ambos
+reportan esperas en cola e incumplimientos de plazo por clase.
+"""
+import heapq
+import threading
+import time
+from collections import deque
+from itertools import count
+
+import numpy as np
+import pandas as pd
+
+from .fake_model import estimar_tokens
+from .nightly import generador_llm
+from .prompts.templates import strategy_prompt
+
+POLITICAS = ("wfq", "fifo")
+MARGEN_URGENCIA = 60.0
+
+
+class ClasePrioridad:
+    """
+    Args:
+        nombre: Nombre de la clase (el cluster_name)
+        peso: Peso en el weighted fair queuing
+        plazo_segundos: Plazo desde que la solicitud entra a la cola
+    """
+
+    def __init__(self, nombre: str, peso: float, plazo_segundos: float):
+        if peso <= 0:
+            raise ValueError(f"El peso de {nombre} debe ser positivo")
+        self.nombre = nombre
+        self.peso = peso
+        self.plazo_segundos = plazo_segundos
+
+    def __repr__(self):
+        return f"ClasePrioridad({self.nombre!r}, peso={self.peso}, plazo_segundos={self.plazo_segundos})"
+
+
+# Una clase por cluster_name de core.cluster_udf.CLUSTER_NAME: (peso, plazo en horas).
+# Lo que no es un segmento conocido (p. ej. "Desconocido") va a la clase por defecto.
+_PRIORIDAD_SEGMENTO = {
+    "Power Sellers": (8, 2),
+    "Sellers en Crecimiento": (4, 4),
+    "Cazadores de Oferta": (2, 6),
+    "Liquidadores / Outlet": (2, 6),
+    "Sellers Ocasionales": (1, 12),
+    "Desconocido": (1, 12),
+}
+CLASES_POR_DEFECTO = {nombre: ClasePrioridad(nombre, peso, horas * 3600)
+                      for nombre, (peso, horas) in _PRIORIDAD_SEGMENTO.items()}
+
+
+def tokens_prompt(payload: dict) -> int:
+    """Tokens estimados del prompt de estrategia (la temporada se comparte por fecha)."""
+    campos = {k: payload.get(k, "") for k in strategy_prompt.input_variables if k != "temporada"}
+    return estimar_tokens(strategy_prompt.format(**campos, temporada=""))
+
+
+class LimitadorTasa:
+    """
+    Token bucket con reloj explícito: reservar(ahora) devuelve el instante en que
+    la solicitud puede enviarse. Sirve igual con time.monotonic() o con un reloj virtual.
+
+    Args:
+        por_segundo: Solicitudes por segundo sostenidas
+        rafaga: Solicitudes que se pueden enviar de golpe
+    """
+
+    def __init__(self, por_segundo: float, rafaga: int = 1):
+        self.por_segundo = por_segundo
+        self.rafaga = rafaga
+        self._tokens = float(rafaga)
+        self._t = None
+        self._lock = threading.Lock()
+
+    def reservar(self, ahora: float) -> float:
+        with self._lock:
+            if self._t is not None:
+                self._tokens = min(self.rafaga, self._tokens + (ahora - self._t) * self.por_segundo)
+            self._t = ahora
+            self._tokens -= 1
+            # Tokens negativos = deuda: se envía cuando se repone
+            return ahora if self._tokens >= 0 else ahora - self._tokens / self.por_segundo
+
+
+class ColaPlanificada:
+    """
+    Cola con la política urgencia -> WFQ entre clases -> SJF dentro de la clase.
+
+    Args:
+        clases: Dict cluster_name -> ClasePrioridad (por defecto CLASES_POR_DEFECTO)
+        politica: "wfq" o "fifo" (orden de llegada, como referencia)
+        margen_urgencia: Segundos antes del plazo en que una clase pasa adelante
+        clase_por_defecto: Clase para cluster_name desconocidos
+    """
+
+    def __init__(self, clases: dict = None, politica: str = "wfq", margen_urgencia: float = MARGEN_URGENCIA,
+                 clase_por_defecto: str = "Desconocido"):
+        if politica not in POLITICAS:
+            raise ValueError(f"Política desconocida: {politica} (opciones: {POLITICAS})")
+        self.clases = CLASES_POR_DEFECTO if clases is None else clases
+        self.politica = politica
+        self.margen_urgencia = margen_urgencia
+        self.clase_por_defecto = self.clases.get(clase_por_defecto) or ClasePrioridad(clase_por_defecto, 1, 12 * 3600)
+        self._seq = count()
+        self._fifo = deque()
+        self._sjf = {}      # clase -> heap (costo, seq, item)
+        self._edf = {}      # clase -> heap (plazo, seq, item)
+        self._virtual = {}  # clase -> tokens servidos / peso
+        self._servidos = set()
+        self._pendientes = 0
+        self.urgentes = 0
+
+    def __len__(self):
+        return self._pendientes
+
+    def clase(self, payload: dict) -> ClasePrioridad:
+        return self.clases.get(payload.get("cluster_name"), self.clase_por_defecto)
+
+    def encolar(self, payload: dict, ahora: float, costo: int = None) -> dict:
+        clase = self.clase(payload)
+        item = {"payload": payload, "clase": clase.nombre, "costo": tokens_prompt(payload) if costo is None else costo,
+                "encolado": ahora, "plazo": ahora + clase.plazo_segundos, "seq": next(self._seq)}
+        self._pendientes += 1
+        if self.politica == "fifo":
+            self._fifo.append(item)
+            return item
+        c = clase.nombre
+        if not self._tope(self._sjf.get(c, [])):
+            # Una clase que vuelve a tener pendientes no arrastra crédito de cuando estaba vacía
+            activas = [self._virtual[k] for k, h in self._sjf.items() if self._tope(h)]
+            self._virtual[c] = max(self._virtual.get(c, 0.0), min(activas, default=0.0))
+        heapq.heappush(self._sjf.setdefault(c, []), (item["costo"], item["seq"], item))
+        heapq.heappush(self._edf.setdefault(c, []), (item["plazo"], item["seq"], item))
+        return item
+
+    def _tope(self, heap):
+        while heap and heap[0][1] in self._servidos:
+            heapq.heappop(heap)
+        return heap[0] if heap else None
+
+    def siguiente(self, ahora: float):
+        """Próxima solicitud a enviar en `ahora` (None si la cola está vacía)."""
+        if not self._pendientes:
+            return None
+        self._pendientes -= 1
+        if self.politica == "fifo":
+            return self._fifo.popleft()
+
+        urgente = None
+        for c, heap in self._edf.items():
+            tope = self._tope(heap)
+            # Solo plazos todavía alcanzables: los ya vencidos vuelven a competir por peso
+            if tope and ahora <= tope[0] <= ahora + self.margen_urgencia and (urgente is None or tope[0] < urgente[0]):
+                urgente = (tope[0], c)
+        if urgente is not None:
+            c = urgente[1]
+            _, seq, item = heapq.heappop(self._edf[c])
+            self.urgentes += 1
+        else:
+            c = min((k for k, h in self._sjf.items() if self._tope(h)), key=lambda k: self._virtual[k])
+            _, seq, item = heapq.heappop(self._sjf[c])
+        self._servidos.add(seq)
+        self._virtual[c] += item["costo"] / self.clases.get(c, self.clase_por_defecto).peso
+        return item
+
+
+def _fila(item: dict, envio: float, fin: float, t0: float, respuesta: dict = None, error: str = None) -> dict:
+    payload = item["payload"]
+    return {"seller_nickname": payload.get("seller_nickname"), "cluster_name": payload.get("cluster_name"),
+            "clase": item["clase"], "tokens_prompt": item["costo"],
+            "temporada": (respuesta or {}).get("temporada"), "estrategia": (respuesta or {}).get("estrategia"),
+            "error": error, "espera_s": envio - item["encolado"], "fin_s": fin - t0,
+            "plazo_s": item["plazo"] - t0, "tarde": fin > item["plazo"]}
+
+
+def reporte_por_clase(filas: pd.DataFrame, clases: dict = None) -> pd.DataFrame:
+    """Sellers, espera media / p95 en cola, último fin e incumplimientos de plazo por clase."""
+    clases = CLASES_POR_DEFECTO if clases is None else clases
+    if filas.empty:
+        return pd.DataFrame()
+    reporte = filas.groupby("clase").agg(
+        sellers=("clase", "size"), espera_media_s=("espera_s", "mean"),
+        espera_p95_s=("espera_s", lambda s: float(np.percentile(s, 95))), fin_max_s=("fin_s", "max"),
+        plazos_incumplidos=("tarde", "sum"), errores=("error", lambda s: int(s.notna().sum())))
+    reporte["tasa_incumplimiento"] = reporte["plazos_incumplidos"] / reporte["sellers"]
+    reporte.insert(0, "peso", [getattr(clases.get(c), "peso", np.nan) for c in reporte.index])
+    return reporte.sort_values("peso", ascending=False)
+
+
+def _imprimir(titulo: str, reporte: pd.DataFrame, segundos: float):
+    print(f"🚦 {titulo}: {int(reporte['sellers'].sum()):,} sellers en {segundos:.2f}s | "
+          f"plazos incumplidos {int(reporte['plazos_incumplidos'].sum()):,}")
+    for clase, r in reporte.iterrows():
+        print(f"   • {clase} (peso {r['peso']:g}): espera media {r['espera_media_s']:.2f}s, "
+              f"p95 {r['espera_p95_s']:.2f}s, fuera de plazo {int(r['plazos_incumplidos'])}/{int(r['sellers'])}")
+
+
+class PlanificadorLLM:
+    """
+    Envía las solicitudes al modelo en el orden de ColaPlanificada, con N workers y
+    límite global de tasa.
+
+    Args:
+        generador: Callable payload -> {"temporada", "estrategia"} (p. ej. generador_llm(llm))
+        clases: Dict cluster_name -> ClasePrioridad
+        workers: Llamadas concurrentes
+        tasa_por_segundo: Límite global de solicitudes por segundo (None = sin límite)
+        rafaga: Ráfaga del token bucket
+        politica: "wfq" o "fifo"
+        margen_urgencia: Ver ColaPlanificada
+    """
+
+    def __init__(self, generador, clases: dict = None, workers: int = 8, tasa_por_segundo: float = None,
+                 rafaga: int = 1, politica: str = "wfq", margen_urgencia: float = MARGEN_URGENCIA):
+        self.generador = generador
+        self.clases = CLASES_POR_DEFECTO if clases is None else clases
+        self.workers = workers
+        self.tasa_por_segundo = tasa_por_segundo
+        self.rafaga = rafaga
+        self.politica = politica
+        self.margen_urgencia = margen_urgencia
+
+    def ejecutar(self, payloads, verbose: bool = True) -> dict:
+        """
+        Returns:
+            Dict con resultados (DataFrame por seller: estrategia, espera_s, fin_s, plazo_s,
+            tarde, error), reporte (DataFrame por clase), urgentes y segundos
+        """
+        cola = ColaPlanificada(self.clases, self.politica, self.margen_urgencia)
+        limitador = LimitadorTasa(self.tasa_por_segundo, self.rafaga) if self.tasa_por_segundo else None
+        lock = threading.Lock()
+        filas = []
+        t0 = time.monotonic()
+        for payload in pd.DataFrame(payloads).to_dict("records"):
+            cola.encolar(payload, t0)
+
+        def worker():
+            while True:
+                with lock:
+                    if not len(cola):
+                        return
+                envio = limitador.reservar(time.monotonic()) if limitador else time.monotonic()
+                time.sleep(max(0.0, envio - time.monotonic()))
+                # La elección se hace al momento de enviar, con los plazos de ese instante
+                with lock:
+                    item = cola.siguiente(time.monotonic())
+                if item is None:
+                    return
+                envio = time.monotonic()
+                respuesta = error = None
+                try:
+                    respuesta = self.generador(item["payload"])
+                except Exception as e:  # noqa: BLE001 (el error queda en la fila del seller)
+                    error = f"{type(e).__name__}: {e}"
+                fila = _fila(item, envio, time.monotonic(), t0, respuesta, error)
+                with lock:
+                    filas.append(fila)
+
+        hilos = [threading.Thread(target=worker, name=f"planificador-{i}") for i in range(self.workers)]
+        for h in hilos:
+            h.start()
+        for h in hilos:
+            h.join()
+
+        resultados = pd.DataFrame(filas)
+        resumen = {"resultados": resultados, "reporte": reporte_por_clase(resultados, self.clases),
+                   "urgentes": cola.urgentes, "segundos": time.monotonic() - t0}
+        if verbose and len(resultados):
+            _imprimir(f"Planificador {self.politica}", resumen["reporte"], resumen["segundos"])
+        return resumen
+
+
+def simular(payloads, llm, clases: dict = None, workers: int = 8, tasa_por_segundo: float = None,
+            rafaga: int = 1, politica: str = "wfq", margen_urgencia: float = MARGEN_URGENCIA,
+            verbose: bool = True) -> dict:
+    """
+    Simulación de eventos discretos de PlanificadorLLM sobre un reloj virtual.
+
+    Las duraciones salen de las latencias que reporta `llm` (un FakeChatModel con
+    dormir=False y la distribución de latencia a simular), así que miles de sellers
+    se simulan sin esperar. Misma salida que PlanificadorLLM.ejecutar.
+    """
+    if getattr(llm, "dormir", False):
+        raise ValueError("simular() necesita un FakeChatModel con dormir=False")
+    clases = CLASES_POR_DEFECTO if clases is None else clases
+    generar = generador_llm(llm)
+    cola = ColaPlanificada(clases, politica, margen_urgencia)
+    limitador = LimitadorTasa(tasa_por_segundo, rafaga) if tasa_por_segundo else None
+    for payload in pd.DataFrame(payloads).to_dict("records"):
+        cola.encolar(payload, 0.0)
+
+    libres = [0.0] * workers
+    filas = []
+    while len(cola):
+        ahora = heapq.heappop(libres)
+        envio = limitador.reservar(ahora) if limitador else ahora
+        item = cola.siguiente(envio)
+        llamadas = len(llm.llamadas)
+        respuesta = generar(item["payload"])
+        fin = envio + sum(c["latencia_s"] for c in llm.llamadas[llamadas:])
+        filas.append(_fila(item, envio, fin, 0.0, respuesta=respuesta))
+        heapq.heappush(libres, fin)
+
+    resultados = pd.DataFrame(filas)
+    resumen = {"resultados": resultados, "reporte": reporte_por_clase(resultados, clases),
+               "urgentes": cola.urgentes, "segundos": float(resultados["fin_s"].max()) if len(resultados) else 0.0}
+    if verbose and len(resultados):
+        _imprimir(f"Simulación {politica}", resumen["reporte"], resumen["segundos"])
+    return resumen
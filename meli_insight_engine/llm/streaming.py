@@ -0,0 +1,91 @@
+# meli_insight_engine/llm/streaming.py
+
+"""
+Versión en streaming de cot_chain.
+
+transmitir_recomendacion() produce eventos a medida que llegan:
+- {"tipo": "temporada", "texto", "t_s"}      en cuanto se conoce la temporada
+- {"tipo": "token", "texto", "t_s"}          por cada fragmento de la estrategia
+- {"tipo": "fin", "temporada", "estrategia", "ttft_s", "latencia_s", "tokens"}
+
+El mismo generador alimenta el CLI (imprimir_stream) y un endpoint SSE o
+chunked (transmitir_sse).
+"""
+import json
+import sys
+import time
+
+from .prompts.templates import season_prompt, strategy_prompt
+
+
+def _texto(chunk) -> str:
+    return chunk.content if hasattr(chunk, "content") else str(chunk)
+
+
+def transmitir_recomendacion(payload: dict, llm=None):
+    """
+    Args:
+        payload: INPUT_VARIABLES de cot_chain
+        llm: Modelo con .invoke/.stream (por defecto el ChatOpenAI compartido de rasoner_meli)
+
+    Yields:
+        Eventos dict (ver docstring del módulo); t_s es relativo al inicio
+    """
+    if llm is None:
+        from .agents.rasoner_meli import llm
+
+    inicio = time.perf_counter()
+    temporada = _texto(llm.invoke(season_prompt.format(fecha_actual=payload["fecha_actual"]))).strip()
+    yield {"tipo": "temporada", "texto": temporada, "t_s": time.perf_counter() - inicio}
+
+    inicio_estrategia = time.perf_counter()
+    ttft = None
+    partes = []
+    for chunk in llm.stream(strategy_prompt.format(**{**payload, "temporada": temporada})):
+        texto = _texto(chunk)
+        if not texto:
+            continue
+        ahora = time.perf_counter()
+        if ttft is None:
+            ttft = ahora - inicio_estrategia
+        partes.append(texto)
+        yield {"tipo": "token", "texto": texto, "t_s": ahora - inicio}
+
+    yield {
+        "tipo": "fin",
+        "temporada": temporada,
+        "estrategia": "".join(partes),
+        "ttft_s": ttft,
+        "latencia_s": time.perf_counter() - inicio,
+        "tokens": len(partes),
+    }
+
+
+def formatear_sse(evento: dict) -> str:
+    """Serializa un evento como mensaje Server-Sent Events."""
+    datos = json.dumps(evento, ensure_ascii=False)
+    return f"event: {evento['tipo']}\ndata: {datos}\n\n"
+
+
+def transmitir_sse(payload: dict, llm=None):
+    """Generador de mensajes SSE (p. ej. para StreamingResponse de FastAPI o Flask)."""
+    for evento in transmitir_recomendacion(payload, llm):
+        yield formatear_sse(evento)
+
+
+def imprimir_stream(payload: dict, llm=None, salida=None) -> dict:
+    """Imprime temporada y tokens al llegar; devuelve el evento final."""
+    salida = salida or sys.stdout
+    final = {}
+    for evento in transmitir_recomendacion(payload, llm):
+        if evento["tipo"] == "temporada":
+            print("Contexto de temporada detectado:", evento["texto"], file=salida)
+            print("\nRecomendación personalizada:\n", file=salida, flush=True)
+        elif evento["tipo"] == "token":
+            print(evento["texto"], end="", file=salida, flush=True)
+        else:
+            final = evento
+            ttft = f"{final['ttft_s'] * 1000:.0f} ms" if final["ttft_s"] is not None else "n/d"
+            print(f"\n\n⏱️  Primer token: {ttft} | Latencia total: {final['latencia_s']:.2f} s "
+                  f"| {final['tokens']} fragmentos", file=salida)
+    return final
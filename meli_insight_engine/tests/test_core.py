@@ -2,6 +2,8 @@ from core import conectar_duckdb
 import duckdb
 import os
 import pytest
+import itertools
+import sys
 
 def test_conexion():
     con = conectar_duckdb()
@@ -18,4 +20,540 @@ def test_registro_vistas(tmp_path):
     
     vistas = con.execute("SHOW TABLES").fetchall()
     assert any('data.test' in v[0] for v in vistas)
-    con.close()
\ No newline at end of file
+    con.close()
+
+@pytest.fixture
+def con_listings():
+    """Conexión con una vista sintética con el esquema del export de publicaciones."""
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(0)
+    n = 600
+    df = pd.DataFrame({
+        "tim_day": pd.Timestamp("2024-08-01"),
+        "seller_nickname": rng.choice([f"s{i}" for i in range(30)], n),
+        "titulo": [f"Producto {i % 200}" for i in range(n)],
+        "seller_reputation": rng.choice(["green", "green_gold", "newbie", None], n),
+        "stock": rng.integers(0, 100, n),
+        "condition": rng.choice(["new", "used"], n),
+        "is_refurbished": rng.random(n) < 0.1,
+        "price": rng.lognormal(10, 1, n),
+        "regular_price": np.where(rng.random(n) < 0.3, rng.lognormal(10, 1, n), np.nan),
+        "category_id": rng.choice(["MCO1", "MCO2", "MCO3"], n),
+    })
+    con = conectar_duckdb()
+    con.register("listings_df", df)
+    con.execute('CREATE VIEW "data.listings" AS SELECT * FROM listings_df')
+    yield con
+    con.close()
+
+
+def test_histograma_duckdb_solo_bins(con_listings):
+    from core.plotting import histograma_duckdb
+
+    hist = histograma_duckdb(con_listings, "data.listings", "price", bins=20, log=True)
+    assert len(hist) == 20
+    assert hist["frecuencia"].sum() == 600
+
+
+def test_visualizar_todo_reutiliza_resultados_y_genera_png(con_listings, tmp_path, monkeypatch):
+    from core import inspector
+
+    resultados = inspector.analisis_inicial_completo(con_listings, "data.listings")
+    monkeypatch.setattr(inspector, "analisis_inicial_completo",
+                        lambda *a, **k: pytest.fail("no debe recalcular"))
+
+    rutas = inspector.visualizar_todo(con_listings, "data.listings", resultados=resultados,
+                                      directorio_salida=str(tmp_path), max_workers=2)
+    assert "hexbin_precio_stock" in rutas
+    assert all(os.path.getsize(r) > 0 for r in rutas.values())
+
+
+def test_inspector_ruta_arrow_categoricas_y_correlacion_en_sql(con_listings):
+    import numpy as np
+    from core import inspector
+
+    df = con_listings.execute('SELECT * FROM "data.listings"').fetchdf()
+    corr = inspector.correlaciones_numericas(con_listings, "data.listings")
+    esperado = df.select_dtypes("number").corr().round(2)
+    np.testing.assert_allclose(corr.loc[esperado.index, esperado.columns], esperado, atol=0.011)
+
+    # Filtro sin filas: p75 y media son NULL y las métricas salen vacías en vez de fallar
+    vacio = inspector.analisis_inicial_completo(con_listings, "data.listings", filtro="category_id = 'Z'")
+    assert vacio["proporcion_premium"].empty and vacio["proporcion_precios_bajos"].empty
+
+    ratio = inspector.ratio_nuevos_vs_reacondicionados(con_listings, "data.listings")
+    assert ratio["nuevos"].dtype == np.float64  # HUGEINT de SUM sigue llegando como float
+
+    resumen = inspector.resumen_columnas(con_listings, "data.listings")
+    assert resumen.set_index("columna").loc["condition", "unicos"] == 2
+    filas = inspector._consulta_df(con_listings, 'SELECT seller_nickname, condition FROM "data.listings"')
+    assert filas["condition"].dtype == "category" and filas["seller_nickname"].dtype == "category"
+
+
+def test_catalogo_cachea_metadatos_e_invalida_por_mtime(tmp_path):
+    from core import inspector
+    from core.loader import registrar_csvs_como_vistas
+
+    csv = tmp_path / "listings.csv"
+    csv.write_text("seller_nickname,titulo,price\n" + "".join(f"s{i % 3},t{i},{i}.5\n" for i in range(50)))
+    con = conectar_duckdb()
+    cat = registrar_csvs_como_vistas(con, str(tmp_path))
+
+    inspector.resumen_columnas(con, "data.listings")
+    for funcion in (inspector.dimensiones_tabla, inspector.info_tabla, inspector.tipos_datos,
+                    inspector.estadisticos_numericos, inspector.skew_categorico,
+                    inspector.columnas_fecha_invalida, inspector.correlaciones_numericas):
+        funcion(con, "data.listings")
+    assert cat.consultas == 1  # un solo DESCRIBE; el conteo lo aporta resumen_columnas
+    assert inspector.dimensiones_tabla(con, "data.listings")["filas"][0] == 50
+    assert inspector.dimensiones_tabla(con, "data.listings", filtro="price < 10")["filas"][0] == 10
+    assert cat.roles("data.listings") == {"seller_nickname": "categorica", "titulo": "texto",
+                                          "price": "numerica"}
+
+    with open(csv, "a") as f:
+        f.write("s9,nuevo,1.0\n")
+    os.utime(csv, ns=(os.stat(csv).st_atime_ns, os.stat(csv).st_mtime_ns + 10**9))
+    assert inspector.dimensiones_tabla(con, "data.listings")["filas"][0] == 51
+    assert cat.estadisticas_archivos("data.listings")["bytes"][0] == os.path.getsize(csv)
+
+    # Vistas creadas fuera del loader: sin caché, un CREATE OR REPLACE se ve enseguida
+    con.execute("CREATE VIEW v AS SELECT 1 a, 2 b")
+    assert inspector.dimensiones_tabla(con, "v")["columnas"][0] == 2
+    con.execute("CREATE OR REPLACE VIEW v AS SELECT 1 a")
+    assert inspector.dimensiones_tabla(con, "v")["columnas"][0] == 1
+    assert list(inspector.resumen_columnas(con, "v")["columna"]) == ["a"]
+    assert "v" not in set(cat.resumen()["vista"])
+    con.close()
+
+
+def test_ingestar_en_parquet_comprimido_y_multiparte(tmp_path):
+    import gzip
+    import json
+    from core.loader import ingestar_en_parquet
+
+    esquema = {"seller_nickname": "VARCHAR", "price": "DOUBLE", "stock": "BIGINT", "tim_day": "DATE"}
+    with gzip.open(tmp_path / "parte_1.csv.gz", "wt", encoding="utf-8") as f:
+        f.write("seller_nickname,price,stock,tim_day\n"
+                "a,10.5,3,2024-08-01\n"
+                "b,no_es_numero,1,2024-08-01\n"
+                ",5,1,2024-08-01\n")
+    with gzip.open(tmp_path / "parte_2.csv.gz", "wt", encoding="utf-8") as f:
+        f.write("seller_nickname,price,stock,tim_day\n"
+                "c,7,2,2024-13-45\n"
+                "d,8,,2024-08-02\n")
+
+    resumen = ingestar_en_parquet(conectar_duckdb(), str(tmp_path / "parte_*.csv.gz"),
+                                  str(tmp_path / "lake"), esquema=esquema, tamano_lote=2, verbose=False)
+    assert resumen["filas_leidas"] == 5
+    assert resumen["filas_validas"] == 2
+    assert resumen["rechazos_por_columna"] == {"price": 1, "stock": 0, "tim_day": 1, "seller_nickname": 1}
+
+    with gzip.open(tmp_path / "extra.jsonl.gz", "wt", encoding="utf-8") as f:
+        f.write(json.dumps({"seller_nickname": "e", "price": 1, "stock": 2, "tim_day": "2024-08-03"}) + "\n")
+    ingestar_en_parquet(conectar_duckdb(), str(tmp_path / "extra.jsonl.gz"), str(tmp_path / "lake"),
+                        esquema=esquema, verbose=False)
+
+    con = conectar_duckdb()
+    filas = con.execute(f"SELECT seller_nickname FROM read_parquet('{tmp_path}/lake/*.parquet') ORDER BY 1").fetchall()
+    assert [f[0] for f in filas] == ["a", "d", "e"]
+
+
+def test_listings_particionados_con_poda_por_categoria(tmp_path):
+    from core import (ingestar_listings_particionados, registrar_csvs_como_vistas,
+                      indice_variedad)
+
+    esquema = {"seller_nickname": "VARCHAR", "titulo": "VARCHAR", "price": "DOUBLE", "category_id": "VARCHAR"}
+    (tmp_path / "export.csv").write_text(
+        "seller_nickname,titulo,price,category_id\n"
+        "a,t1,10,MCO1\n"
+        "a,t2,20,MCO2\n"
+        "b,t3,30,MCO1\n")
+    con = conectar_duckdb()
+    ingestar_listings_particionados(con, str(tmp_path / "export.csv"), str(tmp_path / "lake" / "listings"),
+                                    fecha_ingesta="2024-08-01", esquema=esquema, verbose=False)
+    assert (tmp_path / "lake" / "listings" / "fecha_ingesta=2024-08-01" / "category_id=MCO2").is_dir()
+
+    registrar_csvs_como_vistas(con, str(tmp_path / "lake"))
+    plan = con.execute("""EXPLAIN ANALYZE SELECT COUNT(*) FROM "data.listings"
+                          WHERE category_id = 'MCO2'""").fetchall()[0][1]
+    assert "Scanning Files: 1/2" in plan
+
+    metricas = indice_variedad(con, "data.listings", filtro="category_id = 'MCO1'")
+    assert sorted(metricas["seller_nickname"]) == ["a", "b"]
+    assert metricas["total_publicaciones"].sum() == 2
+
+
+def test_features_listing_numpy_y_sql_coinciden(con_listings):
+    import numpy as np
+    from core.features import (calcular_features_listing, sql_features_listing, features_seller, FEATURES,
+                               SQL_TITLE_LEN)
+
+    tabla = con_listings.execute('SELECT * FROM "data.listings"').arrow()
+    arrow = calcular_features_listing(tabla).to_pandas()
+    sql = con_listings.execute(sql_features_listing("data.listings")).fetchdf()
+    for col in ["discount_pct", "title_len", "rep_score"]:
+        assert np.allclose(arrow[col], sql[col], equal_nan=True)
+
+    # Título nulo: 3, igual que len("nan") en el notebook 01
+    import pandas as pd
+    from core.features import largo_titulo
+    titulos = pd.Series(["abc de", np.nan])
+    assert largo_titulo(titulos).tolist() == titulos.astype(str).str.len().tolist() == [6, 3]
+    con_listings.register("titulos", pd.DataFrame({"titulo": titulos}))
+    sql_nulo = con_listings.execute(f"SELECT {SQL_TITLE_LEN} FROM titulos").fetchall()
+    assert [fila[0] for fila in sql_nulo] == [6, 3]
+
+    rep_map = {"green": 3, "green_gold": 4, "newbie": 0}
+    esperado = arrow["seller_reputation"].map(rep_map).fillna(0)
+    assert np.allclose(arrow["rep_score"], esperado)
+
+    por_seller = features_seller(con_listings, "data.listings")
+    assert list(por_seller.columns[1:10]) == FEATURES
+    assert por_seller["num_publicaciones"].sum() == 600
+
+
+def test_reclasificacion_incremental_omite_sellers_estables():
+    import numpy as np
+    import pandas as pd
+    from core.features import FEATURES
+    from core.segmentation import ReclasificadorIncremental, cargar_modelos, reporte_reclasificacion
+
+    pre_pipe, kmeans = cargar_modelos(os.path.join(os.path.dirname(__file__), "..", "..", "models"))
+    rng = np.random.default_rng(1)
+    features = pd.DataFrame(pre_pipe.named_steps["scaler"].inverse_transform(kmeans.cluster_centers_[rng.integers(0, 5, 40)]
+                                                        + rng.normal(0, 0.05, (40, 9))), columns=FEATURES)
+    features.insert(0, "seller_nickname", [f"s{i}" for i in range(40)])
+
+    con = conectar_duckdb()
+    rec = ReclasificadorIncremental(con, pre_pipe, kmeans, tolerancia=0.1)
+    primera = rec.evaluar(features)
+    assert (primera["motivo"] == "nuevo").all()
+    assert (primera["cluster"] == kmeans.predict(pre_pipe.transform(features[FEATURES]))).all()
+    rec.actualizar(primera, {s: f"rec {s}" for s in primera["seller_nickname"]})
+
+    # s0 no cambia, s1 se mueve un poco, s2 salta al centroide de otro cluster
+    nuevo = features.copy()
+    nuevo.loc[1, "rep_score"] += 0.01
+    otro = (primera.loc[2, "cluster"] + 1) % 5
+    nuevo.loc[2, FEATURES] = pre_pipe.named_steps["scaler"].inverse_transform(kmeans.cluster_centers_[[otro]])[0]
+    segunda = rec.evaluar(nuevo).set_index("seller_nickname")
+
+    assert segunda.loc["s0", "motivo"] == "sin_cambios"
+    assert segunda.loc["s1", "motivo"] == "estable"
+    assert segunda.loc["s1", "recomendacion"] == "rec s1"
+    assert segunda.loc["s2", "motivo"] == "cambio_cluster"
+    reporte = reporte_reclasificacion(segunda)
+    assert reporte["clasificados"] == 1 and reporte["llm_regenerados"] == 1
+
+    # Si el generador omite a un seller, la próxima corrida lo vuelve a pedir
+    rec.actualizar(segunda.reset_index(), {})
+    assert rec.evaluar(nuevo).set_index("seller_nickname").loc["s2", "requiere_llm"]
+    extra = features.head(2).assign(seller_nickname=["x0", "x1"])
+    nuevos = rec.evaluar(extra)
+    rec.actualizar(nuevos, {"x0": "rec x0"})
+    nuevos = rec.evaluar(extra).set_index("seller_nickname")
+    assert nuevos.loc["x0", "motivo"] == "sin_cambios" and not nuevos.loc["x0", "requiere_llm"]
+    assert nuevos.loc["x1", "motivo"] == "sin_recomendacion" and nuevos.loc["x1", "requiere_llm"]
+
+    # Pasos chicos junto a una frontera: cada uno dentro de la tolerancia, pero el desvío
+    # se mide contra el vector de la última recomendación y termina regenerándola
+    from core.segmentation import margen_frontera
+    c = kmeans.cluster_centers_
+    for i, j in itertools.permutations(range(len(c)), 2):
+        u = (c[j] - c[i]) / np.linalg.norm(c[j] - c[i])
+        p = (c[i] + c[j]) / 2 - 0.02 * u
+        cluster_p, margen_p = margen_frontera(p[None, :], c)
+        if cluster_p[0] == i and margen_p[0] < 0.06:
+            break
+    v = rng.standard_normal(9)
+    v -= (v @ u) * u
+    v /= np.linalg.norm(v)
+    escalar = lambda x: pd.DataFrame(pre_pipe.named_steps["scaler"].inverse_transform(x[None, :]),  # noqa: E731
+                                     columns=FEATURES).assign(seller_nickname="borde")
+    rec.actualizar(rec.evaluar(escalar(p)), {"borde": "rec inicial"})
+    motivos = []
+    for paso in (1, 2):
+        d = rec.evaluar(escalar(p + 0.06 * paso * v))
+        motivos.append(d.loc[0, "motivo"])
+        rec.actualizar(d, {"borde": f"rec {paso}"} if d.loc[0, "requiere_llm"] else None)
+    assert motivos == ["reclasificado_estable", "cambio_mismo_cluster"]
+    con.close()
+
+
+def test_indice_similitud_vecinos_en_lote_y_persistencia(tmp_path):
+    import numpy as np
+    from core.similarity import IndiceSimilitud
+
+    rng = np.random.default_rng(2)
+    X = rng.standard_normal((500, 9))
+    ids = [f"s{i}" for i in range(500)]
+    indice = IndiceSimilitud(ids, X)
+
+    vecinos = indice.vecinos(["s0", "s1"], k=5)
+    assert len(vecinos) == 10 and "s0" not in set(vecinos.loc[vecinos["seller_nickname"] == "s0", "similar"])
+    esperado = np.argsort(((X - X[0]) ** 2).sum(axis=1))[1:6]
+    assert list(vecinos["similar"][:5]) == [ids[i] for i in esperado]
+
+    ruta = indice.guardar(str(tmp_path / "indice.joblib"))
+    assert IndiceSimilitud.cargar(ruta).vecinos("s0", k=5).equals(vecinos[:5])
+
+
+def test_udf_cluster_coincide_con_pre_pipe_y_kmeans(con_listings):
+    import numpy as np
+    import pandas as pd
+    from core.cluster_udf import cluster_stats_empiricas, clusters_seller, registrar_udf_cluster
+    from core.features import FEATURES
+    from core.segmentation import cargar_modelos
+
+    pre_pipe, kmeans = cargar_modelos(os.path.join(os.path.dirname(__file__), "..", "..", "models"))
+    registrar_udf_cluster(con_listings, pre_pipe, kmeans)
+
+    sellers = clusters_seller(con_listings, "data.listings")
+    esperado = kmeans.predict(pre_pipe.transform(sellers[FEATURES]))
+    assert (sellers["cluster"].to_numpy() == esperado).all()
+
+    stats = cluster_stats_empiricas(con_listings, "data.listings")
+    assert stats["n_sellers"].sum() == len(sellers)
+    assert {"rep_score_mean", "rep_score_median", "cluster_name"} <= set(stats.columns)
+
+    # Con pre_pipe, en la escala de df_challenge_meli_limpio (como el notebook 02)
+    escaladas = pd.DataFrame(pre_pipe.transform(sellers[FEATURES]), columns=FEATURES).assign(cluster=esperado)
+    notebook = escaladas.groupby("cluster")[FEATURES].agg(["mean", "median"]).round(2)
+    stats = cluster_stats_empiricas(con_listings, "data.listings", pre_pipe=pre_pipe).set_index("cluster")
+    for f in FEATURES:
+        np.testing.assert_allclose(stats[f"{f}_mean"], notebook[(f, "mean")], atol=0.011)
+        np.testing.assert_allclose(stats[f"{f}_median"], notebook[(f, "median")], atol=0.011)
+
+
+def test_indice_variedad_difuso_agrupa_titulos_casi_iguales():
+    import pandas as pd
+    from core.duplicates import indice_variedad_difuso
+
+    base = "Celular Samsung Galaxy A54 128GB Negro Dual Sim"
+    df = pd.DataFrame({
+        "seller_nickname": ["spam"] * 4 + ["ok"] * 3,
+        "titulo": [base, base.upper() + "!!", base + " Oferta", base,
+                   base, "Funda silicona iPhone 13 transparente", None],
+    })
+    con = conectar_duckdb()
+    con.register("titulos_df", df)
+    resultado = indice_variedad_difuso(con, "titulos_df", titulos_por_particion=4,
+                                       max_workers=2, verbose=False).set_index("seller_nickname")
+    con.close()
+
+    assert resultado.loc["spam", "titulos_distintos_difusos"] == 1
+    assert resultado.loc["spam", "publicaciones_casi_duplicadas"] == 4
+    assert resultado.loc["ok", "grupos_casi_duplicados"] == 0
+    assert resultado.loc["ok", "indice_variedad_difuso"] == 1.0
+
+    # Tildes y eñes son letras: no se reemplazan por espacios
+    from core.duplicates import normalizar_titulos
+    assert normalizar_titulos(["CÁMARA Fotográfica, niño!!"]).to_pylist() == ["cámara fotográfica niño"]
+
+
+def test_agregacion_por_shards_coincide_con_un_proceso(con_listings, tmp_path):
+    import pandas as pd
+    from core import inspector
+    from core.sharding import SketchCuantiles, agregacion_por_shards
+
+    r = agregacion_por_shards(con_listings, "data.listings", str(tmp_path), n_shards=3,
+                              max_workers=2, verbose=False)
+    p75, media = con_listings.execute(
+        'SELECT quantile_disc(price, 0.75), AVG(price) FROM "data.listings"').fetchone()
+    assert r["estadisticos"]["p75_precio"] == p75
+    assert abs(r["estadisticos"]["avg_precio"] - media) < 1e-6 * media
+
+    esperado = (inspector.proporcion_premium(con_listings, "data.listings", p75=p75)
+                .sort_values("seller_nickname").reset_index(drop=True))
+    pd.testing.assert_frame_equal(r["proporcion_premium"], esperado, check_dtype=False)
+    assert r["features"]["seller_nickname"].is_unique and len(r["features"]) == 30
+
+    # Relanzar en el mismo directorio con un filtro más estrecho no arrastra la corrida anterior
+    dos = agregacion_por_shards(con_listings, "data.listings", str(tmp_path), n_shards=3, max_workers=2,
+                                filtro="seller_nickname IN ('s0', 's1')", verbose=False)
+    assert sorted(dos["features"]["seller_nickname"]) == ["s0", "s1"]
+    p75, media = con_listings.execute("""SELECT quantile_disc(price, 0.75), AVG(price) FROM "data.listings"
+                                         WHERE seller_nickname IN ('s0', 's1')""").fetchone()
+    assert dos["estadisticos"]["p75_precio"] == p75
+    assert abs(dos["estadisticos"]["avg_precio"] - media) < 1e-6 * media
+
+    # Sketches combinables: la suma de partes da el mismo cuantil aproximado que el total
+    a = SketchCuantiles(conteos={1: 3, 5: 2}, suma=10.0)
+    b = SketchCuantiles(conteos={5: 1, 9: 4}, suma=30.0)
+    assert (a + b).n == 10 and (a + b).media() == 4.0
+    assert (a + b).ubicar(0.75) == (9, 1)
+
+
+def test_pipeline_omite_etapas_sin_cambios(tmp_path):
+    from core.pipeline import Etapa, Pipeline
+
+    fuente, a, b = tmp_path / "fuente.txt", str(tmp_path / "a.txt"), str(tmp_path / "b.txt")
+    fuente.write_text("hola")
+
+    def copiar(origen, destino, sufijo=""):
+        with open(origen) as f, open(destino, "w") as g:
+            g.write(f.read() + sufijo)
+
+    def construir(sufijo):
+        return Pipeline([
+            Etapa("a", copiar, [str(fuente)], [a], {"origen": str(fuente), "destino": a}),
+            Etapa("b", copiar, [a], [b], {"origen": a, "destino": b, "sufijo": sufijo}),
+        ], directorio_estado=str(tmp_path / "estado"))
+
+    estados = lambda r: dict(zip(r["etapa"], r["estado"]))  # noqa: E731
+    assert estados(construir("!").ejecutar(verbose=False)) == {"a": "ejecutada", "b": "ejecutada"}
+    assert estados(construir("!").ejecutar(verbose=False)) == {"a": "cache", "b": "cache"}
+    assert estados(construir("?").ejecutar(verbose=False)) == {"a": "cache", "b": "ejecutada"}
+    fuente.write_text("chau")
+    assert estados(construir("?").ejecutar(verbose=False)) == {"a": "ejecutada", "b": "ejecutada"}
+    assert open(b).read() == "chau?"
+
+    # Cambiar un módulo auxiliar que usa la etapa (no su propio código) también la invalida
+    auxiliar = tmp_path / "auxiliar_pipeline.py"
+    auxiliar.write_text("SUFIJO = '!'\n")
+    sys.path.insert(0, str(tmp_path))
+    try:
+        def con_auxiliar(origen, destino):
+            from auxiliar_pipeline import SUFIJO
+            copiar(origen, destino, SUFIJO)
+
+        def con_modulo():
+            return Pipeline([Etapa("c", con_auxiliar, [a], [str(tmp_path / "c.txt")],
+                                   {"origen": a, "destino": str(tmp_path / "c.txt")})],
+                            directorio_estado=str(tmp_path / "estado"))
+
+        assert estados(con_modulo().ejecutar(verbose=False)) == {"c": "ejecutada"}
+        assert estados(con_modulo().ejecutar(verbose=False)) == {"c": "cache"}
+        auxiliar.write_text("SUFIJO = '!!'\n")
+        assert estados(con_modulo().ejecutar(verbose=False)) == {"c": "ejecutada"}
+    finally:
+        sys.path.remove(str(tmp_path))
+        sys.modules.pop("auxiliar_pipeline", None)
+
+
+def test_proyeccion_pca_incremental_coincide_con_pca_y_rejilla_cuenta_todos(con_listings, tmp_path):
+    import copy
+
+    import numpy as np
+    from sklearn.decomposition import PCA
+    from core.features import FEATURES, features_seller
+    from core.projection import ProyeccionPCA, construir_proyeccion, huella_pre_pipe
+    from core.segmentation import cargar_modelos
+
+    pre_pipe, kmeans = cargar_modelos(os.path.join(os.path.dirname(__file__), "..", "..", "models"))
+    ruta = str(tmp_path / "proyeccion.joblib")
+    r = construir_proyeccion(con_listings, "data.listings", pre_pipe, kmeans, ruta=ruta,
+                             filas_por_lote=7, verbose=False)
+    exacta = PCA(2).fit(pre_pipe.transform(features_seller(con_listings, "data.listings")[FEATURES]))
+    np.testing.assert_allclose(np.abs(r["proyeccion"].pca.components_), np.abs(exacta.components_), atol=1e-3)
+    assert r["rejilla"]["frecuencia"].sum() == 30
+    assert set(r["rejilla"]["cluster"]) <= set(range(kmeans.n_clusters))
+    assert ProyeccionPCA.cargar(ruta).loadings().equals(r["loadings"])
+
+    # Con otro pre_pipe la proyección guardada no se reutiliza
+    otro_pre = copy.deepcopy(pre_pipe)
+    otro_pre.named_steps["scaler"].scale_ = otro_pre.named_steps["scaler"].scale_ * 2
+    assert construir_proyeccion(con_listings, "data.listings", pre_pipe, ruta=ruta,
+                                verbose=False)["proyeccion"].pre_pipe is not pre_pipe  # cargada
+    r2 = construir_proyeccion(con_listings, "data.listings", otro_pre, ruta=ruta, verbose=False)
+    assert r2["proyeccion"].pre_pipe is otro_pre
+    assert ProyeccionPCA.cargar(ruta).huella == huella_pre_pipe(otro_pre) != huella_pre_pipe(pre_pipe)
+
+
+def test_nombrar_clusters_sigue_a_los_centroides_tras_reentrenar():
+    import copy
+
+    import numpy as np
+    from core.cluster_udf import CLUSTER_NAME, nombrar_clusters
+    from core.segmentation import cargar_modelos
+
+    pre_pipe, kmeans = cargar_modelos(os.path.join(os.path.dirname(__file__), "..", "..", "models"))
+    # "Reentrenamiento": mismos grupos con otros ids y un escalador distinto
+    perm = np.array([3, 0, 4, 1, 2])
+    otro_pre = copy.deepcopy(pre_pipe)
+    scaler = otro_pre.named_steps["scaler"]
+    centros_originales = kmeans.cluster_centers_ * scaler.scale_ + scaler.center_
+    scaler.scale_ = scaler.scale_ * 2
+    otro = copy.deepcopy(kmeans)
+    otro.cluster_centers_ = ((centros_originales - scaler.center_) / scaler.scale_)[perm]
+
+    nombres = nombrar_clusters(otro_pre, otro, pre_pipe, kmeans)
+    assert nombres == {j: CLUSTER_NAME[int(perm[j])] for j in range(5)}
+    # Con menos clusters, cada uno recibe un nombre distinto
+    otro.cluster_centers_ = otro.cluster_centers_[:4]
+    assert len(set(nombrar_clusters(otro_pre, otro, pre_pipe, kmeans).values())) == 4
+
+
+def test_estabilidad_bootstrap_alinea_etiquetas_y_mide_churn():
+    import numpy as np
+    from core.stability import alinear_centroides, estabilidad_bootstrap, metricas_confusion
+
+    referencia = np.array([[0.0, 0.0], [10.0, 0.0], [0.0, 10.0]])
+    assert alinear_centroides(referencia, referencia[[2, 0, 1]] + 0.1).tolist() == [2, 0, 1]
+
+    jaccard, churn, global_ = metricas_confusion(np.array([[8, 2], [0, 10]]))
+    np.testing.assert_allclose(jaccard, [0.8, 10 / 12])
+    np.testing.assert_allclose(churn, [0.2, 0.0])
+    assert abs(global_ - 0.1) < 1e-12
+
+    rng = np.random.default_rng(0)
+    X = referencia[rng.integers(0, 3, 3000)] + rng.normal(0, 1, (3000, 2))
+    r = estabilidad_bootstrap(X, referencia, B=4, max_workers=2, verbose=False)
+    assert r["confusiones"].shape == (4, 3, 3)
+    assert r["por_cluster"]["estable"].all() and r["churn_medio"] < 0.01
+
+
+def test_monitor_drift_numpy_y_duckdb_coinciden_y_alertan(con_listings):
+    import warnings
+    from core.drift import MonitorDrift, ReferenciaDrift, drift_duckdb
+    from core.features import features_seller
+
+    referencia = ReferenciaDrift.desde_duckdb(con_listings, "data.listings", bins=5)
+    monitor = MonitorDrift(referencia).actualizar(features_seller(con_listings, "data.listings"))
+    assert monitor.alertas() == [] and monitor.reporte()["psi"].max() < 1e-9
+
+    con_listings.execute('CREATE VIEW caro AS SELECT * REPLACE (price * 3 AS price) FROM "data.listings"')
+    monitor.reiniciar()
+    monitor.actualizar(features_seller(con_listings, "caro"))
+    with warnings.catch_warnings(record=True) as avisos:
+        warnings.simplefilter("always")
+        reporte = monitor.reporte().set_index("feature")
+    assert reporte.loc["log_price_avg", "nivel"] == "alerta" and len(avisos) >= 1
+    assert reporte.loc["rep_score", "nivel"] == "ok"
+
+    en_sql = drift_duckdb(con_listings, "caro", referencia).set_index("feature")
+    assert (en_sql["psi"] - reporte["psi"]).abs().max() < 1e-9
+
+
+def test_validacion_calidad_un_escaneo_muestras_y_cuarentena(con_listings, tmp_path):
+    import pandas as pd
+
+    from core.inspector import calcular_score_calidad
+    from core.validation import validar_calidad
+
+    df = con_listings.execute('SELECT * FROM "data.listings"').fetchdf()
+    ruta = str(tmp_path / "cuarentena.parquet")
+    resultado = validar_calidad(con_listings, "data.listings", ruta_cuarentena=ruta, muestras=3)
+    reporte = resultado["reporte"].set_index("regla")
+
+    esperado = int((df["price"] > df["regular_price"]).sum())
+    assert reporte.loc["precio_sobre_regular", "violaciones"] == esperado
+    assert reporte.loc["stock_negativo", "violaciones"] == 0
+    assert "titulo_vacio" in reporte.index and resultado["omitidas"] == []
+    assert resultado["filas"] == 600 and resultado["filas_invalidas"] == esperado
+    muestras = resultado["muestras"]
+    assert len(muestras) == 3 and (muestras["price"] > muestras["regular_price"]).all()
+
+    cuarentena = pd.read_parquet(ruta)
+    assert len(cuarentena) == esperado
+    assert all(list(r) == ["precio_sobre_regular"] for r in cuarentena["reglas_violadas"])
+    assert not con_listings.execute("SELECT * FROM duckdb_tables() WHERE temporary").fetchall()
+
+    resumen = pd.DataFrame({"columna": ["a", "b", "price"], "nulos": [0, 3, 0], "unicos": [1, 500, 50],
+                            "column_type": ["INTEGER", "VARCHAR", "DOUBLE"]})
+    assert list(calcular_score_calidad(resumen)) == pytest.approx([0.5, 0.7, 1.0])
+    assert calcular_score_calidad(resumen.iloc[1]) == pytest.approx(0.7)
+    penalizado = calcular_score_calidad(resumen, resultado["reporte"])
+    assert penalizado[2] < 1.0
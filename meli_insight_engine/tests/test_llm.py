@@ -0,0 +1,383 @@
+import contextlib
+import os
+
+os.environ.setdefault("DEEPSEEK_API_KEY", "test")
+
+from llm.agents.agent_template import TemplateAgent
+from llm.agents.rasoner_meli import construir_cadenas
+from llm.fake_model import FakeChatModel
+
+PAYLOAD = {
+    "fecha_actual": "2025-07-15",
+    "cluster_name": "Sellers en Crecimiento",
+    "publicaciones": 120,
+    "categorias_distintas": 15,
+    "stock_promedio": 124,
+    "precio_medio_cop": 105_000,
+    "descuento_pct": 0.27,
+    "rep_score": 4.1,
+    "tasa_cancelacion": 0.8,
+}
+
+
+def test_cot_chain_con_modelo_falso():
+    llm = FakeChatModel(respuestas=["Hot Sale", "Subir Ads"], latencia=("uniforme", 0.0, 0.001))
+    _, _, cot_chain = construir_cadenas(llm)
+
+    salida = cot_chain.invoke(dict(PAYLOAD))
+    assert salida["temporada"] == "Hot Sale"
+    assert salida["estrategia"] == "Subir Ads"
+    assert len(llm.llamadas) == 2
+    assert all(l["prompt_tokens"] > 0 for l in llm.llamadas)
+
+
+def test_latencias_deterministas_por_semilla():
+    a = FakeChatModel(latencia=("lognormal", -3, 0.5), semilla=7, dormir=False)
+    b = FakeChatModel(latencia=("lognormal", -3, 0.5), semilla=7, dormir=False)
+    assert [a.muestrear_latencia() for _ in range(5)] == [b.muestrear_latencia() for _ in range(5)]
+
+
+def test_template_agent_con_llm_inyectado(tmp_path):
+    entrada = tmp_path / "stats.txt"
+    entrada.write_text("filas: 10", encoding="utf-8")
+    agente = TemplateAgent("Resume: {contenido}", "PRUEBA",
+                           llm=FakeChatModel(responder=lambda prompt: prompt.upper()))
+
+    ruta = agente.run(str(entrada), output_dir=str(tmp_path))
+    assert open(ruta, encoding="utf-8").read() == "RESUME: FILAS: 10"
+
+
+@contextlib.contextmanager
+def _servidor_chat():
+    """Servidor local compatible con /chat/completions que responde siempre "ok"."""
+    import json
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            cuerpo = json.dumps({
+                "id": "x", "object": "chat.completion", "created": 0, "model": "deepseek-chat",
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": "ok"}}],
+                "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def log_message(self, *args):
+            pass
+
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    try:
+        yield f"http://127.0.0.1:{servidor.server_port}"
+    finally:
+        servidor.shutdown()
+
+
+def test_cliente_compartido_reutiliza_conexiones():
+    from llm import client
+
+    with _servidor_chat() as base_url:
+        try:
+            client.reiniciar_clientes()
+            llm = client.obtener_llm(base_url=base_url, api_key="test")
+            assert client.obtener_llm(base_url=base_url, api_key="test") is llm
+
+            _, _, cot_chain = construir_cadenas(llm)
+            cot_chain.invoke(dict(PAYLOAD))
+            TemplateAgent("Resume: {contenido}", "POOL", llm=llm).chain.run(contenido="x")
+
+            resumen = client.obtener_metricas().resumen()
+            assert resumen["solicitudes"] == 3
+            assert resumen["conexiones_nuevas"] == 1
+            assert resumen["conexiones_reutilizadas"] == 2
+        finally:
+            client.reiniciar_clientes()
+
+
+def test_cot_chain_sigue_funcionando_tras_configurar_pool(monkeypatch):
+    import llm as paquete_llm
+    from llm import client
+    from llm.agents import rasoner_meli
+
+    with _servidor_chat() as base_url:
+        monkeypatch.setenv("DEEPSEEK_BASE_URL", base_url)
+        original = client.CONFIG_POOL["max_conexiones"]
+        try:
+            client.reiniciar_clientes()
+            anterior = rasoner_meli.cot_chain
+            assert anterior.invoke(dict(PAYLOAD))["estrategia"] == "ok"
+
+            client.configurar_pool(max_conexiones=5)
+            # Las cadenas creadas antes conservan su cliente (no se cierra bajo sus pies)...
+            assert anterior.invoke(dict(PAYLOAD))["estrategia"] == "ok"
+            # ...y las por defecto se reconstruyen sobre el pool nuevo
+            assert rasoner_meli.cot_chain is not anterior
+            assert paquete_llm.cot_chain is rasoner_meli.cot_chain
+            assert rasoner_meli.cot_chain.invoke(dict(PAYLOAD))["estrategia"] == "ok"
+            assert rasoner_meli.llm.client._client._client._transport._pool._max_connections == 5
+        finally:
+            client.configurar_pool(max_conexiones=original)
+
+
+def test_cache_arquetipos_una_llamada_por_bucket():
+    from llm.archetype_cache import CacheArquetipos
+
+    llm = FakeChatModel(responder=lambda prompt: "Hot Sale" if "Fecha de hoy" in prompt
+                        else prompt.split("segmento **")[1].split("**")[0])
+    season_chain, strategy_chain, _ = construir_cadenas(llm)
+    payloads = [{**PAYLOAD, "publicaciones": 100 + i, "cluster_name": c}
+                for i in range(50) for c in ("Power Sellers", "Sellers Ocasionales")]
+
+    cache = CacheArquetipos(season_chain, strategy_chain)
+    salida = cache.recomendar(payloads)
+    assert list(salida["estrategia"][:2]) == ["Power Sellers", "Sellers Ocasionales"]
+    assert (salida["temporada"] == "Hot Sale").all()
+    assert cache.resumen()["llamadas_llm"] == 3  # 1 temporada + 2 buckets
+
+    cache.recomendar(payloads[:10])
+    resumen = cache.resumen()
+    assert resumen["llamadas_llm"] == 3
+    assert resumen["ratio_compresion"] == 110 / 3
+
+    # Sin cluster_name: bucket "Desconocido" en lugar de un índice de bucket inválido
+    sin_segmento = cache.recomendar([{**PAYLOAD, "cluster_name": None}, payloads[0]])
+    assert list(sin_segmento["estrategia"]) == ["Desconocido", "Power Sellers"]
+
+
+def test_reglas_via_rapida_y_escalamiento_de_anomalos():
+    from llm.rules import RecomendadorReglas
+
+    llm = FakeChatModel(responder=lambda prompt: "Hot Sale" if "Fecha de hoy" in prompt else "Estrategia LLM")
+    _, _, cot_chain = construir_cadenas(llm)
+    payloads = [
+        {**PAYLOAD, "cluster_name": "Sellers Ocasionales", "tasa_cancelacion": 0.0},
+        {**PAYLOAD, "cluster_name": "Power Sellers", "rep_score": 4.6, "tasa_cancelacion": 0.0},
+        {**PAYLOAD, "cluster_name": "Power Sellers", "rep_score": 2.1, "tasa_cancelacion": 0.0},
+        {**PAYLOAD, "cluster_name": "Cazadores de Oferta", "tasa_cancelacion": 0.0},
+        {**PAYLOAD, "cluster_name": "Sellers en Crecimiento", "rep_score": None, "tasa_cancelacion": 0.0},
+    ]
+    recomendador = RecomendadorReglas(cot_chain)
+    salida = recomendador.recomendar(payloads)
+
+    assert list(salida["fuente"]) == ["regla", "regla", "llm", "llm", "llm"]
+    assert list(salida["regla"][:2]) == ["ocasionales", "power_sellers"]
+    assert list(salida["anomalia"][2:]) == ["riesgo_churn", None, "valores_invalidos"]
+    assert (salida["estrategia"][2:] == "Estrategia LLM").all()
+    assert salida["temporada"][0] is None and salida["temporada"][2] == "Hot Sale"
+    assert len(llm.llamadas) == 6  # solo los 3 escalados pasan por cot_chain
+    resumen = recomendador.resumen()
+    assert resumen["tasa_acierto"] == 0.4 and resumen["llamadas_evitadas"] == 4
+
+
+def test_estrategia_por_lotes_reintenta_faltantes():
+    import json
+
+    import pytest
+
+    from llm.batch_strategy import EstrategiaPorLotes
+
+    def responder(prompt):
+        if "Vendedores (" not in prompt:
+            return "Estrategia individual"
+        ids = [json.loads(l)["seller_id"] for l in prompt.splitlines() if l.startswith('{"seller_id"')]
+        # El modelo "olvida" al seller s3 cuando viene en un lote
+        return "```json\n" + json.dumps([{"seller_id": i, "estrategia": f"para {i}"}
+                                         for i in ids if i != "s3"]) + "\n```"
+
+    lotes = EstrategiaPorLotes(FakeChatModel(responder=responder), max_por_lote=4)
+    payloads = [{**PAYLOAD, "seller_id": f"s{i}"} for i in range(10)]
+    salida = lotes.recomendar(payloads, temporada="Temporada baja")
+
+    assert len(salida) == 10
+    assert salida["s0"] == "para s0"
+    assert salida["s3"] == "Estrategia individual"
+    resumen = lotes.resumen()
+    assert resumen["individuales"] == 1
+    assert resumen["sellers_por_llamada"] > 2
+
+    # Fechas distintas: nunca comparten lote ni temporada
+    prompts = []
+    mixtos = EstrategiaPorLotes(FakeChatModel(responder=lambda p: prompts.append(p) or responder(p)),
+                                max_por_lote=4)
+    fechas = [{**p, "fecha_actual": "2025-12-01" if i % 2 else "2025-07-15"} for i, p in enumerate(payloads)]
+    assert len(mixtos.recomendar(fechas)) == 10
+    por_lote = [p for p in prompts if "Vendedores (" in p]
+    assert all(("2025-12-01" in p) != ("2025-07-15" in p) for p in por_lote)
+    assert sum("Responde SOLO una de estas opciones" in p for p in prompts) == 2  # temporada por fecha
+    with pytest.raises(ValueError):
+        mixtos.recomendar(fechas, temporada="Temporada baja")
+
+
+def test_streaming_emite_temporada_tokens_y_fin():
+    from llm.streaming import formatear_sse, transmitir_recomendacion
+
+    llm = FakeChatModel(respuestas=["Hot Sale", "Subir Ads en la categoría principal"])
+    eventos = list(transmitir_recomendacion(dict(PAYLOAD), llm))
+
+    assert eventos[0] == {**eventos[0], "tipo": "temporada", "texto": "Hot Sale"}
+    tokens = [e["texto"] for e in eventos if e["tipo"] == "token"]
+    assert len(tokens) == 6
+    fin = eventos[-1]
+    assert fin["estrategia"] == "".join(tokens) == "Subir Ads en la categoría principal"
+    assert 0 <= fin["ttft_s"] <= fin["latencia_s"]
+    assert formatear_sse(eventos[0]).startswith("event: temporada\ndata: {")
+
+
+def test_flujo_nocturno_solapa_scoring_y_generacion_con_backpressure(tmp_path):
+    import time
+
+    import numpy as np
+    import pandas as pd
+
+    from core import conectar_duckdb
+    from core.payloads import lotes_payloads
+    from core.segmentation import cargar_modelos
+    from llm.nightly import EscritorChunks, FlujoRecomendaciones, generador_llm
+    from llm.rules import MotorReglas, Regla
+
+    rng = np.random.default_rng(1)
+    n = 400
+    listings = pd.DataFrame({
+        "seller_nickname": [f"s{i % 80}" for i in range(n)], "titulo": "Producto",
+        "seller_reputation": rng.choice(["green", "newbie"], n), "stock": rng.integers(0, 50, n),
+        "condition": "new", "is_refurbished": False, "price": rng.lognormal(10, 1, n),
+        "regular_price": np.nan, "category_id": rng.choice(["MCO1", "MCO2"], n),
+    })
+    con = conectar_duckdb()
+    con.register("listings", listings)
+    pre_pipe, kmeans = cargar_modelos(os.path.join(os.path.dirname(__file__), "..", "..", "models"))
+
+    def lotes_lentos():
+        # scoring simulado: 0.05 s por lote de 10 sellers
+        for lote in lotes_payloads(con, "listings", pre_pipe, kmeans, "2025-07-15", filas_por_lote=10):
+            time.sleep(0.05)
+            yield lote
+
+    llm = FakeChatModel(latencia=0.01)
+    flujo = FlujoRecomendaciones(generador_llm(llm), workers=4, capacidad=8, tamano_chunk=25,
+                                 motor_reglas=MotorReglas([Regla("rep_alta", None, [("rep_score", ">=", 2.0)],
+                                                                 "Onboarding guiado")]))
+    destino = str(tmp_path / "recomendaciones.jsonl")
+    resumen = flujo.ejecutar(lotes_lentos(), destino)
+
+    salida = pd.read_json(destino, lines=True)
+    assert sorted(salida["seller_nickname"]) == sorted(f"s{i}" for i in range(80))
+    assert resumen["sellers"] == 80 and resumen["chunks"] == 4 and resumen["max_cola"] <= 8
+    assert (salida["fuente"] == "llm").sum() == resumen["sellers_llm"] == len(llm.llamadas) - 1
+    assert salida.loc[salida["fuente"] == "regla", "estrategia"].notna().all()
+    generacion = resumen["segundos_llm"] / 4
+    assert resumen["segundos"] < 0.9 * (resumen["segundos_scoring"] + generacion)
+
+    # Relanzar sin bitácora reemplaza la salida anterior (.jsonl y partes Parquet)
+    flujo.ejecutar(lotes_payloads(con, "listings", pre_pipe, kmeans, "2025-07-15", filas_por_lote=10),
+                   destino, verbose=False)
+    assert len(pd.read_json(destino, lines=True)) == 80
+    carpeta = str(tmp_path / "partes")
+    for filas in (40, 10):
+        escritor = EscritorChunks(carpeta, tamano_chunk=5)
+        for i in range(filas):
+            escritor.agregar({"seller_nickname": f"s{i}"})
+        escritor.vaciar()
+    assert len(pd.read_parquet(carpeta)) == 10
+    escritor = EscritorChunks(carpeta, tamano_chunk=5, reanudar=True)
+    escritor.agregar({"seller_nickname": "s10"})
+    escritor.vaciar()
+    assert len(pd.read_parquet(carpeta)) == 11
+    con.close()
+
+
+def test_corrida_con_checkpoint_reanuda_sin_repetir_llamadas(tmp_path):
+    import pandas as pd
+
+    from llm.checkpoint import Bitacora, recomendar_con_checkpoint
+    from llm.nightly import generador_llm
+
+    payloads = pd.DataFrame([{**PAYLOAD, "seller_nickname": f"s{i}"} for i in range(60)])
+    ruta = str(tmp_path / "bitacora.jsonl")
+    llamadas = []
+
+    def con_limite(payload):
+        # "límite de tasa" del proveedor a partir del seller 25
+        llamadas.append(payload["publicaciones"])
+        if len(llamadas) > 25:
+            raise RuntimeError("429 rate limit")
+        return {"temporada": "Hot Sale", "estrategia": "Ads"}
+
+    primera = recomendar_con_checkpoint(payloads, con_limite, ruta, workers=1, fsync_cada=10,
+                                        max_errores_consecutivos=5)
+    # Las llamadas ya en vuelo al detenerse también terminan (y quedan como error)
+    assert primera["detenida"] and primera["errores"] >= 5
+    assert primera["procesados"] == 25 + primera["errores"]
+    assert primera["fsyncs"] >= 3
+
+    # Caída a mitad de una escritura: la línea truncada se descarta al reabrir
+    with open(ruta, "a", encoding="utf-8") as f:
+        f.write('{"seller_nickname": "s40", "estra')
+    llm = FakeChatModel(respuestas=["Hot Sale", "Ads"])
+    segunda = recomendar_con_checkpoint(payloads, generador_llm(llm), ruta, workers=4)
+    assert not segunda["detenida"] and segunda["truncadas"] == 1
+    assert segunda["reanudados"] == 25 and segunda["procesados"] == 35
+    assert len(llm.llamadas) == 35 + 1  # + una temporada por fecha
+
+    # Relanzar una corrida completa no llama al modelo ni duplica filas
+    tercera = recomendar_con_checkpoint(payloads, generador_llm(llm), ruta)
+    assert tercera["procesados"] == 0 and len(llm.llamadas) == 36
+    with Bitacora(ruta) as bitacora:
+        assert bitacora.registrar({"seller_nickname": "s0", "estrategia": "otra", "error": None}) is False
+        final = bitacora.filas()
+    assert sorted(final["seller_nickname"]) == sorted(payloads["seller_nickname"])
+    assert final["error"].isna().all()
+
+    # Sellers repetidos en los payloads se envían una sola vez
+    llamadas.clear()
+    repetidos = pd.concat([payloads.head(3), payloads.head(3)])
+    cuarta = recomendar_con_checkpoint(repetidos, con_limite, str(tmp_path / "otra.jsonl"), workers=4)
+    assert cuarta["total"] == 3 and cuarta["repetidos"] == 3 and len(llamadas) == 3
+
+
+def test_planificador_prioriza_power_sellers_y_cumple_plazos():
+    import pandas as pd
+
+    from llm.nightly import generador_llm
+    import pytest
+
+    from llm.scheduler import ClasePrioridad, PlanificadorLLM, simular
+
+    segmentos = ["Sellers Ocasionales"] * 6 + ["Power Sellers"] * 2 + ["Sellers en Crecimiento"] * 2
+    payloads = pd.DataFrame([{**PAYLOAD, "seller_nickname": f"s{i}", "cluster_name": segmentos[i % 10],
+                              "publicaciones": 10 ** (i % 5)} for i in range(60)])
+    clases = {"Power Sellers": ClasePrioridad("Power Sellers", 8, 20),
+              "Sellers en Crecimiento": ClasePrioridad("Sellers en Crecimiento", 4, 40),
+              "Sellers Ocasionales": ClasePrioridad("Sellers Ocasionales", 1, 200)}
+
+    # Simulación: 60 sellers x ~1 s con 2 workers y 1.5 solicitudes/s, sin dormir
+    def simulacion(politica):
+        llm = FakeChatModel(dormir=False, latencia=("uniforme", 0.8, 1.2))
+        return simular(payloads, llm, clases, workers=2, tasa_por_segundo=1.5, politica=politica,
+                       margen_urgencia=0)
+
+    fifo, wfq = simulacion("fifo"), simulacion("wfq")
+    assert fifo["reporte"].loc["Power Sellers", "plazos_incumplidos"] > 0
+    assert wfq["reporte"]["plazos_incumplidos"].sum() == 0
+    assert wfq["reporte"].loc["Power Sellers", "espera_media_s"] < \
+        wfq["reporte"].loc["Sellers Ocasionales", "espera_media_s"]
+    # Mismo trabajo, otro orden; dentro de la clase, el prompt más corto primero
+    assert wfq["segundos"] == pytest.approx(fifo["segundos"], rel=0.2)
+    ocasionales = wfq["resultados"].query("clase == 'Sellers Ocasionales'")["tokens_prompt"]
+    assert ocasionales.is_monotonic_increasing
+
+    # Ejecución real con hilos y límite global de tasa
+    llm = FakeChatModel(latencia=0.005)
+    real = PlanificadorLLM(generador_llm(llm), clases, workers=4, tasa_por_segundo=400, rafaga=4).ejecutar(payloads)
+    assert sorted(real["resultados"]["seller_nickname"]) == sorted(payloads["seller_nickname"])
+    assert real["resultados"]["error"].isna().all() and len(llm.llamadas) == 61
+    assert real["segundos"] >= (60 - 4) / 400
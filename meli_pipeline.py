@@ -0,0 +1,237 @@
+"""
+Flujo completo ingest → profile → features → cluster → projection / recommend con caché.
+
+Reemplaza la secuencia manual notebook 01 (pre_pipe.pkl + df_challenge_meli_limpio.csv),
+notebook 02 (kmeans.pkl, pca_loadings.csv) y meli_recomender_agent.py. Solo se recalculan las
+etapas cuyas entradas, parámetros o código cambiaron:
+
+    python meli_pipeline.py --fuente data/df_challenge_meli.csv
+    python meli_pipeline.py --k 6                 # solo recalcula cluster y recommend
+    python meli_pipeline.py --hasta features      # ingest + features
+    python meli_pipeline.py --forzar profile
+
+Los artefactos se escriben en --salida (por defecto artefactos/), no sobre models/.
+"""
+import argparse
+import json
+import os
+from datetime import date
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from meli_insight_engine.core import conectar_duckdb, ingestar_en_parquet, registrar_parquet_como_vista
+from meli_insight_engine.core.cluster_udf import nombrar_clusters
+from meli_insight_engine.core.features import FEATURES, features_seller
+from meli_insight_engine.core.inspector import analisis_inicial_completo, guardar_resultados_como_txt
+from meli_insight_engine.core.payloads import payloads_desde_features
+from meli_insight_engine.core.pipeline import Etapa, Pipeline
+
+
+def _listings(carpeta: str):
+    con = conectar_duckdb()
+    registrar_parquet_como_vista(con, carpeta, "listings")
+    return con
+
+
+def ingest(fuente: str, destino: str):
+    import shutil
+
+    # ingestar_en_parquet añade archivos: se reescribe la carpeta para que la salida sea reproducible
+    shutil.rmtree(destino, ignore_errors=True)
+    con = conectar_duckdb()
+    ingestar_en_parquet(con, fuente, destino)
+    con.close()
+
+
+def profile(listings: str, reporte: str):
+    con = _listings(listings)
+    guardar_resultados_como_txt(analisis_inicial_completo(con, "data.listings"), ruta=reporte)
+    con.close()
+
+
+def features(listings: str, destino: str):
+    con = _listings(listings)
+    df = features_seller(con, "data.listings")
+    con.close()
+    df.sort_values("seller_nickname").reset_index(drop=True).to_parquet(destino, index=False)
+
+
+def preprocess(features_path: str, pre_pipe_path: str, limpio_path: str, referencia_path: str):
+    """
+    Notebook 01: SimpleImputer(median) + RobustScaler sobre las nueve FEATURES.
+    Guarda además la referencia de drift de la población de entrenamiento.
+    """
+    from sklearn.impute import SimpleImputer
+    from sklearn.pipeline import Pipeline as SkPipeline
+    from sklearn.preprocessing import RobustScaler
+
+    from meli_insight_engine.core.drift import ReferenciaDrift
+
+    df = pd.read_parquet(features_path)
+    ReferenciaDrift.desde_features(df).guardar(referencia_path)
+    pre_pipe = SkPipeline([("imputer", SimpleImputer(strategy="median")), ("scaler", RobustScaler())])
+    X = pre_pipe.fit_transform(df[FEATURES])
+    joblib.dump(pre_pipe, pre_pipe_path)
+    limpio = pd.DataFrame(X, columns=FEATURES)
+    limpio.insert(0, "seller_nickname", df["seller_nickname"].to_numpy())
+    limpio.to_csv(limpio_path, index=False)
+
+
+def cluster(limpio_path: str, pre_pipe_path: str, kmeans_path: str, clusters_path: str, nombres_path: str,
+            k: int, semilla: int, referencia_dir: str):
+    """
+    Notebook 02: KMeans(k, random_state, n_init=10) sobre el dataset escalado.
+    Los ids del reentrenamiento son arbitrarios: los nombres de segmento se asignan
+    emparejando los centroides con los de models/kmeans.pkl (nombrar_clusters).
+    """
+    from sklearn.cluster import KMeans
+
+    from meli_insight_engine.core.segmentation import cargar_modelos
+
+    df = pd.read_csv(limpio_path)
+    kmeans = KMeans(n_clusters=k, random_state=semilla, n_init=10)
+    df["cluster"] = kmeans.fit_predict(df[FEATURES])
+    nombres = nombrar_clusters(joblib.load(pre_pipe_path), kmeans, *cargar_modelos(referencia_dir))
+    df["cluster_name"] = df["cluster"].map(nombres)
+    joblib.dump(kmeans, kmeans_path)
+    df.to_csv(clusters_path, index=False)
+    with open(nombres_path, "w", encoding="utf-8") as f:
+        json.dump(nombres, f, ensure_ascii=False, indent=2)
+
+
+def projection(features_path: str, pre_pipe_path: str, kmeans_path: str, destino: str,
+               loadings_path: str, png_dir: str):
+    """PCA incremental sobre lotes del Parquet de features; figura como rejilla de densidad."""
+    import pyarrow.parquet as pq
+
+    from meli_insight_engine.core.plotting import renderizar_png
+    from meli_insight_engine.core.projection import ProyeccionPCA
+
+    pre_pipe, kmeans = joblib.load(pre_pipe_path), joblib.load(kmeans_path)
+    lotes = lambda: pq.ParquetFile(features_path).iter_batches(columns=FEATURES)  # noqa: E731
+    proyeccion = ProyeccionPCA(pre_pipe).ajustar(lotes())
+    proyeccion.guardar(destino)
+    proyeccion.loadings().to_csv(loadings_path)
+    rejilla = proyeccion.rejilla_densidad(lotes(), kmeans=kmeans)
+    totales = rejilla.groupby(["x", "y"], as_index=False)["frecuencia"].sum()
+    var = proyeccion.varianza_explicada()
+    renderizar_png({"proyeccion_pca": ("hexbin", dict(
+        datos=totales, titulo=f"Sellers - Proyección PCA 2D (k={kmeans.n_clusters})",
+        xlabel=f"PC1 ({var[0]:.0%})", ylabel=f"PC2 ({var[1]:.0%})"))}, png_dir, max_workers=1)
+
+
+def recommend(features_path: str, clusters_path: str, nombres_path: str, destino: str, fecha: str,
+              modelo: str, limite: int, reglas: bool = True):
+    """
+    Una estrategia por seller escrita como JSONL: reglas de negocio (vía rápida) y,
+    para los sellers escalados, una por arquetipo (CacheArquetipos). Los segmentos se
+    nombran con el emparejamiento de la etapa cluster, no con CLUSTER_NAME.
+    """
+    if modelo == "fake":
+        # rasoner_meli crea el cliente Deepseek por defecto al importarse; con el modelo
+        # fake basta una clave de relleno (igual que en tests/test_llm.py)
+        os.environ.setdefault("DEEPSEEK_API_KEY", "fake")
+    from meli_insight_engine.llm import CacheArquetipos, RecomendadorReglas, obtener_llm
+    from meli_insight_engine.llm.agents.rasoner_meli import construir_cadenas
+    from meli_insight_engine.llm.fake_model import FakeChatModel
+
+    llm = FakeChatModel() if modelo == "fake" else obtener_llm()
+    season_chain, strategy_chain, _ = construir_cadenas(llm)
+
+    feats = pd.read_parquet(features_path)
+    clusters = pd.read_csv(clusters_path, usecols=["seller_nickname", "cluster"])
+    df = feats.merge(clusters, on="seller_nickname", how="inner")
+    if limite:
+        df = df.head(limite)
+    with open(nombres_path, encoding="utf-8") as f:
+        nombres = {int(k): v for k, v in json.load(f).items()}
+    payloads = payloads_desde_features(df, df["cluster"], fecha, nombres=nombres).drop(columns="cluster")
+    cache = CacheArquetipos(season_chain, strategy_chain)
+    recomendador = RecomendadorReglas(cache) if reglas else cache
+    salida = pd.concat([payloads[["seller_nickname", "cluster_name"]],
+                        recomendador.recomendar(payloads.drop(columns="seller_nickname"))], axis=1)
+    with open(destino, "w", encoding="utf-8") as f:
+        for fila in salida.to_dict("records"):
+            f.write(json.dumps({k: (v.item() if isinstance(v, np.generic) else v) for k, v in fila.items()},
+                               ensure_ascii=False) + "\n")
+    if reglas:
+        r = recomendador.resumen()
+        print(f"⚡ Vía rápida: {r['via_rapida']:,}/{r['sellers']:,} sellers ({r['tasa_acierto']:.1%}), "
+              f"{r['escalados']:,} escalados, {r['llamadas_evitadas']:,} llamadas LLM evitadas")
+    print(f"🤖 {cache.resumen()}")
+
+
+def construir_pipeline(fuente: str, salida: str = "artefactos", k: int = 5, semilla: int = 42,
+                       fecha: str = None, modelo: str = "deepseek", limite: int = 0,
+                       max_workers: int = 4, reglas: bool = True, referencia: str = "models") -> Pipeline:
+    """
+    Args:
+        referencia: Carpeta con el pre_pipe.pkl / kmeans.pkl del notebook, de la que salen
+            los nombres de segmento (CLUSTER_NAME) de los clusters reentrenados
+    """
+    r = lambda *partes: os.path.join(salida, *partes)  # noqa: E731
+    listings = r("listings")
+    etapas = [
+        Etapa("ingest", ingest, [fuente], [listings], {"fuente": fuente, "destino": listings}),
+        Etapa("profile", profile, [listings], [r("inspector_stats.txt")],
+              {"listings": listings, "reporte": r("inspector_stats.txt")}),
+        Etapa("features", features, [listings], [r("features_seller.parquet")],
+              {"listings": listings, "destino": r("features_seller.parquet")}),
+        Etapa("preprocess", preprocess, [r("features_seller.parquet")],
+              [r("pre_pipe.pkl"), r("df_challenge_meli_limpio.csv"), r("referencia_drift.json")],
+              {"features_path": r("features_seller.parquet"), "pre_pipe_path": r("pre_pipe.pkl"),
+               "limpio_path": r("df_challenge_meli_limpio.csv"),
+               "referencia_path": r("referencia_drift.json")}),
+        Etapa("cluster", cluster,
+              [r("df_challenge_meli_limpio.csv"), r("pre_pipe.pkl"),
+               os.path.join(referencia, "pre_pipe.pkl"), os.path.join(referencia, "kmeans.pkl")],
+              [r("kmeans.pkl"), r("df_challenge_meli_clusters.csv"), r("cluster_names.json")],
+              {"limpio_path": r("df_challenge_meli_limpio.csv"), "pre_pipe_path": r("pre_pipe.pkl"),
+               "kmeans_path": r("kmeans.pkl"), "clusters_path": r("df_challenge_meli_clusters.csv"),
+               "nombres_path": r("cluster_names.json"), "k": k, "semilla": semilla,
+               "referencia_dir": referencia}),
+        Etapa("projection", projection,
+              [r("features_seller.parquet"), r("pre_pipe.pkl"), r("kmeans.pkl")],
+              [r("proyeccion_pca.joblib"), r("pca_loadings.csv"), r("proyeccion_pca.png")],
+              {"features_path": r("features_seller.parquet"), "pre_pipe_path": r("pre_pipe.pkl"),
+               "kmeans_path": r("kmeans.pkl"), "destino": r("proyeccion_pca.joblib"),
+               "loadings_path": r("pca_loadings.csv"), "png_dir": salida}),
+        Etapa("recommend", recommend,
+              [r("features_seller.parquet"), r("df_challenge_meli_clusters.csv"), r("cluster_names.json")],
+              [r("recomendaciones.jsonl")],
+              {"features_path": r("features_seller.parquet"),
+               "clusters_path": r("df_challenge_meli_clusters.csv"), "nombres_path": r("cluster_names.json"),
+               "destino": r("recomendaciones.jsonl"), "fecha": fecha or date.today().isoformat(),
+               "modelo": modelo, "limite": limite, "reglas": reglas}),
+    ]
+    return Pipeline(etapas, directorio_estado=salida, max_workers=max_workers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pipeline con caché de sellers Mercado Libre.")
+    parser.add_argument("--fuente", default="data/df_challenge_meli.csv", help="Export CSV/JSONL de publicaciones.")
+    parser.add_argument("--salida", default="artefactos", help="Carpeta de artefactos y estado de la caché.")
+    parser.add_argument("--k", type=int, default=5, help="Número de clusters de KMeans.")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--fecha", type=str, help="fecha_actual del payload (por defecto hoy).")
+    parser.add_argument("--modelo", choices=["deepseek", "fake"], default="deepseek")
+    parser.add_argument("--limite", type=int, default=0, help="Máximo de sellers a recomendar (0 = todos).")
+    parser.add_argument("--sin_reglas", action="store_true", help="Envía todos los sellers al LLM (sin vía rápida).")
+    parser.add_argument("--hasta", nargs="*", help="Etapas objetivo (con sus dependencias).")
+    parser.add_argument("--forzar", nargs="*", default=[], help="Etapas a recalcular aunque estén en caché.")
+    parser.add_argument("--max_workers", type=int, default=4)
+    parser.add_argument("--referencia", default="models",
+                        help="Carpeta con pre_pipe.pkl / kmeans.pkl del notebook (nombres de segmento).")
+    args = parser.parse_args()
+
+    pipeline = construir_pipeline(args.fuente, args.salida, args.k, args.semilla, args.fecha,
+                                  args.modelo, args.limite, args.max_workers, not args.sin_reglas,
+                                  args.referencia)
+    resumen = pipeline.ejecutar(objetivos=args.hasta, forzar=args.forzar)
+    print(resumen.drop(columns="error").to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
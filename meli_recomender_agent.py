@@ -6,6 +6,11 @@ import numpy as np
 import pandas as pd
 import joblib
 from meli_insight_engine.llm.agents import rasoner_meli
+from meli_insight_engine.llm.streaming import imprimir_stream
+from meli_insight_engine.core import conectar_duckdb
+from meli_insight_engine.core.features import features_seller
+from meli_insight_engine.core.cluster_udf import CLUSTER_NAME
+from meli_insight_engine.core.similarity import IndiceSimilitud, RUTA_INDICE, construir_indice_similitud
 
 # ------------- INFERENCIA DE CLUSTER ----------------
 
@@ -15,14 +20,6 @@ kmeans   = joblib.load("models/kmeans.pkl")
 
 FEATURES = list(pre_pipe.feature_names_in_)
 
-CLUSTER_NAME = {
-    1: "Power Sellers",
-    2: "Sellers en Crecimiento",
-    0: "Sellers Ocasionales",
-    3: "Cazadores de Oferta",
-    4: "Liquidadores / Outlet",
-}
-
 def clasificar_seller(metrics: dict) -> dict:
     print("🔎 [2] Realizando inferencia de cluster para el seller...")
     X = pd.DataFrame([metrics])[FEATURES]
@@ -31,6 +28,53 @@ def clasificar_seller(metrics: dict) -> dict:
     print(f"✅   Seller clasificado en cluster {cid}: {CLUSTER_NAME.get(cid, 'Desconocido')}")
     return {"cluster_id": cid, "cluster_name": CLUSTER_NAME.get(cid, "Desconocido")}
 
+def _conectar_listings(ruta: str):
+    con = conectar_duckdb()
+    lector = "read_parquet" if ruta.endswith(".parquet") else "read_csv_auto"
+    con.execute(f"CREATE VIEW listings AS SELECT * FROM {lector}('{ruta}')")
+    return con
+
+def sellers_similares(k: int, ruta_indice: str, metrics: dict, seller: str = None, listings: str = None):
+    """Top-k sellers más parecidos; construye y guarda el índice desde --listings si no existe."""
+    if os.path.exists(ruta_indice):
+        indice = IndiceSimilitud.cargar(ruta_indice)
+    elif listings:
+        con = _conectar_listings(listings)
+        indice = construir_indice_similitud(con, "listings", pre_pipe, ruta=ruta_indice)
+        con.close()
+    else:
+        print(f"⚠️  No existe {ruta_indice}; pasa --listings para construirlo.")
+        return None
+    if seller and seller in indice:
+        return indice.vecinos([seller], k=k)
+    consulta = pd.DataFrame([metrics])
+    consulta["seller_nickname"] = seller or "consulta"
+    return indice.vecinos_de_features(consulta, pre_pipe, k=k)
+
+def metricas_desde_listings(ruta: str, seller: str, tasa_cancelacion: float = 0.0):
+    """Calcula las 9 métricas y el payload del LLM a partir de las publicaciones crudas del seller."""
+    print(f"🧮 [0.3] Calculando métricas de {seller} desde {ruta}")
+    con = _conectar_listings(ruta)
+    seller_sql = seller.replace("'", "''")
+    fila = features_seller(con, "listings", filtro=f"seller_nickname = '{seller_sql}'")
+    con.close()
+    if fila.empty:
+        raise SystemExit(f"❌ No se encontraron publicaciones para el seller {seller}")
+    fila = fila.iloc[0]
+    metrics = {f: float(fila[f]) for f in FEATURES}
+    input_payload = {
+        "fecha_actual":         date.today().isoformat(),
+        "cluster_name":         "",
+        "publicaciones":        int(fila["num_publicaciones"]),
+        "categorias_distintas": int(fila["categorias_distintas"]),
+        "stock_promedio":       round(float(fila["stock_promedio"])),
+        "precio_medio_cop":     round(float(fila["precio_medio"])),
+        "descuento_pct":        float(fila["porc_descuento"]),
+        "rep_score":            round(float(fila["rep_score"]), 2),
+        "tasa_cancelacion":     tasa_cancelacion,
+    }
+    return metrics, input_payload
+
 # ------------------ CLI PRINCIPAL --------------------
 
 def main():
@@ -38,6 +82,12 @@ def main():
     parser = argparse.ArgumentParser(description="Estrategia personalizada Mercado Libre según temporada.")
     parser.add_argument("--input_json", type=str, help="Ruta al archivo JSON con métricas del seller.")
     parser.add_argument("--api_key", type=str, default=os.getenv("DEEPSEEK_API_KEY", ""), help="API KEY Deepseek")
+    parser.add_argument("--listings", type=str, help="CSV/Parquet con publicaciones crudas; calcula las métricas del seller.")
+    parser.add_argument("--seller", type=str, help="seller_nickname a evaluar junto con --listings.")
+    parser.add_argument("--tasa_cancelacion", type=float, default=0.0, help="Tasa de cancelación (no viene en el export).")
+    parser.add_argument("--similares", type=int, default=0, help="Muestra los N sellers más parecidos.")
+    parser.add_argument("--indice_similitud", type=str, default=RUTA_INDICE, help="Archivo del índice de similitud.")
+    parser.add_argument("--stream", action="store_true", help="Imprime la estrategia a medida que se genera.")
     args = parser.parse_args()
 
     if args.input_json:
@@ -45,6 +95,10 @@ def main():
         with open(args.input_json, "r", encoding="utf-8") as f:
             metrics = json.load(f)
         input_payload = metrics.copy()
+    elif args.listings:
+        if not args.seller:
+            parser.error("--listings requiere --seller")
+        metrics, input_payload = metricas_desde_listings(args.listings, args.seller, args.tasa_cancelacion)
     else:
         print("⚠️  [0.2] No se pasó archivo, usando datos de ejemplo.")
         metrics = {
@@ -75,9 +129,20 @@ def main():
     cluster_info = clasificar_seller(metrics)
     input_payload["cluster_name"] = cluster_info["cluster_name"]  # Lo agrega automáticamente
 
+    if args.similares:
+        print(f"🧭 [3.1] Buscando los {args.similares} sellers más parecidos...")
+        similares = sellers_similares(args.similares, args.indice_similitud, metrics,
+                                      seller=args.seller, listings=args.listings)
+        if similares is not None:
+            print(similares[["rango", "similar", "distancia"]].to_string(index=False))
+
     print(f"📦 [4] Payload para LLM:\n{json.dumps(input_payload, indent=2, ensure_ascii=False)}")
 
     print("🤖 [5] Llamando al agente generativo de recomendaciones (LLM)...")
+    if args.stream:
+        print("\n✨ [RESULTADOS]")
+        imprimir_stream(input_payload)
+        return
     output = rasoner_meli.cot_chain(input_payload)
     print("\n✨ [RESULTADOS]")
     print("Contexto de temporada detectado:", output["temporada"])